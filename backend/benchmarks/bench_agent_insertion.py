@@ -0,0 +1,98 @@
+"""Agent insertion for one large distribution.
+
+Fills a stadium-sized rectangle with agents on a regular grid and compares:
+
+  * ``per-agent`` - create_agent_parameters + simulation.add_agent per agent
+                    (the previous _add_agents loop)
+  * ``batch``     - add_agents_batch over numpy arrays
+  * ``engine``    - jupedsim's own insertion cost: prebuilt native parameters
+                    added in a bare loop, the floor neither path can go below
+
+Python overhead is reported as the time above the engine floor.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_agent_insertion --agents 100000 --model CollisionFreeSpeedModel
+"""
+import argparse
+import time
+
+import jupedsim as jps
+import numpy as np
+import shapely
+
+from utils.simulation_init import add_agents_batch, agent_parameter_template, create_agent_parameters
+
+MODELS = {
+    "CollisionFreeSpeedModel": jps.CollisionFreeSpeedModel,
+    "CollisionFreeSpeedModelV2": jps.CollisionFreeSpeedModelV2,
+    "GeneralizedCentrifugalForceModel": jps.GeneralizedCentrifugalForceModel,
+    "SocialForceModel": jps.SocialForceModel,
+    "AnticipationVelocityModel": jps.AnticipationVelocityModel,
+}
+
+
+def create_simulation(model_type: str, width: float, height: float):
+    simulation = jps.Simulation(model=MODELS[model_type](), geometry=shapely.box(0, 0, width, height), dt=0.01)
+    exit_id = simulation.add_exit_stage(shapely.box(width - 1, 0, width, height))
+    journey_id = simulation.add_journey(jps.JourneyDescription([exit_id]))
+    return simulation, journey_id, exit_id
+
+
+def grid_positions(agents: int, spacing: float = 0.6):
+    """Agents on a square grid, and the area needed to hold them"""
+    side = int(np.ceil(np.sqrt(agents)))
+    xs, ys = np.meshgrid(np.arange(side), np.arange(side))
+    positions = np.column_stack([xs.ravel(), ys.ravel()])[:agents] * spacing + 1.0
+    return positions, side * spacing + 3.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=100_000)
+    parser.add_argument("--model", choices=sorted(MODELS), default="CollisionFreeSpeedModel")
+    args = parser.parse_args()
+
+    positions, size = grid_positions(args.agents)
+    speeds = np.random.default_rng(0).normal(1.2, 0.26, len(positions)).clip(0.1, 2.0)
+    print(f"{len(positions)} agents, {args.model}, {size:.0f} x {size:.0f} m")
+
+    simulation, journey_id, exit_id = create_simulation(args.model, size, size)
+    template = agent_parameter_template(args.model)
+    natives = []
+    for x, y in positions.tolist():
+        params = template.parameters_type(**template.fixed)
+        params.position = (x, y)
+        params.journey_id, params.stage_id = journey_id, exit_id
+        natives.append(params.as_native())
+    add_native = simulation._obj.add_agent
+    start = time.perf_counter()
+    for native in natives:
+        add_native(native)
+    engine = time.perf_counter() - start
+    print(f"engine     {engine * 1000:10.1f} ms")
+
+    simulation, journey_id, exit_id = create_simulation(args.model, size, size)
+    start = time.perf_counter()
+    for position, speed in zip(map(tuple, positions.tolist()), speeds.tolist()):
+        agent_params = create_agent_parameters(
+            model_type=args.model,
+            position=position,
+            params={"v0": speed, "radius": 0.2},
+            journey_id=journey_id,
+            stage_id=exit_id,
+        )
+        simulation.add_agent(agent_params)
+    per_agent = time.perf_counter() - start
+    print(f"per-agent  {per_agent * 1000:10.1f} ms  (python overhead {(per_agent - engine) * 1000:.1f} ms)")
+
+    simulation, journey_id, exit_id = create_simulation(args.model, size, size)
+    agent_ids, batch = add_agents_batch(
+        simulation, args.model, positions, speeds=speeds, radii=0.2, journey_ids=journey_id, stage_ids=exit_id
+    )
+    print(f"batch      {batch * 1000:10.1f} ms  (python overhead {(batch - engine) * 1000:.1f} ms)")
+    print(f"agents added: {simulation.agent_count()} / {len(agent_ids)}")
+
+
+if __name__ == "__main__":
+    main()
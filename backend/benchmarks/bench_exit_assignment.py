@@ -0,0 +1,94 @@
+"""Nearest-exit assignment for many agents and exits.
+
+Places exits as small rectangles along the boundary of a square area and
+agents uniformly inside it, then compares:
+
+  * ``loop``     - Point.distance against every exit per agent (the previous
+                   implementation), timed on a sample and extrapolated
+  * ``matrix``   - shapely.distance over the full agents x exits matrix + argmin
+  * ``strtree``  - ExitAssigner (one STRtree.query_nearest call)
+
+Assignments are checked against the loop on the sample.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_exit_assignment --agents 50000 --exits 200
+"""
+import argparse
+import time
+
+import numpy as np
+import shapely
+from shapely.geometry import Point
+
+from utils.exit_assignment import ExitAssigner
+
+
+def create_layout(agents: int, exits: int, size: float = 500.0, seed: int = 0):
+    """Exits spread evenly along the square's boundary, agents uniform inside"""
+    rng = np.random.default_rng(seed)
+    perimeter = np.linspace(0, 4 * size, exits, endpoint=False)
+    side, offset = np.divmod(perimeter, size)
+    x = np.select([side == 0, side == 1, side == 2], [offset, size, size - offset], 0.0)
+    y = np.select([side == 0, side == 1, side == 2], [0.0, offset, size], size - offset)
+    exit_geometries = {
+        stage_id: shapely.box(cx - 1.0, cy - 1.0, cx + 1.0, cy + 1.0)
+        for stage_id, (cx, cy) in enumerate(zip(x, y), start=1)
+    }
+    positions = rng.uniform(2.0, size - 2.0, size=(agents, 2))
+    return exit_geometries, positions
+
+
+def assign_loop(positions, exit_geometries) -> np.ndarray:
+    nearest = np.empty(len(positions), dtype=np.int64)
+    for i, position in enumerate(positions):
+        point = Point(position)
+        min_distance = float("inf")
+        for stage_id, geometry in exit_geometries.items():
+            distance = point.distance(geometry)
+            if distance < min_distance:
+                min_distance = distance
+                nearest[i] = stage_id
+    return nearest
+
+
+def assign_matrix(positions, exit_geometries) -> np.ndarray:
+    stage_ids = np.array(list(exit_geometries.keys()))
+    geometries = np.array(list(exit_geometries.values()), dtype=object)
+    distances = shapely.distance(shapely.points(positions)[:, None], geometries[None, :])
+    return stage_ids[np.argmin(distances, axis=1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=50_000)
+    parser.add_argument("--exits", type=int, default=200)
+    parser.add_argument("--loop-sample", type=int, default=2_000, help="agents timed for the per-agent loop")
+    args = parser.parse_args()
+
+    exit_geometries, positions = create_layout(args.agents, args.exits)
+    sample = positions[:args.loop_sample]
+    print(f"{args.agents} agents x {args.exits} exits")
+
+    start = time.perf_counter()
+    expected = assign_loop(sample, exit_geometries)
+    loop_seconds = (time.perf_counter() - start) * len(positions) / len(sample)
+    print(f"loop     {loop_seconds * 1000:10.1f} ms  (extrapolated from {len(sample)} agents)")
+
+    start = time.perf_counter()
+    matrix = assign_matrix(positions, exit_geometries)
+    print(f"matrix   {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    assigner = ExitAssigner(exit_geometries)
+    built = time.perf_counter()
+    assigned = assigner.assign(positions)
+    done = time.perf_counter()
+    print(f"strtree  {(done - start) * 1000:10.1f} ms  (build {(built - start) * 1000:.1f} ms)")
+
+    print(f"matches loop on sample: {bool(np.array_equal(assigned[:len(sample)], expected))}, "
+          f"matches matrix: {bool(np.array_equal(assigned, matrix))}")
+
+
+if __name__ == "__main__":
+    main()
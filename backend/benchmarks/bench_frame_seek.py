@@ -0,0 +1,116 @@
+"""Random-seek latency over a large stored trajectory.
+
+Builds a synthetic trajectory file with the same schema the JuPedSim SQLite
+writer produces, then times single-frame reads at random frames:
+
+  * ``scan``      - WHERE frame = ? on the table without any index
+  * ``btree``     - WHERE frame = ? through the (frame, id) index
+  * ``frame_index`` - precomputed frame -> rowid range (build_frame_index)
+  * ``read_frame``  - TrajectoryArrayLoader.read_frame, including numpy conversion
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_frame_seek --frames 40000 --agents 100
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from utils.trajectory_loader import TrajectoryArrayLoader, build_frame_index
+
+
+def create_synthetic_trajectory(path: str, frames: int, agents: int, seed: int = 0):
+    """Write frames x agents rows in writer order (frame by frame, ascending id)"""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE trajectory_data (
+            frame INTEGER NOT NULL, id INTEGER NOT NULL,
+            pos_x REAL NOT NULL, pos_y REAL NOT NULL,
+            ori_x REAL NOT NULL, ori_y REAL NOT NULL)
+    """)
+    ids = np.arange(1, agents + 1)
+    positions = rng.uniform(0, 100, size=(agents, 2))
+    batch = []
+    for frame in range(frames):
+        positions += rng.normal(0, 0.05, size=positions.shape)
+        batch.extend(zip(
+            [frame] * agents, ids.tolist(),
+            positions[:, 0].tolist(), positions[:, 1].tolist(),
+            [1.0] * agents, [0.0] * agents
+        ))
+        if len(batch) >= 200_000:
+            conn.executemany("INSERT INTO trajectory_data VALUES (?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO trajectory_data VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def time_seeks(read_frame, targets) -> np.ndarray:
+    latencies = np.empty(len(targets))
+    for i, frame in enumerate(targets):
+        start = time.perf_counter()
+        read_frame(int(frame))
+        latencies[i] = time.perf_counter() - start
+    return latencies * 1000
+
+
+def report(name: str, latencies: np.ndarray):
+    print(
+        f"{name:>12}: p50 {np.percentile(latencies, 50):8.3f} ms  "
+        f"p99 {np.percentile(latencies, 99):8.3f} ms  max {latencies.max():8.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=40_000)
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--seeks", type=int, default=500)
+    parser.add_argument("--scan-seeks", type=int, default=20, help="seeks for the unindexed baseline")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".sqlite")
+    os.close(fd)
+    try:
+        print(f"Writing {args.frames} frames x {args.agents} agents ...")
+        create_synthetic_trajectory(path, args.frames, args.agents)
+        print(f"File size: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        rng = np.random.default_rng(1)
+        targets = rng.integers(0, args.frames, size=args.seeks)
+
+        conn = sqlite3.connect(path)
+        query = "SELECT id, pos_x, pos_y, ori_x, ori_y FROM trajectory_data WHERE frame = ? ORDER BY id"
+        report("scan", time_seeks(lambda f: conn.execute(query, (f,)).fetchall(), targets[:args.scan_seeks]))
+        conn.close()
+
+        start = time.perf_counter()
+        build_frame_index(path)
+        print(f"build_frame_index: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        conn = sqlite3.connect(path)
+        report("btree", time_seeks(lambda f: conn.execute(query, (f,)).fetchall(), targets))
+        conn.close()
+
+        conn = sqlite3.connect(path)
+        report("frame_index", time_seeks(lambda f: conn.execute(
+            "SELECT id, pos_x, pos_y, ori_x, ori_y FROM trajectory_data WHERE rowid BETWEEN ? AND ? ORDER BY id",
+            conn.execute("SELECT first_rowid, last_rowid FROM frame_index WHERE frame = ?", (f,)).fetchone()
+        ).fetchall(), targets))
+        conn.close()
+
+        with TrajectoryArrayLoader(path) as loader:
+            report("read_frame", time_seeks(loader.read_frame, targets))
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
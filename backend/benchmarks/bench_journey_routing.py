@@ -0,0 +1,118 @@
+"""Percentage routing compiled as journey variants or as round-robin transitions.
+
+Builds a station concourse: one distribution on the left, --layers columns of
+two waypoints, each splitting 60/40 to the next column, and two exits on the
+right, so the routing spans 2 ** layers routes. Both journey_routing
+modes are compiled, instantiated and run to evacuation:
+
+  * ``variants``    - one linear journey per route, agents split by percentage
+  * ``transitions`` - one journey, agents split at each waypoint by weighted
+                      round robin
+
+Setup time covers compiling the plan and adding journeys and agents; the
+outcome compares evacuation time and the share of agents leaving by each exit.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_journey_routing --layers 6 --agents 300
+"""
+import argparse
+import contextlib
+import io
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import jupedsim as jps
+import pedpy
+import shapely
+
+from utils.scenario_plan import compile_scenario_plan
+from utils.validation import Scenario
+
+LAYER_SPACING = 6.0
+DEPTH = 16.0
+
+
+def create_config(layers: int, agents: int):
+    width = (layers + 3) * LAYER_SPACING
+    waypoints = {}
+    for layer in range(layers):
+        for side, y in enumerate((DEPTH * 0.25, DEPTH * 0.75)):
+            waypoints[f"jps-waypoints_{2 * layer + side}"] = {"center": [(layer + 2.5) * LAYER_SPACING, y], "radius": 2.0}
+    exits = {
+        f"jps-exits_{side}": {"coordinates": [[width - 1, y - 1.5], [width, y - 1.5], [width, y + 1.5], [width - 1, y + 1.5]]}
+        for side, y in enumerate((DEPTH * 0.25, DEPTH * 0.75))
+    }
+
+    routing = {}
+    for layer in range(layers):
+        targets = (
+            [f"jps-waypoints_{2 * layer + 2}", f"jps-waypoints_{2 * layer + 3}"] if layer < layers - 1
+            else ["jps-exits_0", "jps-exits_1"]
+        )
+        for side in range(2):
+            routing[f"jps-waypoints_{2 * layer + side}"] = {"j0": {"destinations": [
+                {"target": targets[side], "percentage": 60},
+                {"target": targets[1 - side], "percentage": 40},
+            ]}}
+
+    config = {
+        "exits": exits,
+        "distributions": {"jps-distributions_0": {
+            "coordinates": [[1, 1], [2 * LAYER_SPACING - 1, 1], [2 * LAYER_SPACING - 1, DEPTH - 1], [1, DEPTH - 1]],
+            "parameters": {"number": agents, "radius": 0.2, "v0": 1.2},
+        }},
+        "waypoints": waypoints,
+        "journeys": [{"id": "j0", "stages": ["jps-distributions_0", "jps-waypoints_0", "jps-exits_0"]}],
+        "transitions": [],
+        "waypoint_routing": routing,
+    }
+    return config, shapely.box(0, 0, width, DEPTH)
+
+
+def run(config, walkable_area, mode: str, seed: int, max_time: float):
+    parameters = SimpleNamespace(journey_routing=mode, exit_assignment="euclidean")
+    simulation = jps.Simulation(model=jps.CollisionFreeSpeedModel(), geometry=walkable_area.polygon)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan = compile_scenario_plan(Scenario(config).config, walkable_area, parameters)
+        setup = plan.instantiate(simulation, seed, global_parameters=parameters)
+    setup_seconds = time.perf_counter() - started
+    exit_names = {setup[0]["stage_map"][key]: key for key in plan.exit_keys}
+
+    # An agent's last target before it disappears is the exit it took
+    targets = {}
+    exits = Counter()
+    started = time.perf_counter()
+    while simulation.agent_count() > 0 and simulation.elapsed_time() < max_time:
+        simulation.iterate(10)
+        current = {agent.id: agent.stage_id for agent in simulation.agents()}
+        exits.update(exit_names.get(stage_id, "other") for agent_id, stage_id in targets.items() if agent_id not in current)
+        targets = current
+    run_seconds = time.perf_counter() - started
+
+    agents = plan.total_agents
+    split = ", ".join(f"{key} {exits[key] / agents:.0%}" for key in plan.exit_keys)
+    print(f"{mode:11s} {len(plan.variants):5d} journeys  setup {setup_seconds * 1000:8.1f} ms  "
+          f"evacuated {sum(exits.values())}/{agents} in {simulation.elapsed_time():6.1f} s ({split})  "
+          f"run {run_seconds:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layers", type=int, default=6)
+    parser.add_argument("--agents", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=420)
+    parser.add_argument("--max-time", type=float, default=300.0)
+    args = parser.parse_args()
+
+    config, polygon = create_config(args.layers, args.agents)
+    walkable_area = pedpy.WalkableArea(polygon)
+    print(f"{args.layers} waypoint layers, {2 ** args.layers} routes, {args.agents} agents")
+    for mode in ("variants", "transitions"):
+        run(config, walkable_area, mode, args.seed, args.max_time)
+
+
+if __name__ == "__main__":
+    main()
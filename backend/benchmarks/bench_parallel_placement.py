@@ -0,0 +1,89 @@
+"""Scenario setup for many independent distribution zones.
+
+Builds a grid of rectangular zones (every fifth one a flow source) in one
+large hall, compiles the ScenarioPlan once and instantiates it per seed:
+
+  * ``sequential`` - placement_workers=1, zones placed one after another
+  * ``parallel``   - placements prefetched in a process pool, then consumed
+                     in order from the placement cache
+
+The placement cache is cleared before each run. Agent positions, journeys and
+speeds are checked to be identical between the two.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_parallel_placement --zones 40 --agents-per-zone 150 --workers 8
+"""
+import argparse
+import contextlib
+import io
+import time
+from types import SimpleNamespace
+
+import jupedsim as jps
+import pedpy
+import shapely
+
+from utils.placement_cache import placement_cache
+from utils.scenario_plan import compile_scenario_plan
+from utils.validation import Scenario
+
+
+def create_config(zones: int, agents_per_zone: int, zone_size: float = 12.0):
+    """Zones on a square grid with 2 m aisles, exits on the left and right walls"""
+    side = int(zones ** 0.5 + 0.999)
+    pitch = zone_size + 2.0
+    size = side * pitch + 2.0
+    distributions = {}
+    for i in range(zones):
+        x0 = 2.0 + (i % side) * pitch
+        y0 = 2.0 + (i // side) * pitch
+        parameters = {"number": agents_per_zone, "radius": 0.2, "v0": 1.2}
+        if i % 5 == 4:
+            parameters.update(use_flow_spawning=True, flow_start_time=0, flow_end_time=30)
+        distributions[f"jps-distributions_{i}"] = {
+            "coordinates": [[x0, y0], [x0 + zone_size, y0], [x0 + zone_size, y0 + zone_size], [x0, y0 + zone_size]],
+            "parameters": parameters,
+        }
+    exits = {
+        "jps-exits_0": {"coordinates": [[0, size / 2 - 2], [1, size / 2 - 2], [1, size / 2 + 2], [0, size / 2 + 2]]},
+        "jps-exits_1": {"coordinates": [[size - 1, size / 2 - 2], [size, size / 2 - 2], [size, size / 2 + 2], [size - 1, size / 2 + 2]]},
+    }
+    return {"exits": exits, "distributions": distributions}, shapely.box(0, 0, size, size)
+
+
+def instantiate(plan, walkable_area, seed: int, workers: int):
+    placement_cache.clear()
+    simulation = jps.Simulation(model=jps.CollisionFreeSpeedModel(), geometry=walkable_area.polygon)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, _, _, spawning_info = plan.instantiate(simulation, seed, global_parameters=SimpleNamespace(placement_workers=workers))
+    elapsed = time.perf_counter() - started
+    agents = [(a.position, a.journey_id - min(spawning_info["exit_to_journey"].values()), a.model.desired_speed)
+              for a in simulation.agents()]
+    return elapsed, agents, spawning_info["starting_pos_per_source"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--zones", type=int, default=40)
+    parser.add_argument("--agents-per-zone", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=0, help="0 decides from the amount of work")
+    parser.add_argument("--seed", type=int, default=420)
+    args = parser.parse_args()
+
+    config, polygon = create_config(args.zones, args.agents_per_zone)
+    walkable_area = pedpy.WalkableArea(polygon)
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan = compile_scenario_plan(Scenario(config).config, walkable_area)
+    print(f"{args.zones} zones, {plan.total_agents} agents")
+
+    sequential, sequential_agents, sequential_flows = instantiate(plan, walkable_area, args.seed, 1)
+    print(f"sequential {sequential * 1000:10.1f} ms")
+    parallel, parallel_agents, parallel_flows = instantiate(plan, walkable_area, args.seed, args.workers)
+    print(f"parallel   {parallel * 1000:10.1f} ms  ({sequential / parallel:.1f}x)")
+    print(f"identical: {sequential_agents == parallel_agents and sequential_flows == parallel_flows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Spawn slots for a concourse-sized flow source.
+
+Fills a rectangular hall with a regular grid of round columns and compares:
+
+  * ``jupedsim`` - jps.distribute_until_filled (all slots up front)
+  * ``poisson``  - PoissonDiskSampler.fill (all slots up front)
+  * ``lazy``     - PoissonDiskSampler.take for the first --spawns slots only,
+                   as a flow source uses it
+
+Every result is checked for the agent and wall distances; slot counts show
+how densely each engine fills the area.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_poisson_disk --width 60 --depth 40 --spawns 500
+"""
+import argparse
+import time
+
+import jupedsim as jps
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+
+from utils.poisson_disk import PoissonDiskSampler
+
+DISTANCE_TO_AGENTS = 0.3
+DISTANCE_TO_POLYGON = 0.15
+
+
+def create_hall(width: float, depth: float, column_spacing: float = 8.0, column_radius: float = 0.5):
+    columns = [
+        shapely.Point(x, y).buffer(column_radius)
+        for x in np.arange(column_spacing, width, column_spacing)
+        for y in np.arange(column_spacing, depth, column_spacing)
+    ]
+    return shapely.box(0, 0, width, depth).difference(shapely.union_all(columns))
+
+
+def check(polygon, points: np.ndarray) -> str:
+    """Smallest agent and wall distances found, and whether every point lies inside"""
+    nearest, _ = cKDTree(points).query(points, k=2)
+    wall = shapely.distance(polygon.boundary, shapely.points(points)).min()
+    inside = shapely.contains_xy(polygon, points[:, 0], points[:, 1]).all()
+    ok = nearest[:, 1].min() >= DISTANCE_TO_AGENTS - 1e-9 and wall >= DISTANCE_TO_POLYGON - 1e-9 and inside
+    return f"min spacing {nearest[:, 1].min():.3f} m, min wall {wall:.3f} m, {'ok' if ok else 'VIOLATED'}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=float, default=60.0)
+    parser.add_argument("--depth", type=float, default=40.0)
+    parser.add_argument("--spawns", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=420)
+    parser.add_argument("--skip-jupedsim", action="store_true", help="jupedsim takes minutes on large halls")
+    args = parser.parse_args()
+
+    polygon = create_hall(args.width, args.depth)
+    print(f"hall {args.width:.0f} x {args.depth:.0f} m, {polygon.area:.0f} m² walkable")
+
+    if not args.skip_jupedsim:
+        start = time.perf_counter()
+        points = np.asarray(jps.distribute_until_filled(
+            polygon=polygon,
+            distance_to_agents=DISTANCE_TO_AGENTS,
+            distance_to_polygon=DISTANCE_TO_POLYGON,
+            seed=args.seed,
+        ))
+        elapsed = time.perf_counter() - start
+        print(f"jupedsim {elapsed * 1000:10.1f} ms  {len(points):7d} slots  {check(polygon, points)}")
+
+    start = time.perf_counter()
+    points = PoissonDiskSampler(polygon, DISTANCE_TO_AGENTS, DISTANCE_TO_POLYGON, seed=args.seed).fill()
+    elapsed = time.perf_counter() - start
+    print(f"poisson  {elapsed * 1000:10.1f} ms  {len(points):7d} slots  {check(polygon, points)}")
+
+    start = time.perf_counter()
+    points = PoissonDiskSampler(polygon, DISTANCE_TO_AGENTS, DISTANCE_TO_POLYGON, seed=args.seed).take(args.spawns)
+    elapsed = time.perf_counter() - start
+    print(f"lazy     {elapsed * 1000:10.1f} ms  {len(points):7d} slots  {check(polygon, points)}")
+
+
+if __name__ == "__main__":
+    main()
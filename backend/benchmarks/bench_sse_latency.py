@@ -0,0 +1,191 @@
+"""SSE latency while large trajectory chunks are being served.
+
+Drives the FastAPI app in-process as a raw ASGI application on one event loop
+(no HTTP client needed): a progress SSE stream
+(/simulation_stream) is consumed while several clients repeatedly fetch large
+/simulation_trajectory chunks from a synthetic trajectory. Reports the gaps
+between SSE messages (the stream ticks every 500 ms) and the event-loop lag,
+first idle and then under load:
+
+  * default   - blocking I/O runs on the bounded I/O executor
+  * --inline  - I/O executor replaced by inline execution, i.e. the blocking
+                reads run on the event loop as the routes used to do
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_sse_latency --frames 4000 --agents 500
+    python -m benchmarks.bench_sse_latency --frames 4000 --agents 500 --inline
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import Executor, Future
+from typing import Callable, Optional
+from urllib.parse import urlencode
+
+import numpy as np
+
+import utils.dependencies as dependencies
+from benchmarks.bench_frame_seek import create_synthetic_trajectory
+from main import app
+from utils.dependencies import results_storage, simulation_progress
+from utils.trajectory_loader import build_frame_index
+
+SIMULATION_ID = "bench-sse-latency"
+
+
+class InlineExecutor(Executor):
+    """Runs submitted work immediately on the calling thread (the event loop)"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+async def asgi_get(path: str, query: str = "", on_body: Optional[Callable[[], None]] = None) -> int:
+    """Call a GET route of the app as a raw ASGI application and return the status code.
+
+    ``on_body`` is called as each non-empty body message is sent.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "headers": [], "client": ("bench", 0), "server": ("bench", 80),
+    }
+    status = []
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client never disconnects
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body" and message.get("body") and on_body is not None:
+            on_body()
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def consume_sse(arrivals: list):
+    """Consume the SSE route and record when each message is sent"""
+    await asgi_get(f"/simulation_stream/{SIMULATION_ID}", on_body=lambda: arrivals.append(time.perf_counter()))
+
+
+async def tick_progress(stop: asyncio.Event):
+    """Keep the fake simulation's progress moving, as a running simulation would"""
+    while not stop.is_set():
+        simulation_progress[SIMULATION_ID].update({"timestamp": time.time(), "progress": random.random() * 100})
+        await asyncio.sleep(0.1)
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - start - 0.01) * 1000)
+
+
+async def load_chunks(frames: int, chunk_size: int, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start_frame = random.randrange(0, max(1, frames - chunk_size))
+        start = time.perf_counter()
+        status = await asgi_get(
+            f"/simulation_trajectory/{SIMULATION_ID}", urlencode({"start_frame": start_frame, "chunk_size": chunk_size})
+        )
+        if status != 200:
+            raise RuntimeError(f"Chunk request failed with status {status}")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def summarize(name: str, values) -> str:
+    values = np.asarray(values)
+    if len(values) == 0:
+        return f"{name}: no samples"
+    return (
+        f"{name}: p50 {np.percentile(values, 50):8.1f} ms  p99 {np.percentile(values, 99):8.1f} ms  "
+        f"max {values.max():8.1f} ms  (n={len(values)})"
+    )
+
+
+async def run_phase(duration: float, load: bool, args) -> dict:
+    stop = asyncio.Event()
+    arrivals, lags, chunk_latencies = [], [], []
+
+    simulation_progress[SIMULATION_ID] = {"stage": "simulation", "progress": 0, "message": "", "timestamp": time.time()}
+    tasks = [
+        asyncio.create_task(consume_sse(arrivals)),
+        asyncio.create_task(tick_progress(stop)),
+        asyncio.create_task(measure_loop_lag(stop, lags)),
+    ]
+
+    if load:
+        tasks += [
+            asyncio.create_task(load_chunks(args.frames, args.chunk_size, stop, chunk_latencies))
+            for _ in range(args.concurrency)
+        ]
+
+    await asyncio.sleep(duration)
+    stop.set()
+    simulation_progress[SIMULATION_ID].update({"stage": "completed", "timestamp": time.time()})
+    await asyncio.gather(*tasks)
+
+    # Skip the connect message and measure spacing between stream ticks
+    gaps = np.diff(arrivals[1:]) * 1000
+    return {"gaps": gaps, "lags": lags, "chunks": chunk_latencies}
+
+
+async def main_async(args):
+    for phase, load in (("idle", False), ("loaded", True)):
+        result = await run_phase(args.duration, load, args)
+        print(f"--- {phase} ---")
+        print(summarize("SSE gap     ", result["gaps"]))
+        print(summarize("loop lag    ", result["lags"]))
+        if load:
+            print(summarize("chunk fetch ", result["chunks"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=4_000)
+    parser.add_argument("--agents", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=100, help="frames per /simulation_trajectory request")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent chunk clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per phase")
+    parser.add_argument("--inline", action="store_true", help="run blocking I/O on the event loop for comparison")
+    args = parser.parse_args()
+
+    if args.inline:
+        dependencies.io_executor = InlineExecutor()
+
+    fd, path = tempfile.mkstemp(suffix=".sqlite")
+    os.close(fd)
+    try:
+        print(f"Writing {args.frames} frames x {args.agents} agents ...")
+        create_synthetic_trajectory(path, args.frames, args.agents)
+        build_frame_index(path)
+
+        results_storage[SIMULATION_ID] = {"sqlite_file": path, "primary_sqlite_file": path}
+        print(f"I/O mode: {'inline on event loop' if args.inline else 'bounded I/O executor'}")
+        asyncio.run(main_async(args))
+    finally:
+        results_storage.pop(SIMULATION_ID, None)
+        simulation_progress.pop(SIMULATION_ID, None)
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
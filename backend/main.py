@@ -4,8 +4,14 @@ from typing import Dict, Any
 from concurrent.futures import ThreadPoolExecutor
 from middleware.performance_middleware import PerformanceMiddleware
 from utils.performance_monitor import performance_monitor
+from utils.artifact_store import artifact_store
+from utils.geometry_cache import geometry_cache
+from utils.geometry_store import geometry_store
+from utils.placement_cache import placement_cache
+from utils.distance_field import distance_field_cache
+from utils.dependencies import run_io
 
-from routes import simulation, journey, file_conversion
+from routes import simulation, journey, file_conversion, trajectory
 
 app = FastAPI(title="Pedestrian Simulation API")
 
@@ -32,15 +38,20 @@ app.add_middleware(PerformanceMiddleware)
 app.include_router(simulation.router)
 app.include_router(journey.router)
 app.include_router(file_conversion.router)
+app.include_router(trajectory.router)
 
 
 @app.on_event("startup")
 async def startup_event():
     performance_monitor.start_monitoring(interval=2.0)
+    # Idle job directories from a previous process are orphans; results_storage is in memory
+    artifact_store.sweep_orphans()
+    artifact_store.start_sweeper(interval=60.0)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     performance_monitor.stop_monitoring()
+    artifact_store.stop_sweeper()
 
 @app.get("/")
 async def root():
@@ -50,6 +61,18 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/storage_metrics")
+async def storage_metrics():
+    """Disk usage, quotas and eviction counters of the simulation artifact store"""
+    # Walks every job directory
+    return {
+        **(await run_io(artifact_store.get_metrics)),
+        "geometry_store": geometry_store.get_metrics(),
+        "geometry_cache": geometry_cache.get_metrics(),
+        "placement_cache": placement_cache.get_metrics(),
+        "distance_field_cache": distance_field_cache.get_metrics(),
+    }
+
 @app.get("/models")
 async def get_available_models():
     """Get list of available simulation models with updated parameters"""
@@ -32,6 +32,14 @@ class SimulationParameters(BaseModel):
 
     
     enable_flow_spawning: bool = Field(default=False, description="Enable flow-based agent spawning")
+    exit_assignment: str = Field(default="euclidean", description="Nearest-exit rule for agents without a journey: 'euclidean' (straight line) or 'geodesic' (walking distance, builds a distance field per geometry)")
+    distance_field_cell_size: float = Field(default=0.25, gt=0, description="Grid cell size in meters of the walking-distance field used for geodesic exit assignment")
+    min_variant_percentage: float = Field(default=0.0, ge=0, lt=100, description="Drop percentage-routing journey variants taken by fewer than this percentage of a journey's agents")
+    placement_engine: str = Field(default="jupedsim", description="Spawn slots for flow sources: 'jupedsim' (distribute_until_filled up front) or 'poisson' (numpy Poisson-disk sampling on demand)")
+    journey_routing: str = Field(default="variants", description="Percentage routing as 'variants' (one linear journey per route) or 'transitions' (one journey per configured journey, split at waypoints by weighted round robin)")
+    stagnation_window: float = Field(default=0.0, ge=0, description="End the run early, with status 'stagnated', when no agent exits and agents barely move for this many seconds (0 disables)")
+    stagnation_displacement: float = Field(default=0.1, gt=0, description="Mean displacement in meters over the stagnation window below which agents count as stuck")
+    placement_workers: int = Field(default=0, ge=0, le=32, description="Processes placing independent distributions concurrently: 0 decides from the amount of work, 1 places sequentially")
 
     
     # Collision Free Speed Model parameters (reduced)
@@ -60,6 +68,25 @@ class SimulationRequest(BaseModel):
     waypoint_routing: Dict[str, Any] = Field(default_factory=dict)
 
 
+class QueryRegion(BaseModel):
+    id: str
+    wkt: str = Field(description="Polygon in WKT, in simulation coordinates")
+
+class TrajectoryQueryRequest(BaseModel):
+    seed: Optional[int] = Field(default=None, description="Seed of a multi-seed run; defaults to the primary run")
+    start_time: float = Field(default=0.0, ge=0, description="Start of the queried window in seconds")
+    end_time: Optional[float] = Field(default=None, gt=0, description="End of the queried window in seconds (exclusive)")
+    bin_seconds: Optional[float] = Field(default=None, gt=0, description="Time bin width in seconds; omit for a single bin")
+    regions: List[QueryRegion] = Field(default_factory=list, max_length=50, description="Regions to aggregate over; empty means the whole area")
+    aggregates: List[str] = Field(
+        default_factory=lambda: ["max_count", "mean_speed"],
+        description="Any of 'max_count', 'mean_count', 'agent_count', 'mean_speed', 'speed_percentiles'"
+    )
+    percentiles: List[float] = Field(default_factory=lambda: [50.0, 90.0], max_length=10)
+    max_rows: int = Field(default=5_000_000, ge=1, le=50_000_000, description="Row budget; larger queries are rejected")
+    max_seconds: float = Field(default=10.0, gt=0, le=60, description="Time budget; the scan stops early and returns a partial result")
+
+
 class AgentPosition(BaseModel):
     agent_id: int
     x: float
@@ -1,7 +1,8 @@
 from fastapi import APIRouter
 from models import JourneyPathRequest, JourneyPathResponse
 from services.journey_service import compute_shortest_paths, getElementCenter
-from shapely import wkt
+from utils.dependencies import run_io
+from utils.geometry_cache import geometry_cache
 import jupedsim as jps
 
 router = APIRouter()
@@ -12,19 +13,17 @@ async def compute_journey_paths(request: JourneyPathRequest):
     try:
         print(f"Received WKT: {request.walkable_area_wkt}")  # DEBUG
         
-        # Parse walkable area geometry
-        geometry = wkt.loads(request.walkable_area_wkt)
+        # Parse walkable area geometry (cached, repaired with buffer(0) if needed)
+        prepared_geometry = await run_io(geometry_cache.get, request.walkable_area_wkt, repair=True)
+        geometry = prepared_geometry.geometry
         print(f"Geometry is valid: {geometry.is_valid}, is simple: {geometry.is_simple}")  # DEBUG
         
-        if not geometry.is_valid or not geometry.is_simple:
-            # Try to fix the geometry
-            geometry = geometry.buffer(0)
-            if not geometry.is_valid or not geometry.is_simple:
-                return JourneyPathResponse(
-                    journey_connections=request.journey_connections,
-                    success=False,
-                    errors=["Invalid walkable area geometry. Please redraw the boundary."]
-                )
+        if not prepared_geometry.is_valid:
+            return JourneyPathResponse(
+                journey_connections=request.journey_connections,
+                success=False,
+                errors=["Invalid walkable area geometry. Please redraw the boundary."]
+            )
         
         # Create routing engine
         routing_engine = jps.RoutingEngine(geometry)
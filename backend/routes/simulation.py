@@ -6,25 +6,135 @@ import tempfile
 import time
 import uuid
 from fastapi import APIRouter, HTTPException
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Optional, Tuple
 
-from fastapi.responses import StreamingResponse
 import pedpy
-from utils.data_processing import _convert_waypoint_routing_to_dict, get_trajectory_info
-from utils.validation import _validate_waypoint_routing
-from models import SimulationRequest, TrajectoryStreamer
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from utils.data_processing import IndexedTrajectoryStreamer, _convert_waypoint_routing_to_dict, get_trajectory_info
+from utils.ensemble_store import extract_run
+from utils.validation import Scenario, _validate_waypoint_routing
+from models import SimulationRequest
 from services.simulation_service import run_multiple_simulations_with_progress, run_simulation_with_visualization_progress, update_progress
-from shapely import wkt
-from utils.dependencies import simulation_progress, results_storage, thread_pool
+from utils.agent_table import AgentAttributeTable
+from utils.artifact_store import artifact_store
+from utils.dependencies import iterate_io, run_io, simulation_progress, results_storage, thread_pool
+from utils.exit_assignment import EXIT_ASSIGNMENT_MODES
+from utils.feasibility import check_feasibility
+from utils.geometry_cache import geometry_cache
+from utils.geometry_store import geometry_store
+from utils.journey_variants import check_routing_cycles, check_variant_count
+from utils.scenario_plan import JOURNEY_ROUTING_MODES, PLACEMENT_ENGINES, compile_scenario_plan
 
 
 router = APIRouter()
 
-@router.post("/simulate_with_visualization_start")
-async def simulate_with_visualization_start(request: SimulationRequest):
-    """Start simulation and return simulation ID for progress tracking"""
-    
 
+def _discard_result(simulation_id: str) -> Optional[dict]:
+    """Remove a result from storage, dropping its reference to the shared geometry"""
+    result_data = results_storage.pop(simulation_id, None)
+    if result_data:
+        geometry_store.release(result_data.get("geometry_hash"))
+    return result_data
+
+
+# Results whose artifacts were evicted can no longer be served
+artifact_store.add_eviction_listener(_discard_result)
+
+
+def _seed_file_available(result_data: dict, sqlite_info: dict) -> bool:
+    """Check whether a seed can still be downloaded, standalone or from the ensemble store"""
+    if sqlite_info.get("file_path") and os.path.exists(sqlite_info["file_path"]):
+        return True
+    store = result_data.get("ensemble_store")
+    return sqlite_info.get("run_id") is not None and bool(store) and os.path.exists(store)
+
+
+def _read_seed_file(result_data: dict, sqlite_info: dict) -> bytes:
+    """Read one seed's trajectory file, rebuilding it from the ensemble store if needed"""
+    if sqlite_info.get("file_path") and os.path.exists(sqlite_info["file_path"]):
+        with open(sqlite_info["file_path"], 'rb') as f:
+            return f.read()
+
+    store = result_data["ensemble_store"]
+    fd, extracted = tempfile.mkstemp(suffix=".sqlite", dir=os.path.dirname(store))
+    os.close(fd)
+    try:
+        extract_run(store, sqlite_info["run_id"], extracted)
+        with open(extracted, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(extracted)
+
+
+def _delete_result_files(simulation_id: str, result_data: dict):
+    """Remove every trajectory file of a result, including the ensemble store and its job directory"""
+    paths = [f.get("file_path") for f in result_data.get("sqlite_files", [])]
+    paths += [result_data.get("sqlite_file"), result_data.get("ensemble_store")]
+    for path in paths:
+        try:
+            if path and os.path.exists(path):
+                os.unlink(path)
+        except Exception as e:
+            print(f"Error deleting sqlite file {path}: {e}")
+
+    artifact_store.release(simulation_id)
+
+
+def _read_trajectory_chunk(sqlite_file: str, start_frame: int, end_frame: Optional[int], chunk_size: int) -> JSONResponse:
+    """Read one chunk of frames and render the JSON body (runs on the I/O executor)"""
+    with IndexedTrajectoryStreamer(sqlite_file) as streamer:
+        total_frames = streamer.get_frame_count()
+        
+        if end_frame is None:
+            end_frame = total_frames
+        
+        # Limit chunk size to prevent memory issues
+        actual_end = min(start_frame + chunk_size, end_frame, total_frames)
+        
+        frames = []
+        for frame_data in streamer.stream_frames(start_frame, actual_end):
+            frames.append(frame_data)
+        
+        return JSONResponse(jsonable_encoder({
+            "frames": frames,
+            "start_frame": start_frame,
+            "end_frame": actual_end,
+            "total_frames": total_frames,
+            "has_more": actual_end < total_frames,
+            "next_start_frame": actual_end if actual_end < total_frames else None
+        }))
+
+
+def _build_seed_zip(result_data: dict) -> bytes:
+    """Compress every available seed file into one ZIP archive"""
+    import zipfile
+    
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for sqlite_info in result_data.get("sqlite_files", []):
+            if _seed_file_available(result_data, sqlite_info):
+                zip_file.writestr(
+                    f"simulation_seed_{sqlite_info['seed']}.sqlite",
+                    _read_seed_file(result_data, sqlite_info)
+                )
+    return zip_buffer.getvalue()
+
+
+def _iter_file(path: str, block_size: int = 1024 * 1024):
+    with open(path, 'rb') as f:
+        while chunk := f.read(block_size):
+            yield chunk
+
+async def _validated_scenario(
+    request: SimulationRequest, check_reachability: bool = True
+) -> Tuple[pedpy.WalkableArea, Scenario]:
+    """Validate a simulation request: geometry, parameters, configuration and waypoint routing.
+
+    Raises HTTPException (400) for invalid requests; with ``check_reachability``
+    also for exits and waypoints agents can't reach.
+    """
     try:
    
         # Validate WKT geometry with better error messages
@@ -32,14 +142,9 @@ async def simulate_with_visualization_start(request: SimulationRequest):
             raise HTTPException(status_code=400, detail="walkable_area_wkt is required and cannot be empty")
                 
         try:
-            geometry = wkt.loads(request.walkable_area_wkt)
-            
-            if hasattr(geometry, 'geoms'):
-                if len(geometry.geoms) == 0:
-                    raise HTTPException(status_code=400, detail="WKT geometry collection is empty")
-                walkable_area = pedpy.WalkableArea(geometry.geoms[0])
-            else:
-                walkable_area = pedpy.WalkableArea(geometry)
+            # Parsed and prepared once per distinct geometry; pedpy rejects invalid areas
+            prepared_geometry = await run_io(geometry_cache.get, request.walkable_area_wkt)
+            walkable_area = await run_io(geometry_cache.walkable_area, prepared_geometry)
                 
         except Exception as wkt_error:
             print(f"ERROR: WKT parsing failed: {wkt_error}")
@@ -77,6 +182,24 @@ async def simulate_with_visualization_start(request: SimulationRequest):
                 status_code=400, 
                 detail=f"Invalid model type: '{request.parameters.model_type}'. Supported types: {', '.join(valid_models)}"
             )
+
+        if request.parameters.exit_assignment not in EXIT_ASSIGNMENT_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid exit_assignment: '{request.parameters.exit_assignment}'. Supported values: {', '.join(EXIT_ASSIGNMENT_MODES)}"
+            )
+
+        if request.parameters.placement_engine not in PLACEMENT_ENGINES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid placement_engine: '{request.parameters.placement_engine}'. Supported values: {', '.join(PLACEMENT_ENGINES)}"
+            )
+
+        if request.parameters.journey_routing not in JOURNEY_ROUTING_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid journey_routing: '{request.parameters.journey_routing}'. Supported values: {', '.join(JOURNEY_ROUTING_MODES)}"
+            )
         
         
         # NEW: ONLY require exits, make distributions optional
@@ -206,22 +329,23 @@ async def simulate_with_visualization_start(request: SimulationRequest):
                 
                 # Convert to dict and add to simulation config
                 waypoint_routing_dict = _convert_waypoint_routing_to_dict(request.waypoint_routing)
+                check_routing_cycles(waypoint_routing_dict)
+                if request.parameters.journey_routing == "variants":
+                    check_variant_count(
+                        request.simulation_config.get("journeys", []),
+                        waypoint_routing_dict,
+                        request.parameters.min_variant_percentage,
+                    )
                 request.simulation_config["waypoint_routing"] = waypoint_routing_dict
         
         except Exception as routing_error:
             raise HTTPException(status_code=400, detail=f"Waypoint routing validation error: {str(routing_error)}")
         
-        # Generate simulation ID
-        simulation_id = str(uuid.uuid4())
-        
-        # Save JSON config to temporary file with error handling
+        # Validate once; the scenario is passed in memory to every run of this job
         try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
-                json.dump(request.simulation_config, temp_file, indent=2)
-                temp_json_path = temp_file.name
-        except Exception as file_error:
-            print(f"ERROR: Failed to save config file: {file_error}")
-            raise HTTPException(status_code=500, detail=f"Failed to save configuration: {str(file_error)}")
+            scenario = await run_io(Scenario, request.simulation_config, walkable_area if check_reachability else None)
+        except ValueError as config_error:
+            raise HTTPException(status_code=400, detail=f"Invalid simulation_config: {str(config_error)}")
         
         if request.parameters.enable_flow_spawning:
             print("DEBUG: Flow spawning enabled globally")
@@ -242,6 +366,32 @@ async def simulate_with_visualization_start(request: SimulationRequest):
                         
                         print(f"DEBUG: Distribution {dist_id} has flow spawning: {start_time}s to {end_time}s")
         
+        return walkable_area, scenario
+
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
+    except Exception as e:
+        print(f"ERROR: Unexpected error in simulation setup: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Simulation error: {str(e)}")
+
+
+@router.post("/simulate_with_visualization_start")
+async def simulate_with_visualization_start(request: SimulationRequest):
+    """Start simulation and return simulation ID for progress tracking"""
+    walkable_area, scenario = await _validated_scenario(request)
+
+    try:
+        # Generate simulation ID
+        simulation_id = str(uuid.uuid4())
+
+        if not await run_io(artifact_store.ensure_capacity):
+            raise HTTPException(
+                status_code=507,
+                detail="Simulation storage quota exhausted; download or wait for earlier results to expire"
+            )
+        
         # Initialize progress
         update_progress(simulation_id, "queued", 0, "Simulation queued...")
         
@@ -251,13 +401,14 @@ async def simulate_with_visualization_start(request: SimulationRequest):
                 
                 if request.parameters.number_of_simulations > 1:
                     # Run multiple simulations
-                    metrics, geometry_wkt, agent_radii, all_sqlite_files = run_multiple_simulations_with_progress(
-                        temp_json_path, walkable_area, request.parameters, simulation_id
+                    metrics, geometry_wkt, agent_table, all_sqlite_files = run_multiple_simulations_with_progress(
+                        scenario, walkable_area, request.parameters, simulation_id
                     )
                 else:
                     # Run single simulation (existing logic) - FIX: Make sure this returns 4 values
-                    metrics, geometry_wkt, agent_radii, output_file = run_simulation_with_visualization_progress(
-                        temp_json_path, walkable_area, request.parameters, simulation_id, request.parameters.base_seed
+                    metrics, geometry_wkt, agent_table, output_file = run_simulation_with_visualization_progress(
+                        scenario, walkable_area, request.parameters, simulation_id, request.parameters.base_seed,
+                        output_dir=artifact_store.create_job(simulation_id)
                     )
                     all_sqlite_files = [{
                         "seed": request.parameters.base_seed,
@@ -275,14 +426,17 @@ async def simulate_with_visualization_start(request: SimulationRequest):
                 results_storage[simulation_id] = {
                     **metrics,
                     "total_frames": trajectory_info["frame_count"],
-                    "geometry_wkt": geometry_wkt,
-                    "agent_radii": agent_radii,
+                    # Geometry is shared by content hash, per-agent attributes kept as a column table
+                    "geometry_hash": geometry_store.put(geometry_wkt),
+                    "agent_table": agent_table,
                     # For backwards compatibility with single simulation
                     "sqlite_file": primary_sqlite_file,
                     # For multiple simulations
                     "sqlite_files": all_sqlite_files if request.parameters.download_sqlite else [],
                     "download_requested": request.parameters.download_sqlite,
                     "primary_sqlite_file": primary_sqlite_file,
+                    # All seeds in one file with a run_id column (multi-seed downloads only)
+                    "ensemble_store": all_sqlite_files[0].get("ensemble_store") if all_sqlite_files else None,
                     "number_of_simulations": request.parameters.number_of_simulations
                 }
                 
@@ -290,7 +444,8 @@ async def simulate_with_visualization_start(request: SimulationRequest):
                 if not request.parameters.download_sqlite:
                     for sqlite_info in all_sqlite_files:
                         try:
-                            os.unlink(sqlite_info["file_path"])
+                            if sqlite_info["file_path"]:
+                                os.unlink(sqlite_info["file_path"])
                         except:
                             pass
                 
@@ -305,11 +460,11 @@ async def simulate_with_visualization_start(request: SimulationRequest):
                 traceback.print_exc()
                 update_progress(simulation_id, "failed", 0, f"Simulation failed: {str(sim_error)}")
             finally:
-                # Cleanup
-                try:
-                    os.unlink(temp_json_path)
-                except Exception as cleanup_error:
-                    print(f"WARNING: Failed to cleanup temp file: {cleanup_error}")
+                # Keep the job directory only while there is something left to download
+                if simulation_id in results_storage and request.parameters.download_sqlite:
+                    artifact_store.mark_finished(simulation_id)
+                else:
+                    artifact_store.release(simulation_id)
         
         # Submit to thread pool
         try:
@@ -317,10 +472,7 @@ async def simulate_with_visualization_start(request: SimulationRequest):
         except Exception as thread_error:
             print(f"ERROR: Failed to submit to thread pool: {thread_error}")
             # Cleanup temp file
-            try:
-                os.unlink(temp_json_path)
-            except:
-                pass
+            artifact_store.release(simulation_id)
             raise HTTPException(status_code=500, detail=f"Failed to start simulation: {str(thread_error)}")
         
         return {"simulation_id": simulation_id, "message": "Simulation started"}
@@ -334,6 +486,27 @@ async def simulate_with_visualization_start(request: SimulationRequest):
         raise HTTPException(status_code=500, detail=f"Simulation error: {str(e)}")
 
 
+@router.post("/simulation_feasibility")
+async def simulation_feasibility(request: SimulationRequest):
+    """Dry run: validate and compile the scenario and estimate whether it can run, without simulating"""
+    # Unreachable stages are reported below instead of rejecting the request
+    walkable_area, scenario = await _validated_scenario(request, check_reachability=False)
+
+    # Exit assignment isn't checked, so skip building the walking-distance field
+    parameters = request.parameters.model_copy(update={"exit_assignment": "euclidean"})
+    try:
+        plan = await run_io(compile_scenario_plan, scenario.config, walkable_area, parameters)
+    except ValueError as plan_error:
+        return {
+            "feasible": False,
+            "errors": [str(plan_error)],
+            "warnings": [],
+            "total_agents": scenario.total_agents,
+            "distributions": [],
+        }
+    return await run_io(check_feasibility, plan, scenario.config, walkable_area, request.parameters.max_simulation_time)
+
+
 @router.get("/simulation_progress/{simulation_id}")
 async def get_simulation_progress(simulation_id: str):
     """Get progress for a specific simulation"""
@@ -349,25 +522,8 @@ async def get_simulation_progress(simulation_id: str):
             # Clean up both progress and results storage
             del simulation_progress[simulation_id]
             if simulation_id in results_storage:
-                result_data = results_storage[simulation_id]
-                # Clean up all SQLite files if they exist
-                if "sqlite_files" in result_data:
-                    for file_info in result_data["sqlite_files"]:
-                        try:
-                            if os.path.exists(file_info["file_path"]):
-                                os.unlink(file_info["file_path"])
-                        except Exception as e:
-                            print(f"Error deleting sqlite file {file_info['file_path']}: {e}")
-                
-                # Also handle the single file case for backward compatibility
-                elif "sqlite_file" in result_data and result_data["sqlite_file"]:
-                    try:
-                        if os.path.exists(result_data["sqlite_file"]):
-                            os.unlink(result_data["sqlite_file"])
-                    except Exception as e:
-                        print(f"Error deleting sqlite file {result_data['sqlite_file']}: {e}")
-
-                del results_storage[simulation_id]
+                # Clean up all SQLite files, the ensemble store and the job directory
+                await run_io(_delete_result_files, simulation_id, _discard_result(simulation_id))
     
     return progress_data
 
@@ -386,17 +542,18 @@ async def get_simulation_results(simulation_id: str):
     if simulation_id not in results_storage:
         raise HTTPException(status_code=500, detail="Results not available")
     
+    artifact_store.touch(simulation_id)
     results = results_storage[simulation_id].copy()
     
     # Check for trajectory data - support both old and new structure
     sqlite_file = results.get("sqlite_file") or results.get("primary_sqlite_file")
-    has_trajectory_data = sqlite_file is not None and os.path.exists(sqlite_file)
+    has_trajectory_data = sqlite_file is not None and await run_io(os.path.exists, sqlite_file)
     
     # Check for download availability
     sqlite_files = results.get("sqlite_files", [])
     download_requested = results.get("download_requested", False)
-    sqlite_download_available = download_requested and len(sqlite_files) > 0 and any(
-        os.path.exists(f["file_path"]) for f in sqlite_files
+    sqlite_download_available = download_requested and len(sqlite_files) > 0 and await run_io(
+        lambda: any(_seed_file_available(results, f) for f in sqlite_files)
     )
     
     # Create lightweight response
@@ -406,7 +563,6 @@ async def get_simulation_results(simulation_id: str):
         "execution_time": results["execution_time"],
         "evacuation_time": results["evacuation_time"],
         "total_agents": results["total_agents"],
-        "agent_radii": results["agent_radii"],
         "agents_evacuated": results["agents_evacuated"],
         "agents_remaining": results["agents_remaining"],
         "iterations_completed": results["iterations_completed"],
@@ -415,7 +571,11 @@ async def get_simulation_results(simulation_id: str):
         "max_simulation_time": results["max_simulation_time"],
         "model_type": results["model_type"],
         "total_frames": results.get("total_frames", 0),
-        "geometry_wkt": results.get("geometry_wkt", ""),
+        "geometry_hash": results.get("geometry_hash"),
+        "journey_variants": results.get("journey_variants"),
+        "journey_variants_pruned": results.get("journey_variants_pruned", 0),
+        "stagnation_time": results.get("stagnation_time"),
+        "agent_attribute_count": len(results["agent_table"]) if results.get("agent_table") is not None else 0,
         "has_trajectory_data": has_trajectory_data,
         "sqlite_download_available": sqlite_download_available,
         "primary_sqlite_file": sqlite_file,
@@ -425,6 +585,65 @@ async def get_simulation_results(simulation_id: str):
 
     return lightweight_results
 
+@router.get("/geometry/{geometry_hash}")
+async def get_geometry(geometry_hash: str):
+    """Get a stored geometry by its content hash (immutable, safe to cache)"""
+    
+    geometry_wkt = geometry_store.get(geometry_hash)
+    if geometry_wkt is None:
+        raise HTTPException(status_code=404, detail="Geometry not found")
+    
+    return JSONResponse(
+        {"geometry_hash": geometry_hash, "geometry_wkt": geometry_wkt},
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+@router.get("/simulation_agent_attributes/{simulation_id}")
+async def get_simulation_agent_attributes(
+    simulation_id: str,
+    offset: int = 0,
+    limit: int = 10_000,
+    format: str = "json"
+):
+    """Get per-agent attributes (id, radius) as paginated JSON columns or little-endian binary columns"""
+    
+    if format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail=f"Invalid format: '{format}'. Supported formats: json, binary")
+    
+    if simulation_id not in results_storage:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    
+    agent_table = results_storage[simulation_id].get("agent_table")
+    if agent_table is None:
+        raise HTTPException(status_code=404, detail="Agent attributes not available for this simulation")
+    
+    artifact_store.touch(simulation_id)
+    total = len(agent_table)
+    offset = min(max(offset, 0), total)
+    limit = min(max(limit, 1), 1_000_000)
+    end = min(offset + limit, total)
+    
+    if format == "binary":
+        return Response(
+            content=agent_table.to_bytes(offset, limit),
+            media_type="application/octet-stream",
+            headers={
+                "X-Agent-Count": str(end - offset),
+                "X-Total-Agents": str(total),
+                "X-Columns": AgentAttributeTable.binary_layout(),
+                "X-Next-Offset": str(end) if end < total else ""
+            }
+        )
+    
+    return {
+        "simulation_id": simulation_id,
+        "offset": offset,
+        "total": total,
+        "has_more": end < total,
+        "next_offset": end if end < total else None,
+        "columns": agent_table.page(offset, limit)
+    }
+
 @router.get("/simulation_trajectory/{simulation_id}")
 async def get_simulation_trajectory(
     simulation_id: str,
@@ -438,6 +657,7 @@ async def get_simulation_trajectory(
         raise HTTPException(status_code=404, detail="Simulation not found")
     
     result_data = results_storage[simulation_id]
+    artifact_store.touch(simulation_id)
     
     # Support both old and new structure
     sqlite_file = result_data.get("sqlite_file") or result_data.get("primary_sqlite_file")
@@ -445,48 +665,43 @@ async def get_simulation_trajectory(
     if not sqlite_file:
         raise HTTPException(status_code=404, detail="Trajectory data not available - no SQLite file")
     
-    if not os.path.exists(sqlite_file):
+    if not await run_io(os.path.exists, sqlite_file):
         raise HTTPException(status_code=404, detail="Trajectory data not available - SQLite file not found")
     
     try:
-        with TrajectoryStreamer(sqlite_file) as streamer:
-            total_frames = streamer.get_frame_count()
-            
-            if end_frame is None:
-                end_frame = total_frames
-            
-            # Limit chunk size to prevent memory issues
-            actual_end = min(start_frame + chunk_size, end_frame, total_frames)
-            
-            frames = []
-            for frame_data in streamer.stream_frames(start_frame, actual_end):
-                frames.append(frame_data)
-            
-            return {
-                "frames": frames,
-                "start_frame": start_frame,
-                "end_frame": actual_end,
-                "total_frames": total_frames,
-                "has_more": actual_end < total_frames,
-                "next_start_frame": actual_end if actual_end < total_frames else None
-            }
+        return await run_io(_read_trajectory_chunk, sqlite_file, start_frame, end_frame, chunk_size)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading trajectory: {str(e)}")
 
 @router.get("/simulation_sqlite/{simulation_id}")
-async def download_simulation_sqlite(simulation_id: str, seed: Optional[int] = None):
+async def download_simulation_sqlite(simulation_id: str, seed: Optional[int] = None, bundle: bool = False):
     """Download SQLite trajectory file(s) and remove from server"""
     
     if simulation_id not in results_storage:
         raise HTTPException(status_code=404, detail="Simulation not found")
     
     result_data = results_storage[simulation_id]
+    artifact_store.touch(simulation_id)
     
     sqlite_files = result_data.get("sqlite_files", [])
     
     if not sqlite_files:
         raise HTTPException(status_code=404, detail="SQLite files not available")
+
+    if bundle:
+        # All seeds as the single ensemble store (trajectory_data carries a run_id column)
+        store = result_data.get("ensemble_store")
+        if not store or not await run_io(os.path.exists, store):
+            raise HTTPException(status_code=404, detail="Ensemble store not available")
+
+        return StreamingResponse(
+            iterate_io(_iter_file(store)),
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": f"attachment; filename=simulation_{simulation_id}_ensemble.sqlite"
+            }
+        )
     
     if seed is not None:
         # Download specific seed
@@ -494,13 +709,11 @@ async def download_simulation_sqlite(simulation_id: str, seed: Optional[int] = N
         if not sqlite_info:
             raise HTTPException(status_code=404, detail=f"SQLite file for seed {seed} not found")
         
-        sqlite_file = sqlite_info["file_path"]
-        if not os.path.exists(sqlite_file):
+        if not await run_io(_seed_file_available, result_data, sqlite_info):
             raise HTTPException(status_code=404, detail="SQLite file no longer exists")
         
         try:
-            with open(sqlite_file, 'rb') as f:
-                file_content = f.read()
+            file_content = await run_io(_read_seed_file, result_data, sqlite_info)
             
             # Remove this specific file
             # os.unlink(sqlite_file)
@@ -523,31 +736,17 @@ async def download_simulation_sqlite(simulation_id: str, seed: Optional[int] = N
     
     else:
         # Download all as ZIP
-        import zipfile
-        
         try:
-            zip_buffer = io.BytesIO()
-            
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for sqlite_info in sqlite_files:
-                    sqlite_file = sqlite_info["file_path"]
-                    if os.path.exists(sqlite_file):
-                        zip_file.write(sqlite_file, f"simulation_seed_{sqlite_info['seed']}.sqlite")
+            zip_content = await run_io(_build_seed_zip, result_data)
             
             # Clean up all files after creating ZIP
-            for sqlite_info in sqlite_files:
-                try:
-                    os.unlink(sqlite_info["file_path"])
-                except:
-                    pass
+            await run_io(_delete_result_files, simulation_id, result_data)
             
             # Clear sqlite_files from storage
             result_data["sqlite_files"] = []
             
-            zip_buffer.seek(0)
-            
             return StreamingResponse(
-                io.BytesIO(zip_buffer.read()),
+                io.BytesIO(zip_content),
                 media_type="application/zip",
                 headers={
                     "Content-Disposition": f"attachment; filename=simulation_{simulation_id}_all_seeds.zip"
@@ -566,16 +765,18 @@ async def get_simulation_seeds(simulation_id: str):
         raise HTTPException(status_code=404, detail="Simulation not found")
     
     result_data = results_storage[simulation_id]
+    artifact_store.touch(simulation_id)
     sqlite_files = result_data.get("sqlite_files", [])
+    available = await run_io(lambda: [_seed_file_available(result_data, f) for f in sqlite_files])
     
     return {
         "seeds": [
             {
                 "seed": f["seed"],
                 "simulation_index": f["simulation_index"],
-                "available": os.path.exists(f["file_path"])
+                "available": is_available
             }
-            for f in sqlite_files
+            for f, is_available in zip(sqlite_files, available)
         ]
     }
 
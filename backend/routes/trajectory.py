@@ -0,0 +1,309 @@
+import importlib.util
+import os
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from shapely import wkt
+from shapely.geometry import MultiPolygon, Polygon
+
+from services.export_service import (
+    compute_agent_summary,
+    iter_agent_summary_csv,
+    iter_agent_summary_parquet,
+    iter_trajectory_csv,
+    iter_trajectory_parquet,
+)
+from models import TrajectoryQueryRequest
+from services.playback_service import ORIENTATION_SCALE, POSITION_SCALE, encode_delta_frames, iter_ndjson_frames
+from services.query_service import QUERY_AGGREGATES, WHOLE_AREA_REGION, QueryBudgetExceeded, run_trajectory_query
+from utils.artifact_store import artifact_store
+from utils.dependencies import iterate_io, results_storage, run_io
+from utils.ensemble_store import read_frame_across_runs
+from utils.frame_statistics import load_frame_statistics
+from utils.trajectory_loader import TrajectoryArrayLoader
+
+
+router = APIRouter()
+
+
+def _resolve_sqlite_file(simulation_id: str, seed: Optional[int] = None) -> Tuple[str, Optional[int]]:
+    """Find the stored trajectory for a simulation (optionally a specific seed).
+
+    Returns the SQLite file and, for seeds held only in the ensemble store, their run_id.
+    """
+    if simulation_id not in results_storage:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+
+    result_data = results_storage[simulation_id]
+    artifact_store.touch(simulation_id)
+
+    if seed is not None:
+        sqlite_info = next((f for f in result_data.get("sqlite_files", []) if f["seed"] == seed), None)
+        if not sqlite_info:
+            raise HTTPException(status_code=404, detail=f"SQLite file for seed {seed} not found")
+        sqlite_file = sqlite_info["file_path"]
+        store = result_data.get("ensemble_store")
+        if not sqlite_file and sqlite_info.get("run_id") is not None and store and os.path.exists(store):
+            return store, sqlite_info["run_id"]
+    else:
+        sqlite_file = result_data.get("sqlite_file") or result_data.get("primary_sqlite_file")
+
+    if not sqlite_file:
+        raise HTTPException(status_code=404, detail="Trajectory data not available - no SQLite file")
+
+    if not os.path.exists(sqlite_file):
+        raise HTTPException(status_code=404, detail="Trajectory data not available - SQLite file not found")
+
+    return sqlite_file, None
+
+
+@router.get("/simulation_export/{simulation_id}")
+async def export_simulation_data(
+    simulation_id: str,
+    format: str = "parquet",
+    table: str = "trajectory",
+    seed: Optional[int] = None,
+    chunk_rows: int = 250_000
+):
+    """Stream trajectory or per-agent summary as Parquet row groups or chunked CSV"""
+
+    if format not in ("parquet", "csv"):
+        raise HTTPException(status_code=400, detail=f"Invalid format: '{format}'. Supported formats: parquet, csv")
+
+    if table not in ("trajectory", "agents"):
+        raise HTTPException(status_code=400, detail=f"Invalid table: '{table}'. Supported tables: trajectory, agents")
+
+    if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow to be installed")
+
+    sqlite_file, run_id = await run_io(_resolve_sqlite_file, simulation_id, seed)
+    chunk_rows = min(max(chunk_rows, 1_000), 1_000_000)
+
+    if table == "trajectory":
+        content = (
+            iter_trajectory_parquet(sqlite_file, chunk_rows, run_id) if format == "parquet"
+            else iter_trajectory_csv(sqlite_file, chunk_rows, run_id)
+        )
+    else:
+        agent_table = results_storage[simulation_id].get("agent_table")
+
+        def iter_agent_summary():
+            # Computed lazily so the streaming pass runs on the I/O executor
+            summary = compute_agent_summary(sqlite_file, agent_table, chunk_rows, run_id)
+            if format == "parquet":
+                yield from iter_agent_summary_parquet(summary)
+            else:
+                yield from iter_agent_summary_csv(summary)
+
+        content = iter_agent_summary()
+
+    suffix = f"_seed_{seed}" if seed is not None else ""
+    return StreamingResponse(
+        iterate_io(content),
+        media_type="application/vnd.apache.parquet" if format == "parquet" else "text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename=simulation_{simulation_id}{suffix}_{table}.{format}"
+        }
+    )
+
+
+def _encode_delta_chunk(
+    sqlite_file: str,
+    start_frame: int,
+    end_frame: Optional[int],
+    chunk_size: int,
+    keyframe_interval: int,
+    include_orientation: bool
+) -> JSONResponse:
+    """Encode one delta chunk and render the JSON body (runs on the I/O executor)"""
+    with TrajectoryArrayLoader(sqlite_file) as loader:
+        total_frames = len(loader.get_frame_index()["frame"])
+
+        if end_frame is None:
+            end_frame = total_frames
+
+        actual_end = min(start_frame + chunk_size, end_frame, total_frames)
+
+        frames = encode_delta_frames(
+            loader, start_frame, actual_end, keyframe_interval, include_orientation
+        )
+
+        return JSONResponse({
+            "encoding": "delta",
+            "position_scale": POSITION_SCALE,
+            "orientation_scale": ORIENTATION_SCALE if include_orientation else None,
+            "frames": frames,
+            "start_frame": start_frame,
+            "end_frame": actual_end,
+            "total_frames": total_frames,
+            "has_more": actual_end < total_frames,
+            "next_start_frame": actual_end if actual_end < total_frames else None
+        })
+
+
+def _count_frames(sqlite_file: str, run_id: Optional[int] = None) -> int:
+    with TrajectoryArrayLoader(sqlite_file, run_id=run_id) as loader:
+        return len(loader.get_frame_index()["frame"])
+
+
+@router.get("/simulation_trajectory_delta/{simulation_id}")
+async def get_simulation_trajectory_delta(
+    simulation_id: str,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    chunk_size: int = 100,
+    keyframe_interval: int = 100,
+    include_orientation: bool = False
+):
+    """Get trajectory chunks as a keyframe plus quantized per-frame deltas for playback"""
+
+    sqlite_file, _ = await run_io(_resolve_sqlite_file, simulation_id)
+
+    try:
+        return await run_io(
+            _encode_delta_chunk,
+            sqlite_file, start_frame, end_frame, chunk_size, keyframe_interval, include_orientation
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading trajectory: {str(e)}")
+
+
+@router.get("/simulation_trajectory_stream/{simulation_id}")
+async def stream_simulation_trajectory(
+    simulation_id: str,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    seed: Optional[int] = None
+):
+    """Stream the whole trajectory as newline-delimited JSON frames over one connection.
+
+    Resume an interrupted transfer by passing the last received frame + 1 as start_frame.
+    """
+
+    sqlite_file, run_id = await run_io(_resolve_sqlite_file, simulation_id, seed)
+
+    try:
+        total_frames = await run_io(_count_frames, sqlite_file, run_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading trajectory: {str(e)}")
+
+    return StreamingResponse(
+        iterate_io(iter_ndjson_frames(sqlite_file, max(0, start_frame), end_frame, run_id)),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Total-Frames": str(total_frames),
+            "X-Start-Frame": str(max(0, start_frame)),
+        }
+    )
+
+
+@router.get("/simulation_frame_stats/{simulation_id}")
+async def get_simulation_frame_stats(simulation_id: str, seed: Optional[int] = None, stride: int = 1):
+    """Get precomputed per-frame statistics (agent count, speed, exit occupancy, bounds) as columns"""
+
+    sqlite_file, run_id = await run_io(_resolve_sqlite_file, simulation_id, seed)
+
+    try:
+        stats = await run_io(load_frame_statistics, sqlite_file, stride, run_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading frame statistics: {str(e)}")
+
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Frame statistics not available for this simulation")
+
+    return await run_io(JSONResponse, {"simulation_id": simulation_id, "stride": max(1, stride), **stats})
+
+
+@router.post("/simulation_query/{simulation_id}")
+async def query_simulation_trajectory(simulation_id: str, request: TrajectoryQueryRequest):
+    """Aggregate counts and speeds per region and time bin server-side, returning only the result"""
+
+    unknown = [name for name in request.aggregates if name not in QUERY_AGGREGATES]
+    if unknown or not request.aggregates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid aggregates: {unknown}. Supported aggregates: {', '.join(QUERY_AGGREGATES)}"
+        )
+
+    if any(not 0 <= q <= 100 for q in request.percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+
+    if request.end_time is not None and request.end_time <= request.start_time:
+        raise HTTPException(status_code=400, detail="end_time must be greater than start_time")
+
+    regions = {}
+    for region in request.regions:
+        try:
+            geometry = wkt.loads(region.wkt)
+        except Exception as wkt_error:
+            raise HTTPException(status_code=400, detail=f"Invalid WKT for region '{region.id}': {str(wkt_error)}")
+        if not isinstance(geometry, (Polygon, MultiPolygon)) or geometry.is_empty:
+            raise HTTPException(status_code=400, detail=f"Region '{region.id}' must be a non-empty polygon")
+        regions[region.id] = geometry
+    if not regions:
+        regions[WHOLE_AREA_REGION] = None
+
+    sqlite_file, run_id = await run_io(_resolve_sqlite_file, simulation_id, request.seed)
+
+    try:
+        result = await run_io(
+            run_trajectory_query,
+            sqlite_file,
+            regions,
+            request.aggregates,
+            request.percentiles,
+            bin_seconds=request.bin_seconds,
+            start_time=request.start_time,
+            end_time=request.end_time,
+            max_rows=request.max_rows,
+            max_seconds=request.max_seconds,
+            run_id=run_id,
+        )
+    except QueryBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running trajectory query: {str(e)}")
+
+    return {"simulation_id": simulation_id, "seed": request.seed, **result}
+
+
+def _read_ensemble_frame(store: str, frame: int) -> JSONResponse:
+    runs = read_frame_across_runs(store, frame)
+    return JSONResponse({
+        "frame": frame,
+        "seeds": [
+            {
+                "seed": seed,
+                "agents": [
+                    {"id": agent_id, "x": x, "y": y, "ori_x": ori_x, "ori_y": ori_y}
+                    for agent_id, x, y, ori_x, ori_y in zip(
+                        data["id"].tolist(), data["x"].tolist(), data["y"].tolist(),
+                        data["ori_x"].tolist(), data["ori_y"].tolist()
+                    )
+                ]
+            }
+            for seed, data in sorted(runs.items())
+        ]
+    })
+
+
+@router.get("/simulation_ensemble_frame/{simulation_id}")
+async def get_simulation_ensemble_frame(simulation_id: str, frame: int = 0):
+    """Get one frame from every seed of a multi-seed run in a single indexed read"""
+
+    if simulation_id not in results_storage:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+
+    store = results_storage[simulation_id].get("ensemble_store")
+    if not store or not await run_io(os.path.exists, store):
+        raise HTTPException(status_code=404, detail="Ensemble store not available for this simulation")
+
+    try:
+        return await run_io(_read_ensemble_frame, store, frame)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading ensemble frame: {str(e)}")
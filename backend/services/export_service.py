@@ -0,0 +1,212 @@
+import base64
+import io
+from typing import Dict, Generator, Optional
+
+import numpy as np
+
+from utils.agent_table import AgentAttributeTable
+from utils.data_processing import get_trajectory_fps
+from utils.trajectory_loader import TRAJECTORY_COLUMNS, TrajectoryArrayLoader
+
+CSV_FORMATS = {
+    "frame": "%d",
+    "id": "%d",
+    "x": "%.6f",
+    "y": "%.6f",
+    "ori_x": "%.6f",
+    "ori_y": "%.6f",
+}
+
+PARQUET_FRAME_INDEX_KEY = "crowdflow.frame_index.frame"
+PARQUET_FRAME_OFFSET_KEY = "crowdflow.frame_index.offset"
+
+AGENT_SUMMARY_COLUMNS = (
+    "id", "first_frame", "last_frame", "frame_count",
+    "path_length", "mean_speed", "radius",
+)
+
+
+class _StreamSink:
+    """Write-only file object that hands written bytes back out in pieces.
+
+    Parquet footers store absolute offsets, so ``tell`` keeps counting across
+    drains even though the data itself is released.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_trajectory_csv(
+    sqlite_file: str, chunk_rows: int = 100_000, run_id: Optional[int] = None
+) -> Generator[bytes, None, None]:
+    """Stream the trajectory as CSV, one encoded block per loader chunk"""
+    yield (",".join(TRAJECTORY_COLUMNS) + "\n").encode()
+
+    with TrajectoryArrayLoader(sqlite_file, chunk_rows, run_id) as loader:
+        for chunk in loader.iter_chunks():
+            yield _encode_csv_block(chunk, TRAJECTORY_COLUMNS, CSV_FORMATS)
+
+
+def iter_trajectory_parquet(
+    sqlite_file: str, chunk_rows: int = 250_000, run_id: Optional[int] = None
+) -> Generator[bytes, None, None]:
+    """Stream the trajectory as Parquet, writing one row group per loader chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("frame", pa.int32()),
+        ("id", pa.int32()),
+        ("x", pa.float64()),
+        ("y", pa.float64()),
+        ("ori_x", pa.float64()),
+        ("ori_y", pa.float64()),
+    ])
+    sink = _StreamSink()
+
+    with TrajectoryArrayLoader(sqlite_file, chunk_rows, run_id) as loader:
+        # Carry the frame -> row offset index so archive readers can seek directly
+        index = loader.get_frame_index()
+        schema = schema.with_metadata({
+            PARQUET_FRAME_INDEX_KEY: _pack_int64(index["frame"]),
+            PARQUET_FRAME_OFFSET_KEY: _pack_int64(index["offset"]),
+        })
+
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for chunk in loader.iter_chunks():
+                writer.write_table(pa.Table.from_pydict(chunk, schema=schema))
+                yield sink.drain()
+
+    yield sink.drain()
+
+
+def compute_agent_summary(
+    sqlite_file: str,
+    agent_table: Optional[AgentAttributeTable] = None,
+    chunk_rows: int = 250_000,
+    run_id: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Compute per-agent lifetime, path length and mean speed in one streaming pass"""
+    fps = get_trajectory_fps(sqlite_file)
+
+    with TrajectoryArrayLoader(sqlite_file, chunk_rows, run_id) as loader:
+        size = loader.get_max_agent_id() + 1
+
+        first_frame = np.full(size, -1, dtype=np.int64)
+        last_frame = np.full(size, -1, dtype=np.int64)
+        frame_count = np.zeros(size, dtype=np.int64)
+        path_length = np.zeros(size, dtype=np.float64)
+        last_x = np.zeros(size, dtype=np.float64)
+        last_y = np.zeros(size, dtype=np.float64)
+
+        for chunk in loader.iter_chunks():
+            order = np.lexsort((chunk["frame"], chunk["id"]))
+            ids = chunk["id"][order]
+            frames = chunk["frame"][order]
+            xs = chunk["x"][order]
+            ys = chunk["y"][order]
+
+            # Previous position per row: the row before for the same agent, or the
+            # position carried over from earlier chunks for its first row here
+            is_first = np.empty(len(ids), dtype=bool)
+            is_first[:1] = True
+            is_first[1:] = ids[1:] != ids[:-1]
+            prev_x = np.roll(xs, 1)
+            prev_y = np.roll(ys, 1)
+            prev_x[is_first] = last_x[ids[is_first]]
+            prev_y[is_first] = last_y[ids[is_first]]
+
+            step = np.hypot(xs - prev_x, ys - prev_y)
+            step[is_first & (first_frame[ids] < 0)] = 0.0
+            np.add.at(path_length, ids, step)
+            np.add.at(frame_count, ids, 1)
+
+            unseen = is_first & (first_frame[ids] < 0)
+            first_frame[ids[unseen]] = frames[unseen]
+
+            is_last = np.empty(len(ids), dtype=bool)
+            is_last[-1:] = True
+            is_last[:-1] = ids[:-1] != ids[1:]
+            last_frame[ids[is_last]] = frames[is_last]
+            last_x[ids[is_last]] = xs[is_last]
+            last_y[ids[is_last]] = ys[is_last]
+
+    present = np.flatnonzero(frame_count)
+    duration = (last_frame[present] - first_frame[present]) / fps
+
+    return {
+        "id": present,
+        "first_frame": first_frame[present],
+        "last_frame": last_frame[present],
+        "frame_count": frame_count[present],
+        "path_length": path_length[present],
+        "mean_speed": np.divide(
+            path_length[present], duration,
+            out=np.zeros(len(present)), where=duration > 0
+        ),
+        "radius": (
+            agent_table.lookup("radius", present) if agent_table is not None
+            else np.full(len(present), np.nan)
+        ),
+    }
+
+
+def iter_agent_summary_csv(summary: Dict[str, np.ndarray]) -> Generator[bytes, None, None]:
+    """Stream an agent summary as CSV"""
+    yield (",".join(AGENT_SUMMARY_COLUMNS) + "\n").encode()
+    formats = {
+        "id": "%d", "first_frame": "%d", "last_frame": "%d", "frame_count": "%d",
+        "path_length": "%.4f", "mean_speed": "%.4f", "radius": "%.3f",
+    }
+    yield _encode_csv_block(summary, AGENT_SUMMARY_COLUMNS, formats)
+
+
+def iter_agent_summary_parquet(summary: Dict[str, np.ndarray]) -> Generator[bytes, None, None]:
+    """Stream an agent summary as a single-row-group Parquet file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _StreamSink()
+    pq.write_table(pa.Table.from_pydict(summary), sink, compression="zstd")
+    yield sink.drain()
+
+
+def _pack_int64(values: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(values, dtype="<i8").tobytes()).decode()
+
+
+def _encode_csv_block(columns: Dict[str, np.ndarray], names, formats: Dict[str, str]) -> bytes:
+    """Format a block of columnar arrays as CSV lines"""
+    if len(columns[names[0]]) == 0:
+        return b""
+    buffer = io.StringIO()
+    np.savetxt(
+        buffer,
+        np.column_stack([columns[name] for name in names]),
+        fmt=[formats[name] for name in names],
+        delimiter=",",
+    )
+    return buffer.getvalue().encode()
@@ -1,12 +1,13 @@
 import jupedsim as jps
-from shapely import wkt
+from utils.dependencies import run_io
+from utils.geometry_cache import geometry_cache
 from models import JourneyPathRequest, JourneyPathResponse
 
 async def compute_shortest_paths(request: JourneyPathRequest) -> JourneyPathResponse:
     """Compute shortest paths for journey connections using JupedSim routing engine"""
     try:
         # Parse walkable area geometry
-        geometry = wkt.loads(request.walkable_area_wkt)
+        geometry = (await run_io(geometry_cache.get, request.walkable_area_wkt)).geometry
         
         # Create routing engine
         routing_engine = jps.RoutingEngine(geometry)
@@ -0,0 +1,157 @@
+import json
+import sqlite3
+from typing import Any, Dict, Generator, List, Optional
+
+import numpy as np
+
+from utils.trajectory_loader import TrajectoryArrayLoader
+
+# Positions (metres) and orientations (unit vectors) are sent as integers of 1/1000
+POSITION_SCALE = 1000
+ORIENTATION_SCALE = 1000
+
+
+def iter_frame_arrays(
+    loader: TrajectoryArrayLoader, start_frame: int, end_frame: Optional[int]
+) -> Generator[Dict[str, np.ndarray], None, None]:
+    """Split frame-aligned loader chunks into one dict of arrays per frame"""
+    for chunk in loader.iter_chunks(start_frame, end_frame):
+        frame_starts = np.flatnonzero(np.diff(chunk["frame"], prepend=-1))
+        frame_ends = np.append(frame_starts[1:], len(chunk["frame"]))
+        for start, end in zip(frame_starts, frame_ends):
+            yield {name: values[start:end] for name, values in chunk.items()}
+
+
+def _quantize(values: np.ndarray, scale: int) -> np.ndarray:
+    return np.rint(values * scale).astype(np.int64)
+
+
+def encode_delta_frames(
+    loader: TrajectoryArrayLoader,
+    start_frame: int,
+    end_frame: Optional[int],
+    keyframe_interval: int = 100,
+    include_orientation: bool = False,
+) -> List[Dict[str, Any]]:
+    """Encode frames as a keyframe followed by per-frame deltas of quantized positions.
+
+    Keyframe: ``{"frame", "keyframe": True, "ids", "x", "y"}`` with absolute values.
+    Delta frame: ``{"frame", "removed", "added": {"ids", "x", "y"}, "dx", "dy"}`` where
+    ``dx``/``dy`` apply, in ascending id order, to the agents present in both frames.
+    Deltas are taken between quantized values, so decoding is exact and does not drift.
+    The first frame of every response is a keyframe.
+    """
+    keyframe_interval = max(1, keyframe_interval)
+    fields = ("x", "y", "ori_x", "ori_y") if include_orientation else ("x", "y")
+    scales = {"x": POSITION_SCALE, "y": POSITION_SCALE, "ori_x": ORIENTATION_SCALE, "ori_y": ORIENTATION_SCALE}
+
+    encoded = []
+    prev_ids = None
+    prev_values = None
+    frames_since_key = 0
+
+    for frame in iter_frame_arrays(loader, start_frame, end_frame):
+        ids = frame["id"]
+        values = {name: _quantize(frame[name], scales[name]) for name in fields}
+        frame_number = int(frame["frame"][0])
+
+        if prev_ids is None or frames_since_key >= keyframe_interval:
+            entry = {"frame": frame_number, "keyframe": True, "ids": ids.tolist()}
+            entry.update({name: values[name].tolist() for name in fields})
+            frames_since_key = 0
+        else:
+            # Rows are sorted by id within a frame, so set operations keep that order
+            _, cur_idx, prev_idx = np.intersect1d(ids, prev_ids, assume_unique=True, return_indices=True)
+            added_mask = np.ones(len(ids), dtype=bool)
+            added_mask[cur_idx] = False
+
+            entry = {
+                "frame": frame_number,
+                "removed": np.setdiff1d(prev_ids, ids, assume_unique=True).tolist(),
+                "added": {"ids": ids[added_mask].tolist()},
+            }
+            entry["added"].update({name: values[name][added_mask].tolist() for name in fields})
+            entry.update({
+                f"d{name}": (values[name][cur_idx] - prev_values[name][prev_idx]).tolist()
+                for name in fields
+            })
+
+        encoded.append(entry)
+        prev_ids = ids
+        prev_values = values
+        frames_since_key += 1
+
+    return encoded
+
+
+def _ndjson_frame_line(frame: int, agents: List[Dict[str, Any]]) -> str:
+    return json.dumps({"frame": frame, "agents": agents}, separators=(",", ":")) + "\n"
+
+
+def iter_ndjson_frames(
+    sqlite_file: str,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    run_id: Optional[int] = None,
+    fetch_rows: int = 10_000,
+    flush_bytes: int = 64 * 1024,
+) -> Generator[bytes, None, None]:
+    """Stream frames as newline-delimited JSON from a single forward cursor.
+
+    Each line is one frame in the ``/simulation_trajectory`` shape
+    (``{"frame", "agents": [{"agent_id", "x", "y", "ori_x", "ori_y"}]}``).
+    Rows are pulled ``fetch_rows`` at a time and lines are yielded in blocks of
+    about ``flush_bytes``; the next block is only read once the previous one has
+    been sent, so a slow client throttles the cursor and memory stays constant.
+    Frames are emitted whole, so a client can resume from ``last frame + 1``.
+    """
+    conditions = ["frame >= ?"]
+    params = [start_frame]
+    if end_frame is not None:
+        conditions.append("frame < ?")
+        params.append(end_frame)
+    if run_id is not None:
+        conditions.append("run_id = ?")
+        params.append(run_id)
+
+    # The generator may be resumed on different worker threads between blocks
+    conn = sqlite3.connect(sqlite_file, check_same_thread=False)
+    try:
+        cursor = conn.execute(f"""
+            SELECT frame, id, pos_x, pos_y, ori_x, ori_y
+            FROM trajectory_data
+            WHERE {' AND '.join(conditions)}
+            ORDER BY frame, id
+        """, params)
+
+        buffer = []
+        buffered = 0
+        current_frame = None
+        agents = []
+
+        while True:
+            rows = cursor.fetchmany(fetch_rows)
+            for frame, agent_id, x, y, ori_x, ori_y in rows:
+                if frame != current_frame:
+                    if agents:
+                        line = _ndjson_frame_line(current_frame, agents)
+                        buffer.append(line)
+                        buffered += len(line)
+                    current_frame = frame
+                    agents = []
+                agents.append({"agent_id": agent_id, "x": x, "y": y, "ori_x": ori_x, "ori_y": ori_y})
+
+            if not rows and agents:
+                line = _ndjson_frame_line(current_frame, agents)
+                buffer.append(line)
+                buffered += len(line)
+
+            if buffer and (buffered >= flush_bytes or not rows):
+                yield "".join(buffer).encode()
+                buffer = []
+                buffered = 0
+
+            if not rows:
+                break
+    finally:
+        conn.close()
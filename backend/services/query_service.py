@@ -0,0 +1,189 @@
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from utils.data_processing import get_trajectory_fps
+from utils.frame_statistics import AgentSpeedTracker, grouped_percentile
+from utils.trajectory_loader import TrajectoryArrayLoader
+
+QUERY_AGGREGATES = ("max_count", "mean_count", "agent_count", "mean_speed", "speed_percentiles")
+
+# Label used for the result when no region filter is given
+WHOLE_AREA_REGION = "all"
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a query would scan more rows than its budget allows"""
+
+
+def _json_column(values: np.ndarray) -> List[Optional[float]]:
+    if values.dtype.kind == "f":
+        return [None if math.isnan(v) else v for v in np.round(values, 3).tolist()]
+    return values.tolist()
+
+
+def run_trajectory_query(
+    sqlite_file: str,
+    regions: Dict[str, Optional[BaseGeometry]],
+    aggregates: List[str],
+    percentiles: List[float],
+    bin_seconds: Optional[float] = None,
+    start_time: float = 0.0,
+    end_time: Optional[float] = None,
+    max_rows: int = 5_000_000,
+    max_seconds: float = 10.0,
+    run_id: Optional[int] = None,
+    chunk_rows: int = 250_000,
+) -> Dict[str, Any]:
+    """Aggregate agent counts and speeds per region and time bin in one streaming pass.
+
+    ``regions`` maps an id to a polygon, or to None for the whole area. Bins are
+    ``bin_seconds`` wide starting at ``start_time`` (a single bin if omitted).
+    Counts are per frame (``max_count``/``mean_count`` over the frames of a bin)
+    or distinct agents (``agent_count``); speeds are taken per stored sample.
+
+    The row budget is checked up front from the frame index and raises
+    QueryBudgetExceeded. The time budget is checked between chunks; when it
+    runs out the partial result is returned with ``complete`` set to False.
+    """
+    started = time.perf_counter()
+    fps = get_trajectory_fps(sqlite_file)
+    needs_speed = "mean_speed" in aggregates or "speed_percentiles" in aggregates
+
+    prepared = {}
+    for region_id, geometry in regions.items():
+        if geometry is not None:
+            shapely.prepare(geometry)
+        prepared[region_id] = geometry
+
+    def bin_of(frame_numbers: np.ndarray) -> np.ndarray:
+        if not bin_seconds:
+            return np.zeros(len(frame_numbers), dtype=np.int64)
+        return np.floor((frame_numbers / fps - start_time) / bin_seconds + 1e-9).astype(np.int64)
+
+    with TrajectoryArrayLoader(sqlite_file, chunk_rows, run_id) as loader:
+        index = loader.get_frame_index()
+        frames, offsets = index["frame"], index["offset"]
+        start_frame = math.ceil(start_time * fps - 1e-9)
+        end_frame = None if end_time is None else math.ceil(end_time * fps - 1e-9)
+        first = int(np.searchsorted(frames, start_frame, side="left"))
+        last = len(frames) if end_frame is None else int(np.searchsorted(frames, end_frame, side="left"))
+
+        rows_in_range = int(offsets[last] - offsets[first]) if last > first else 0
+        if rows_in_range > max_rows:
+            raise QueryBudgetExceeded(
+                f"Query covers {rows_in_range} trajectory rows, over the budget of {max_rows}; "
+                f"narrow the time range or raise max_rows"
+            )
+
+        n_bins = int(bin_of(frames[last - 1:last])[0]) + 1 if last > first else 0
+        max_agent_id = loader.get_max_agent_id()
+        speeds = AgentSpeedTracker(max_agent_id, fps) if needs_speed else None
+
+        scanned_frames = []
+        frame_counts = {region_id: [] for region_id in prepared}
+        agent_keys = {region_id: [] for region_id in prepared}
+        speed_sums = {region_id: np.zeros(n_bins) for region_id in prepared}
+        speed_counts = {region_id: np.zeros(n_bins, dtype=np.int64) for region_id in prepared}
+        speed_samples = {region_id: [] for region_id in prepared}
+
+        # Speeds need each agent's previous sample, so start one stored frame early
+        load_from = int(frames[first - 1]) if needs_speed and first > 0 else start_frame
+        rows_scanned = 0
+        complete = True
+
+        for chunk in (loader.iter_chunks(load_from, end_frame) if last > first else ()):
+            rows_scanned += len(chunk["frame"])
+            speed = speeds.update(chunk["frame"], chunk["id"], chunk["x"], chunk["y"]) if needs_speed else None
+
+            keep = chunk["frame"] >= start_frame
+            chunk_frames, ids, xs, ys = (chunk[name][keep] for name in ("frame", "id", "x", "y"))
+            if len(chunk_frames) == 0:
+                continue
+            if needs_speed:
+                speed = speed[keep]
+
+            starts = np.flatnonzero(np.diff(chunk_frames, prepend=-1))
+            counts = np.diff(np.append(starts, len(chunk_frames)))
+            group = np.repeat(np.arange(len(starts)), counts)
+            frame_numbers = chunk_frames[starts]
+            row_bin = bin_of(frame_numbers)[group]
+            scanned_frames.append(frame_numbers)
+
+            for region_id, geometry in prepared.items():
+                inside = np.ones(len(ids), dtype=bool) if geometry is None else shapely.contains_xy(geometry, xs, ys)
+                frame_counts[region_id].append(np.bincount(group[inside], minlength=len(starts)))
+
+                if "agent_count" in aggregates:
+                    agent_keys[region_id].append(np.unique(row_bin[inside] * (max_agent_id + 1) + ids[inside]))
+
+                if needs_speed:
+                    valid = inside & ~np.isnan(speed)
+                    speed_sums[region_id] += np.bincount(row_bin[valid], weights=speed[valid], minlength=n_bins)
+                    speed_counts[region_id] += np.bincount(row_bin[valid], minlength=n_bins)
+                    if "speed_percentiles" in aggregates:
+                        speed_samples[region_id].append((row_bin[valid], speed[valid]))
+
+            if time.perf_counter() - started > max_seconds:
+                complete = False
+                break
+
+    scanned = np.concatenate(scanned_frames) if scanned_frames else np.empty(0, dtype=np.int64)
+    frame_bin = bin_of(scanned)
+    frames_per_bin = np.bincount(frame_bin, minlength=n_bins)
+
+    results = []
+    for region_id in prepared:
+        region_result = {"id": region_id}
+        counts = np.concatenate(frame_counts[region_id]) if frame_counts[region_id] else np.empty(0, dtype=np.int64)
+
+        if "max_count" in aggregates:
+            max_count = np.zeros(n_bins, dtype=np.int64)
+            np.maximum.at(max_count, frame_bin, counts)
+            region_result["max_count"] = _json_column(max_count)
+
+        if "mean_count" in aggregates:
+            count_sums = np.bincount(frame_bin, weights=counts, minlength=n_bins)
+            region_result["mean_count"] = _json_column(np.divide(
+                count_sums, frames_per_bin, out=np.full(n_bins, np.nan), where=frames_per_bin > 0
+            ))
+
+        if "agent_count" in aggregates:
+            keys = np.unique(np.concatenate(agent_keys[region_id])) if agent_keys[region_id] else np.empty(0, dtype=np.int64)
+            region_result["agent_count"] = _json_column(np.bincount(keys // (max_agent_id + 1), minlength=n_bins))
+
+        if "mean_speed" in aggregates:
+            region_result["mean_speed"] = _json_column(np.divide(
+                speed_sums[region_id], speed_counts[region_id],
+                out=np.full(n_bins, np.nan), where=speed_counts[region_id] > 0
+            ))
+
+        if "speed_percentiles" in aggregates:
+            samples = speed_samples[region_id]
+            sample_bins = np.concatenate([b for b, _ in samples]) if samples else np.empty(0, dtype=np.int64)
+            sample_speeds = np.concatenate([s for _, s in samples]) if samples else np.empty(0)
+            order = np.lexsort((sample_speeds, sample_bins))
+            bin_counts = np.bincount(sample_bins, minlength=n_bins)
+            bin_starts = np.concatenate(([0], np.cumsum(bin_counts)[:-1])) if n_bins else np.empty(0, dtype=np.int64)
+            region_result["speed_percentiles"] = {
+                f"p{q:g}": _json_column(grouped_percentile(sample_speeds[order], bin_starts, bin_counts, q))
+                for q in percentiles
+            }
+
+        results.append(region_result)
+
+    return {
+        "fps": fps,
+        "bin_seconds": bin_seconds,
+        "bin_start_times": _json_column(start_time + np.arange(n_bins) * (bin_seconds or 0.0)),
+        "frames_per_bin": _json_column(frames_per_bin),
+        "regions": results,
+        "rows_scanned": rows_scanned,
+        "complete": complete,
+        "scanned_until_time": round(float(scanned[-1]) / fps, 3) if len(scanned) else None,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -3,15 +3,23 @@ import multiprocessing
 import os
 import pathlib
 import tempfile
-import json
 import time
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import jupedsim as jps
 import pedpy
-from utils.simulation_init import initialize_simulation_from_json,create_agent_parameters
+from utils.simulation_init import create_agent_parameters
+from utils.scenario_plan import ScenarioPlan, compile_scenario_plan, spawn_order
 from models import SimulationParameters, SimulationRequest
-from utils.validation import calculate_total_agents, validate_and_process_config
+from utils.validation import Scenario
+from utils.agent_table import AgentAttributeTable
+from utils.artifact_store import artifact_store
+from utils.geometry_cache import SharedGeometry, geometry_cache
+from utils.placement_cache import placement_cache
 from utils.data_processing import get_trajectory_info, get_geometry_wkt
+from utils.ensemble_store import consolidate_runs
+from utils.frame_statistics import build_frame_statistics
+from utils.stagnation import StagnationDetector
+from utils.trajectory_loader import build_frame_index
 from utils.dependencies import simulation_progress, results_storage
 
 def get_model_instance(model_type: str, parameters: SimulationParameters = None):
@@ -46,19 +54,24 @@ def update_progress(simulation_id: str, stage: str, progress: float, message: st
     }
 
 def run_simulation_with_visualization_progress(
-   json_path: str, 
+   scenario: Scenario, 
    walkable_area: pedpy.WalkableArea, 
    parameters: SimulationParameters,
    simulation_id: str,
-   seed: int = 420
-) -> tuple[Dict[str, Any], str, Dict[int, float], str]:
-   """Run simulation with progress updates and return metrics plus trajectory data"""
+   seed: int = 420,
+   output_dir: Optional[str] = None,
+   plan: Optional[ScenarioPlan] = None
+) -> tuple[Dict[str, Any], str, AgentAttributeTable, str]:
+   """Run simulation with progress updates and return metrics plus trajectory data.
+
+   ``plan`` is the scenario compiled for the whole job; it is compiled here when not given.
+   """
    start_time = time.time()
    total_start_time = time.time()
    try:
        update_progress(simulation_id, "setup", 0, "Initializing simulation...")
        
-       temp_output = tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False)
+       temp_output = tempfile.NamedTemporaryFile(suffix=".sqlite", dir=output_dir, delete=False)
        output_file = temp_output.name
        temp_output.close()
        
@@ -66,36 +79,27 @@ def run_simulation_with_visualization_progress(
        
        model = get_model_instance(parameters.model_type, parameters)
        
+       trajectory_writer = jps.SqliteTrajectoryWriter(
+           output_file=pathlib.Path(output_file), 
+           every_nth_frame=4
+       )
        simulation = jps.Simulation(
            model=model,
            geometry=walkable_area.polygon,
-           trajectory_writer=jps.SqliteTrajectoryWriter(
-               output_file=pathlib.Path(output_file), 
-               every_nth_frame=4
-           ),
+           trajectory_writer=trajectory_writer,
        )
        
-       update_progress(simulation_id, "setup", 10, "Loading configuration...")
-       
-       with open(json_path, 'r') as f:
-           config = json.load(f)
-       
-       update_progress(simulation_id, "config", 15, "Validating configuration...")
-       
-       processed_config = validate_and_process_config(config)
-       expected_total_agents = calculate_total_agents(processed_config)
-       
-       with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
-           json.dump(processed_config, temp_file, indent=2)
-           processed_json_path = temp_file.name
+       # The scenario was validated once by the caller and is shared read-only across seeds
+       expected_total_agents = scenario.total_agents
+       if plan is None:
+           plan = compile_scenario_plan(scenario.config, walkable_area, parameters)
        
        update_progress(simulation_id, "config", 20, f"Initializing {expected_total_agents} agents...")
        
-       _, positions, agent_radii, spawning_info = initialize_simulation_from_json(
-           processed_json_path, 
-           simulation, 
-           walkable_area, 
-           seed=seed,
+       # Only per-seed work happens here: stage registration, placement and agent insertion
+       _, positions, agent_radii, spawning_info = plan.instantiate(
+           simulation,
+           seed,
            model_type=parameters.model_type,
            global_parameters=parameters
        )
@@ -127,6 +131,11 @@ def run_simulation_with_visualization_progress(
        last_reported_progress = 30
        update_progress(simulation_id, "simulation", 30, "Starting simulation...")
        
+       # Optional early stop for deadlocks; frames up to the detection stay in the trajectory
+       stagnation = None
+       if parameters.stagnation_window > 0:
+           stagnation = StagnationDetector(parameters.stagnation_window, parameters.stagnation_displacement)
+       
        # Debug initial state
        if has_flow_spawning:
            print(f"DEBUG: Starting simulation with flow spawning enabled")
@@ -178,8 +187,7 @@ def run_simulation_with_visualization_progress(
                        for i in range(spawning_freqs_and_numbers[source_id][1]):
                            # loop over possible positions
                            spawned_this_attempt = False
-                           for j in range(len(starting_pos_per_source[source_id])):
-                               pos_index = (agent_counter_per_source[source_id] + j) % len(starting_pos_per_source[source_id])
+                           for pos_index in spawn_order(starting_pos_per_source[source_id], agent_counter_per_source[source_id]):
                                position = starting_pos_per_source[source_id][pos_index]
                                
                                
@@ -230,13 +238,8 @@ def run_simulation_with_visualization_progress(
                                                print(f"DEBUG: Flow agent assigned to journey {selected_variant['id']} ({selected_variant.get('percentage', 0)}%), stage {spawning_info['stage_map'][stage]}")
                                                break
                                    else:
-                                       # Fallback case - assign to nearest exit
-                                       from utils.simulation_init import _find_nearest_exit
-                                       nearest_exit_stage_id = _find_nearest_exit(
-                                           position, 
-                                           spawning_info['stage_map'], 
-                                           spawning_info['exits']
-                                       )
+                                       # Fallback case - nearest exit, precomputed per start position
+                                       nearest_exit_stage_id = int(spawning_info['nearest_exit_per_source'][source_id][pos_index])
                                        nearest_journey_id = spawning_info['exit_to_journey'][nearest_exit_stage_id]
                                        
                                        agent_parameters.journey_id = nearest_journey_id
@@ -276,8 +279,17 @@ def run_simulation_with_visualization_progress(
            
            simulation.iterate()
            
+           if stagnation is not None and stagnation.observe(simulation):
+               print(f"Stagnation at {stagnation.detected_at:.1f}s: {stagnation.stuck_agents} agents moved "
+                     f"{stagnation.mean_displacement:.3f} m on average in {parameters.stagnation_window}s")
+               break
            
            if simulation.iteration_count() % progress_update_interval == 0:
+            if output_dir and artifact_store.exceeds_job_quota(output_dir):
+                raise Exception(
+                    f"Simulation output exceeds the per-job storage quota of {artifact_store.job_quota_bytes / 1e6:.1f} MB"
+                )
+
             # Calculate progress based on both time and agent evacuation
             time_progress = min(simulation.elapsed_time() / parameters.max_simulation_time, 1.0)
             
@@ -329,6 +341,14 @@ def run_simulation_with_visualization_progress(
            status = "completed"
            success = True
            message = "All agents successfully evacuated"
+       elif stagnation is not None and stagnation.detected_at is not None:
+           status = "stagnated"
+           success = False
+           message = (
+               f"Simulation stopped at {stagnation.detected_at:.1f}s with {final_agent_count} agents remaining: "
+               f"no agent exited and agents moved {stagnation.mean_displacement:.2f} m on average "
+               f"in the last {parameters.stagnation_window}s"
+           )
        elif simulation.elapsed_time() >= parameters.max_simulation_time:
            status = "timeout_time"
            success = False
@@ -338,10 +358,21 @@ def run_simulation_with_visualization_progress(
            success = False
            message = f"Simulation stopped at iteration limit with {final_agent_count} agents remaining"
        
+       evacuation_time = simulation.elapsed_time()
+       iterations_completed = simulation.iteration_count()
+       
+       # Flush buffered frames and release the write lock before reading the file back
+       if hasattr(trajectory_writer, "close"):
+           trajectory_writer.close()
+       del simulation
+       
        update_progress(simulation_id, "finalization", 95, "Extracting trajectory data...")
        
+       build_frame_index(output_file)
+       build_frame_statistics(output_file, scenario.exits)
        trajectory_info = get_trajectory_info(output_file)
        geometry_wkt = get_geometry_wkt(output_file)
+       agent_table = AgentAttributeTable.from_radii(agent_radii)
        
        update_progress(simulation_id, "completed", 100, "Simulation completed!")
        total_end_time = time.time()
@@ -349,12 +380,6 @@ def run_simulation_with_visualization_progress(
        execution_time = end_time - start_time
        print("execution time:", execution_time)
        
-       # DON'T delete the SQLite file yet - keep it for data extraction
-       try:
-           os.unlink(processed_json_path)
-       except:
-           pass
-       
        # Calculate total agents including flow spawning
        total_agents_final = initial_agent_count
        if has_flow_spawning:
@@ -364,16 +389,20 @@ def run_simulation_with_visualization_progress(
            "simulation_id": simulation_id,
            "status": status,
            "execution_time": round(execution_time, 2),
-           "evacuation_time": round(simulation.elapsed_time(), 2),
+           "evacuation_time": round(evacuation_time, 2),
            "total_agents": total_agents_final,
-           "agent_radii": agent_radii,
            "agents_evacuated": total_agents_final - final_agent_count,
            "agents_remaining": final_agent_count,
-           "iterations_completed": simulation.iteration_count(),
+           "iterations_completed": iterations_completed,
            "success": success,
            "message": message,
            "max_simulation_time": parameters.max_simulation_time,
-           "model_type": parameters.model_type
+           "model_type": parameters.model_type,
+           "agent_insertion_time": round(spawning_info.get('agent_insertion', {}).get('seconds', 0.0), 3),
+           "journey_variants": len(plan.variants),
+           "journey_variants_pruned": plan.variants_pruned,
+           "journey_variant_time": round(plan.variant_seconds, 3),
+           "stagnation_time": round(stagnation.detected_at, 2) if stagnation is not None and stagnation.detected_at is not None else None
        }
 
        print("Metrics from run_simulation_with_visualization_progress:", metrics)
@@ -381,8 +410,7 @@ def run_simulation_with_visualization_progress(
        results_storage[simulation_id] = {
            **metrics,
            "total_frames": trajectory_info["frame_count"],
-           "geometry_wkt": geometry_wkt,
-           "agent_radii": agent_radii,
+           "agent_table": agent_table,
            "sqlite_file": output_file if parameters.download_sqlite else None,
            "download_requested": parameters.download_sqlite
            }
@@ -395,7 +423,7 @@ def run_simulation_with_visualization_progress(
                print(f"WARNING: Failed to delete SQLite file {output_file}: {e}")
            
        
-       return metrics, geometry_wkt, agent_radii, output_file
+       return metrics, geometry_wkt, agent_table, output_file
    
    except Exception as e:
        end_time = time.time()
@@ -410,8 +438,6 @@ def run_simulation_with_visualization_progress(
        try:
            if 'output_file' in locals():
                os.unlink(output_file)
-           if 'processed_json_path' in locals():
-               os.unlink(processed_json_path)
        except:
            pass
        
@@ -421,7 +447,6 @@ def run_simulation_with_visualization_progress(
            "execution_time": round(execution_time, 2),
            "evacuation_time": 0.0,
            "total_agents": 0,
-           "agent_radii": {},
            "agents_evacuated": 0,
            "agents_remaining": 0,
            "iterations_completed": 0,
@@ -433,52 +458,55 @@ def run_simulation_with_visualization_progress(
 
        print("Metrics from run_simulation_with_visualization_progress (error):", metrics)
        
-       return metrics, "", {}, ""
+       return metrics, "", AgentAttributeTable.from_radii({}), ""
    
 
 
 
 def run_multiple_simulations_with_progress(
-    json_path: str, 
+    scenario: Scenario, 
     walkable_area: pedpy.WalkableArea, 
     parameters: SimulationParameters,
     simulation_id: str
-) -> tuple[Dict[str, Any], str, Dict[int, float], List[Dict[str, str]]]:
+) -> tuple[Dict[str, Any], str, AgentAttributeTable, List[Dict[str, str]]]:
     """Run multiple simulations in parallel with different seeds"""
     
     all_sqlite_files = []
     primary_metrics = None
     primary_geometry_wkt = ""
-    primary_agent_radii = {}
+    primary_agent_table = AgentAttributeTable.from_radii({})
     
     total_simulations = parameters.number_of_simulations
     
-    # Prepare arguments for parallel execution
-    walkable_area_wkt = walkable_area.polygon.wkt  # Convert to WKT for serialization
-    parameters_dict = parameters.dict()  # Convert to dict for serialization
-    
-    # Create temporary copies of the JSON file for each worker
-    temp_json_files = []
+    # Prepare arguments for parallel execution: workers read the prepared geometry from their
+    # inherited cache or from shared memory instead of reparsing WKT
+    prepared_geometry = geometry_cache.for_walkable_area(walkable_area)
+    shared_block = geometry_cache.share(prepared_geometry)
     try:
-        with open(json_path, 'r') as original_file:
-            json_content = original_file.read()
-        
-        for i in range(total_simulations):
-            temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False)
-            temp_file.write(json_content)
-            temp_file.close()
-            temp_json_files.append(temp_file.name)
-        
-        # Prepare worker arguments
+        shared_geometry = SharedGeometry(prepared_geometry.key, shared_block.name, len(prepared_geometry.wkb))
+        parameters_dict = parameters.dict()  # Convert to dict for serialization
+        if parameters.placement_workers == 0:
+            # Seeds already run in parallel; don't fan out placement inside every worker as well
+            parameters_dict["placement_workers"] = 1
+
+        # All per-seed files for this job live in its artifact directory, removed as a unit
+        job_dir = artifact_store.create_job(simulation_id)
+
+        # Compile once for the whole job; workers only place and add agents for their seed
+        plan = compile_scenario_plan(scenario.config, walkable_area, parameters)
+
+        # Prepare worker arguments; the scenario is pickled once per task, never written to disk
         worker_args = []
         for i in range(total_simulations):
             current_seed = parameters.base_seed + i
             worker_args.append((
-                temp_json_files[i],  # Each worker gets its own temp file
-                walkable_area_wkt,
+                scenario,
+                plan,
+                shared_geometry,
                 parameters_dict,
                 i,
-                current_seed
+                current_seed,
+                job_dir
             ))
         
         update_progress(simulation_id, "simulation", 0, f"Starting {total_simulations} parallel simulations...")
@@ -493,7 +521,7 @@ def run_multiple_simulations_with_progress(
         with ProcessPoolExecutor(max_workers=max_workers) as executor:
             # Submit all jobs
             future_to_index = {
-                executor.submit(run_single_simulation_worker, args): args[3] 
+                executor.submit(run_single_simulation_worker, args): args[4] 
                 for args in worker_args
             }
             
@@ -504,6 +532,7 @@ def run_multiple_simulations_with_progress(
                 
                 try:
                     result = future.result()
+                    placement_cache.merge(result.get("placements"))
                     
                     if result["success"]:
                         # Store SQLite file info
@@ -518,7 +547,7 @@ def run_multiple_simulations_with_progress(
                         if primary_metrics is None:
                             primary_metrics = result["metrics"]
                             primary_geometry_wkt = result["geometry_wkt"]
-                            primary_agent_radii = result["agent_radii"]
+                            primary_agent_table = result["agent_table"]
                         
                         update_progress(
                             simulation_id, 
@@ -546,6 +575,10 @@ def run_multiple_simulations_with_progress(
         
         # Sort results by simulation index to maintain order
         all_sqlite_files.sort(key=lambda x: x["simulation_index"])
+
+        if parameters.download_sqlite and all_sqlite_files:
+            update_progress(simulation_id, "simulation", 100, "Consolidating seed trajectories...")
+            _consolidate_ensemble(job_dir, all_sqlite_files)
         
         update_progress(
             simulation_id, 
@@ -555,29 +588,50 @@ def run_multiple_simulations_with_progress(
         )
         
     finally:
-        # Clean up temporary JSON files
-        for temp_file in temp_json_files:
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+        geometry_cache.unshare(shared_block)
     
     if not all_sqlite_files:
         raise Exception("All simulations failed")
     
-    return primary_metrics, primary_geometry_wkt, primary_agent_radii, all_sqlite_files
+    return primary_metrics, primary_geometry_wkt, primary_agent_table, all_sqlite_files
+
+def _consolidate_ensemble(job_dir: str, sqlite_files: List[Dict[str, Any]]) -> Optional[str]:
+    """Move per-seed trajectories into one ensemble store, keeping the primary seed file for playback"""
+    store_path = os.path.join(job_dir, "ensemble.sqlite")
+    try:
+        consolidate_runs(store_path, sqlite_files)
+    except Exception as e:
+        print(f"WARNING: Failed to build ensemble store, keeping per-seed files: {e}")
+        # Remove the partial store along with any journal SQLite left next to it
+        for path in (store_path, store_path + "-journal", store_path + "-wal", store_path + "-shm"):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except Exception as unlink_error:
+                print(f"WARNING: Failed to delete {path}: {unlink_error}")
+        for sqlite_info in sqlite_files:
+            sqlite_info.pop("run_id", None)
+        return None
+
+    for sqlite_info in sqlite_files[1:]:
+        try:
+            os.unlink(sqlite_info["file_path"])
+        except Exception as e:
+            print(f"WARNING: Failed to delete SQLite file {sqlite_info['file_path']}: {e}")
+        sqlite_info["file_path"] = None
+
+    for sqlite_info in sqlite_files:
+        sqlite_info["ensemble_store"] = store_path
+    return store_path
 
 def run_single_simulation_worker(args):
     """Worker function for running a single simulation in parallel"""
-    json_path, walkable_area_wkt, parameters_dict, simulation_index, seed = args
+    scenario, plan, shared_geometry, parameters_dict, simulation_index, seed, output_dir = args
     
     try:
         # Reconstruct objects from serializable data
-        from shapely import wkt
-        import pedpy
-        
-        geometry = wkt.loads(walkable_area_wkt)
-        walkable_area = pedpy.WalkableArea(geometry)
+        walkable_area = geometry_cache.walkable_area(geometry_cache.attach(shared_geometry))
         
         # Reconstruct parameters
         parameters = SimulationParameters(**parameters_dict)
@@ -586,9 +640,18 @@ def run_single_simulation_worker(args):
         worker_sim_id = f"worker_{simulation_index}_{seed}"
         
         # Run the simulation
-        metrics, geometry_wkt, agent_radii, output_file = run_simulation_with_visualization_progress(
-            json_path, walkable_area, parameters, worker_sim_id, seed
+        metrics, geometry_wkt, agent_table, output_file = run_simulation_with_visualization_progress(
+            scenario, walkable_area, parameters, worker_sim_id, seed, output_dir, plan
         )
+
+        if metrics.get("status") == "failed":
+            return {
+                "success": False,
+                "seed": seed,
+                "simulation_index": simulation_index,
+                "error": metrics.get("message"),
+                "output_file": None
+            }
         
         return {
             "success": True,
@@ -596,8 +659,10 @@ def run_single_simulation_worker(args):
             "simulation_index": simulation_index,
             "metrics": metrics,
             "geometry_wkt": geometry_wkt,
-            "agent_radii": agent_radii,
-            "output_file": output_file
+            "agent_table": agent_table,
+            "output_file": output_file,
+            # Placements computed here, so later jobs' forked workers inherit them
+            "placements": placement_cache.drain()
         }
         
     except Exception as e:
@@ -0,0 +1,98 @@
+"""Shared fixtures: a walkable area, scenario configs over it and waypoint routing.
+
+Run from the backend directory:
+
+    python -m pytest tests
+"""
+import pedpy
+import pytest
+import shapely
+
+from benchmarks.bench_journey_routing import create_config
+from utils.validation import Scenario
+
+EXITS = {
+    "jps-exits_0": {"coordinates": [[29, 3], [30, 3], [30, 7], [29, 7]]},
+    "jps-exits_1": {"coordinates": [[29, 13], [30, 13], [30, 17], [29, 17]]},
+}
+
+
+def make_routing(journey_id: str, edges):
+    """Waypoint routing for one journey from (waypoint, [(target, percentage)]) pairs"""
+    return {
+        waypoint: {journey_id: {"destinations": [
+            {"target": target, "percentage": percentage} for target, percentage in targets
+        ]}}
+        for waypoint, targets in edges
+    }
+
+
+@pytest.fixture(scope="session")
+def walkable_area() -> pedpy.WalkableArea:
+    """A 30 x 20 m hall with a pillar in the middle and two exits on the right"""
+    return pedpy.WalkableArea(shapely.box(0, 0, 30, 20).difference(shapely.box(14, 8, 16, 12)))
+
+
+@pytest.fixture(scope="session")
+def scenario_configs():
+    """Processed configs for the hall: with journeys, without journeys, without distributions.
+
+    ``complete`` routes j0 over three waypoints by percentage, j1 spawns by
+    flow, and jps-distributions_2 has no journey (nearest exit).
+    """
+    distributions = {
+        "jps-distributions_0": {
+            "coordinates": [[1, 1], [8, 1], [8, 9], [1, 9]],
+            "parameters": {"number": 40, "radius": 0.2, "v0": 1.3},
+        },
+        "jps-distributions_1": {
+            "coordinates": [[1, 11], [8, 11], [8, 19], [1, 19]],
+            "parameters": {"number": 20, "radius": 0.25, "v0": 1.1, "use_flow_spawning": True,
+                           "flow_start_time": 2, "flow_end_time": 12},
+        },
+        "jps-distributions_2": {
+            "coordinates": [[10, 1], [16, 1], [16, 4], [10, 4]],
+            "parameters": {"number": 15, "radius": 0.2, "v0": 1.2},
+        },
+    }
+    waypoints = {
+        "jps-waypoints_0": {"center": [11, 10], "radius": 1.5},
+        "jps-waypoints_1": {"center": [21, 5], "radius": 1.5},
+        "jps-waypoints_2": {"center": [21, 15], "radius": 1.5},
+    }
+    configs = {
+        "complete": {
+            "exits": EXITS,
+            "distributions": distributions,
+            "waypoints": waypoints,
+            "journeys": [
+                {"id": "j0", "stages": ["jps-distributions_0", "jps-waypoints_0", "jps-exits_0"]},
+                {"id": "j1", "stages": ["jps-distributions_1", "jps-exits_1"]},
+            ],
+            "transitions": [],
+            "waypoint_routing": make_routing("j0", [
+                ("jps-waypoints_0", [("jps-waypoints_1", 70), ("jps-waypoints_2", 30)]),
+                ("jps-waypoints_1", [("jps-exits_0", 60), ("jps-exits_1", 40)]),
+                ("jps-waypoints_2", [("jps-exits_1", 100)]),
+            ]),
+        },
+        "no-journey": {"exits": EXITS, "distributions": distributions, "waypoints": waypoints},
+        "no-distribution": {"exits": EXITS},
+    }
+    return {name: Scenario(config).config for name, config in configs.items()}
+
+
+@pytest.fixture(scope="session")
+def routing():
+    """Builder for waypoint routing: ``routing(journey_id, [(waypoint, [(target, percentage)])])``"""
+    return make_routing
+
+
+@pytest.fixture(scope="session")
+def concourse():
+    """Builder for the station concourse of bench_journey_routing: ``concourse(layers, agents)``.
+
+    Each of the ``layers`` waypoint columns splits 60/40, so journey j0 spans
+    2 ** layers routes. Returns the config and the walkable polygon.
+    """
+    return create_config
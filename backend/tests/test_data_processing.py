@@ -0,0 +1,23 @@
+import sqlite3
+
+from utils.data_processing import get_trajectory_info
+from utils.trajectory_loader import build_frame_index
+
+
+def test_trajectory_info_reads_counts_from_the_frame_index(tmp_path):
+    sqlite_file = str(tmp_path / "trajectory.sqlite")
+    conn = sqlite3.connect(sqlite_file)
+    conn.execute("CREATE TABLE trajectory_data (frame INTEGER, id INTEGER, pos_x REAL, pos_y REAL, ori_x REAL, ori_y REAL)")
+    # Three agents, one leaving after frame 1 and one entering at frame 2
+    absent = {(1, 2), (1, 3), (3, 0), (3, 1)}
+    rows = [
+        (frame, agent, 0.0, 0.0, 1.0, 0.0)
+        for frame in range(4) for agent in (1, 2, 3) if (agent, frame) not in absent
+    ]
+    conn.executemany("INSERT INTO trajectory_data VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+    scanned = get_trajectory_info(sqlite_file)
+    build_frame_index(sqlite_file)
+    assert get_trajectory_info(sqlite_file) == scanned == {"frame_count": 4, "agent_count": 3, "total_points": len(rows)}
@@ -0,0 +1,115 @@
+import math
+
+import pytest
+
+from utils.journey_variants import (
+    MAX_JOURNEY_VARIANTS,
+    RoutingCycleError,
+    check_routing_cycles,
+    check_variant_count,
+    enumerate_journey_variants,
+)
+
+STAGES = ["jps-distributions_0", "jps-waypoints_0", "jps-exits_0"]
+LAYERS = 6
+
+
+@pytest.fixture
+def loop(routing):
+    return routing("j0", [
+        ("jps-waypoints_0", [("jps-waypoints_1", 50), ("jps-exits_0", 50)]),
+        ("jps-waypoints_1", [("jps-waypoints_2", 100)]),
+        ("jps-waypoints_2", [("jps-waypoints_1", 100)]),
+    ])
+
+
+@pytest.fixture
+def diamond(routing):
+    return routing("j0", [
+        ("jps-waypoints_0", [("jps-waypoints_1", 50), ("jps-waypoints_2", 50)]),
+        ("jps-waypoints_1", [("jps-waypoints_3", 100)]),
+        ("jps-waypoints_2", [("jps-waypoints_3", 100)]),
+        ("jps-waypoints_3", [("jps-exits_0", 100)]),
+    ])
+
+
+def test_routing_loops_are_refused(loop, routing):
+    with pytest.raises(RoutingCycleError, match="jps-waypoints_1 -> jps-waypoints_2 -> jps-waypoints_1"):
+        check_routing_cycles(loop)
+    with pytest.raises(RoutingCycleError):
+        check_routing_cycles(routing("j0", [("jps-waypoints_0", [("jps-waypoints_0", 10), ("jps-exits_0", 90)])]))
+    with pytest.raises(RoutingCycleError):
+        enumerate_journey_variants("j0", STAGES, loop)
+
+
+def test_loops_are_blamed_on_their_journey(routing):
+    # Two journeys over the same waypoints; only j1 goes back
+    shared = routing("j0", [("jps-waypoints_0", [("jps-waypoints_1", 100)]), ("jps-waypoints_1", [("jps-exits_0", 100)])])
+    shared["jps-waypoints_1"]["j1"] = {"destinations": [{"target": "jps-waypoints_0", "percentage": 100}]}
+    shared["jps-waypoints_0"]["j1"] = {"destinations": [{"target": "jps-waypoints_1", "percentage": 100}]}
+    with pytest.raises(RoutingCycleError, match="journey j1 loops"):
+        check_routing_cycles(shared)
+
+
+def test_diamonds_are_not_loops(diamond):
+    check_routing_cycles(diamond)
+    assert len(enumerate_journey_variants("j0", STAGES, diamond).variants) == 2
+
+
+def test_routes_carry_the_product_of_their_branch_percentages(concourse):
+    config, _ = concourse(LAYERS, 10)
+    waypoint_routing = config["waypoint_routing"]
+    full = enumerate_journey_variants("j0", STAGES, waypoint_routing)
+
+    assert full.total == len(full.variants) == 2 ** LAYERS and full.pruned == 0
+    assert len({tuple(path) for path, _ in full.variants}) == 2 ** LAYERS
+    for path, percentage in full.variants:
+        branches = [
+            next(d["percentage"] for d in waypoint_routing[waypoint]["j0"]["destinations"] if d["target"] == target)
+            for waypoint, target in zip(path[1:], path[2:])
+        ]
+        assert percentage == pytest.approx(100.0 * math.prod(branch / 100.0 for branch in branches))
+    # Routes take k 60% and (LAYERS - k) 40% branches
+    expected = sorted(
+        100.0 * 0.6 ** k * 0.4 ** (LAYERS - k)
+        for k in range(LAYERS + 1) for _ in range(math.comb(LAYERS, k))
+    )
+    assert sorted(percentage for _, percentage in full.variants) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("threshold, kept", [(0.5, 63), (1.0, 42), (2.0, 22)])
+def test_pruning_keeps_the_routes_at_or_above_the_threshold(concourse, threshold, kept):
+    config, _ = concourse(LAYERS, 10)
+    full = enumerate_journey_variants("j0", STAGES, config["waypoint_routing"])
+    pruned = enumerate_journey_variants("j0", STAGES, config["waypoint_routing"], threshold)
+
+    assert pruned.variants == [variant for variant in full.variants if variant[1] >= threshold]
+    assert len(pruned.variants) == kept
+    assert pruned.total == full.total and pruned.pruned == full.total - kept
+
+
+@pytest.mark.parametrize("threshold", [5.0, 10.0])
+def test_a_threshold_above_every_route_is_refused(concourse, threshold):
+    config, _ = concourse(LAYERS, 10)
+    with pytest.raises(ValueError, match="drops every route"):
+        enumerate_journey_variants("j0", STAGES, config["waypoint_routing"], threshold)
+
+
+def test_routing_beyond_the_variant_limit_is_refused_unless_pruned(concourse):
+    layers = math.ceil(math.log2(MAX_JOURNEY_VARIANTS + 1))
+    config, _ = concourse(layers, 10)
+    waypoint_routing, journeys = config["waypoint_routing"], config["journeys"]
+    stages = journeys[0]["stages"]
+
+    with pytest.raises(ValueError, match=f"more than {MAX_JOURNEY_VARIANTS} journey variants"):
+        enumerate_journey_variants("j0", stages, waypoint_routing)
+    with pytest.raises(ValueError, match=f"more than {MAX_JOURNEY_VARIANTS} journey variants"):
+        check_variant_count(journeys, waypoint_routing)
+
+    threshold = 0.05
+    expected = sum(
+        math.comb(layers, k) for k in range(layers + 1)
+        if 100.0 * 0.6 ** k * 0.4 ** (layers - k) >= threshold
+    )
+    assert len(enumerate_journey_variants("j0", stages, waypoint_routing, threshold).variants) == expected == 848
+    check_variant_count(journeys, waypoint_routing, threshold)
@@ -0,0 +1,172 @@
+import json
+import pathlib
+import random
+from types import SimpleNamespace
+
+import jupedsim as jps
+import pedpy
+import pytest
+import shapely
+
+from utils.placement_cache import placement_cache
+from utils.scenario_plan import MAX_ROUND_ROBIN_CYCLE, _round_robin_weights, compile_scenario_plan, spawn_order
+from utils.simulation_init import create_agent_parameters
+from utils.validation import Scenario
+
+# Outcome of the initializer that ScenarioPlan replaced, for the scenario_configs fixtures:
+# seed 42, journey_routing 'variants', straight-line exit assignment
+REFERENCE = pathlib.Path(__file__).parent / "data" / "scenario_plan_reference.json"
+SEED = 42
+PARAMETERS = SimpleNamespace(journey_routing="variants", min_variant_percentage=0.0)
+
+
+def _rounded(value):
+    """JSON-ready copy with floats rounded to 1e-9"""
+    if isinstance(value, dict):
+        return {str(key): _rounded(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_rounded(item) for item in value]
+    if hasattr(value, "item"):  # numpy scalar
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 9)
+    return value
+
+
+def snapshot(simulation: jps.Simulation, outcome, slots_as_set: bool = False):
+    """An initializer's outcome with simulation-wide ids replaced by stage keys and journey offsets.
+
+    Stage, journey and agent ids count up across simulations in a process, so
+    stages are named by key, journeys by their offset from the first exit
+    journey (variant journeys come before it) and agents by insertion order.
+    """
+    result, positions, agent_radii, spawning_info = outcome
+    stage_keys = {stage_id: key for key, stage_id in result["stage_map"].items() if stage_id != -1}
+    first_exit_journey = min(spawning_info["exit_to_journey"].values())
+
+    def journey(journey_id):
+        return journey_id - first_exit_journey
+
+    def flow_source(i):
+        slots = [list(map(float, spawning_info["starting_pos_per_source"][i][j]))
+                 for j in range(len(spawning_info["starting_pos_per_source"][i]))]
+        exits = spawning_info["nearest_exit_per_source"][i]
+        exits = None if exits is None else [stage_keys[int(stage_id)] for stage_id in exits]
+        if slots_as_set:
+            order = sorted(range(len(slots)), key=lambda j: slots[j])
+            slots = [slots[j] for j in order]
+            exits = None if exits is None else [exits[j] for j in order]
+
+        distribution = dict(spawning_info["flow_distributions"][i])
+        if "area" in distribution:
+            distribution["area"] = shapely.to_wkt(shapely.normalize(distribution["area"]), rounding_precision=9)
+        if "journey_info" in distribution:
+            distribution["journey_info"] = [
+                dict(info["variant_data"], id=journey(info["variant_data"]["id"]), journey=info["original_journey_id"])
+                for info in distribution["journey_info"]
+            ]
+        return {
+            "distribution": distribution,
+            "frequency_and_number": spawning_info["spawning_freqs_and_numbers"][i],
+            "agents": spawning_info["num_agents_per_source"][i],
+            "slots": slots,
+            "nearest_exits": exits,
+        }
+
+    return _rounded({
+        "stages": sorted(result["stage_map"]),
+        "distributions": sorted(key for key, stage_id in result["stage_map"].items() if stage_id == -1),
+        "journey_ids": {name: journey(journey_id) for name, journey_id in result["journey_ids"].items()},
+        "exit_journeys": {stage_keys[stage_id]: journey(journey_id)
+                          for stage_id, journey_id in spawning_info["exit_to_journey"].items()},
+        "positions": [list(position) for position in positions],
+        "agents": [
+            {"position": list(agent.position), "speed": agent.model.desired_speed, "radius": agent_radii[agent.id],
+             "stage": stage_keys[agent.stage_id], "journey": journey(agent.journey_id)}
+            for agent in sorted(simulation.agents(), key=lambda agent: agent.id)
+        ],
+        "flow_sources": [flow_source(i) for i in range(len(spawning_info["flow_distributions"]))],
+        "has_flow_spawning": spawning_info["has_flow_spawning"],
+        "agents_inserted": spawning_info["agent_insertion"]["agents"],
+    })
+
+
+@pytest.mark.parametrize("name", ["complete", "no-journey", "no-distribution"])
+def test_scenario_plan_matches_the_previous_initializer(name, scenario_configs, walkable_area):
+    placement_cache.clear()
+    simulation = jps.Simulation(model=jps.CollisionFreeSpeedModel(), geometry=walkable_area.polygon)
+    plan = compile_scenario_plan(scenario_configs[name], walkable_area, PARAMETERS)
+    outcome = plan.instantiate(simulation, SEED, global_parameters=PARAMETERS)
+
+    # The previous initializer shuffled flow slots with hash(dist_key), which changes per interpreter
+    actual = json.loads(json.dumps(snapshot(simulation, outcome, slots_as_set=name == "complete")))
+    assert actual == json.loads(REFERENCE.read_text())[name]
+
+
+def test_journeyless_poisson_flow_source_spawns_past_the_first_batch():
+    # More agents than one sampler batch (1024 slots) can place
+    area = pedpy.WalkableArea(shapely.box(0, 0, 60, 40))
+    agents = 1500
+    config = Scenario({
+        "exits": {
+            "jps-exits_0": {"coordinates": [[59, 2], [60, 2], [60, 6], [59, 6]]},
+            "jps-exits_1": {"coordinates": [[59, 34], [60, 34], [60, 38], [59, 38]]},
+        },
+        "distributions": {"jps-distributions_0": {
+            "coordinates": [[1, 1], [50, 1], [50, 39], [1, 39]],
+            "parameters": {"number": agents, "radius": 0.2, "v0": 1.2, "use_flow_spawning": True,
+                           "flow_start_time": 0, "flow_end_time": 30},
+        }},
+    }).config
+    parameters = SimpleNamespace(placement_engine="poisson", exit_assignment="euclidean")
+    simulation = jps.Simulation(model=jps.CollisionFreeSpeedModel(), geometry=area.polygon)
+    plan = compile_scenario_plan(config, area, parameters)
+    _, _, _, spawning_info = plan.instantiate(simulation, 42, global_parameters=parameters)
+
+    slots = spawning_info["starting_pos_per_source"][0]
+    nearest_exits = spawning_info["nearest_exit_per_source"][0]
+    flow_params = spawning_info["flow_distributions"][0]["params"]
+    exit_to_journey = spawning_info["exit_to_journey"]
+
+    # The service's spawn step: the first slot in spawn order that takes an agent
+    for counter in range(agents):
+        for pos_index in spawn_order(slots, counter):
+            stage_id = int(nearest_exits[pos_index])
+            agent_parameters = create_agent_parameters(
+                "CollisionFreeSpeedModel", slots[pos_index], flow_params,
+                journey_id=exit_to_journey[stage_id], stage_id=stage_id,
+            )
+            try:
+                simulation.add_agent(agent_parameters)
+                break
+            except RuntimeError:
+                continue  # Slot blocked by an earlier agent
+
+    assert simulation.agent_count() == agents
+    assert len(nearest_exits) == len(slots) > 1024
+
+
+@pytest.mark.parametrize("percentages, weights", [
+    ([60, 40], [3, 2]),
+    ([50, 50], [1, 1]),
+    ([70, 30], [7, 3]),
+    ([25, 25, 50], [1, 1, 2]),
+    ([33.3, 33.3, 33.4], [1, 1, 1]),
+    ([6, 4], [3, 2]),  # Only the ratio matters
+    ([0.1, 99.9], [1, MAX_ROUND_ROBIN_CYCLE]),  # Rare destinations keep a weight of one
+])
+def test_round_robin_weights_of_known_splits(percentages, weights):
+    assert _round_robin_weights(percentages) == weights
+
+
+def test_round_robin_weights_stay_within_half_a_percentage_point():
+    rng = random.Random(420)
+    for _ in range(1000):
+        # 2 to 4 integer percentages of at least 1, summing to 100
+        cuts = sorted(rng.sample(range(1, 100), rng.randint(1, 3)))
+        percentages = [b - a for a, b in zip([0] + cuts, cuts + [100])]
+        weights = _round_robin_weights(percentages)
+
+        assert min(weights) >= 1 and sum(weights) <= MAX_ROUND_ROBIN_CYCLE
+        for weight, percentage in zip(weights, percentages):
+            assert weight / sum(weights) == pytest.approx(percentage / 100, abs=0.005), (percentages, weights)
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from utils.stagnation import StagnationDetector
+
+STEPS_PER_SECOND = 10  # Observed every 0.1 s, like the run loop
+AGENTS = 20
+MIN_DISPLACEMENT = 0.1
+
+
+class ScriptedSimulation:
+    """Agent positions as a function of time; agents with a NaN position are absent"""
+
+    def __init__(self, positions):
+        self.positions = positions
+        self.time = 0.0
+
+    def elapsed_time(self) -> float:
+        return self.time
+
+    def agents(self):
+        return [
+            SimpleNamespace(id=agent_id, position=(x, y))
+            for agent_id, (x, y) in enumerate(self.positions(self.time))
+            if not np.isnan(x)
+        ]
+
+
+def run(positions, window: float, duration: float = 60.0) -> StagnationDetector:
+    simulation = ScriptedSimulation(positions)
+    detector = StagnationDetector(window, MIN_DISPLACEMENT)
+    for step in range(int(duration * STEPS_PER_SECOND) + 1):
+        simulation.time = step / STEPS_PER_SECOND
+        if detector.observe(simulation):
+            break
+    return detector
+
+
+def base_positions() -> np.ndarray:
+    return np.column_stack([np.arange(AGENTS) * 0.5, np.zeros(AGENTS)])
+
+
+def jam(t: float) -> np.ndarray:
+    """Agents shuffling back and forth in place"""
+    return base_positions() + [0.05 * (-1) ** int(round(t * STEPS_PER_SECOND)), 0.0]
+
+
+def assert_stagnant(detector: StagnationDetector, at: float, stuck: int):
+    assert detector.detected_at == pytest.approx(at, abs=0.5 / STEPS_PER_SECOND)
+    assert detector.stuck_agents == stuck
+    assert detector.mean_displacement < MIN_DISPLACEMENT
+
+
+@pytest.fixture(params=[6.0, 10.0, 30.0])
+def window(request) -> float:
+    return request.param
+
+
+def test_a_jam_is_stagnant_one_window_after_the_start(window):
+    assert_stagnant(run(jam, window), at=window, stuck=AGENTS)
+
+
+def test_walking_agents_are_never_stagnant(window):
+    assert run(lambda t: base_positions() + [0.5 * t, 0.0], window).detected_at is None
+
+
+def test_agents_creeping_just_over_the_threshold_are_never_stagnant(window):
+    def creeping(t: float) -> np.ndarray:
+        return base_positions() + [1.2 * MIN_DISPLACEMENT * t / window, 0.0]
+
+    assert run(creeping, window).detected_at is None
+
+
+def test_every_exit_restarts_the_window(window):
+    def slow_exits(t: float) -> np.ndarray:
+        # An agent leaves every 5 s until t=20
+        positions = jam(t)
+        positions[:min(int(t // 5), 4)] = np.nan
+        return positions
+
+    assert_stagnant(run(slow_exits, window), at=20.0 + window, stuck=AGENTS - 4)
+
+
+def test_only_agents_present_over_the_whole_window_count(window):
+    def newcomers(t: float) -> np.ndarray:
+        # Walking agents spawned halfway through the first window
+        crowd = np.vstack([jam(t), base_positions() + [0.0, 5.0 + 1.5 * (t - window / 2)]])
+        if t < window / 2:
+            crowd[AGENTS:] = np.nan
+        return crowd
+
+    assert_stagnant(run(newcomers, window), at=window, stuck=AGENTS)
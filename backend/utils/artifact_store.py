@@ -0,0 +1,264 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+GIB = 1024 ** 3
+
+# Job directories are named after the simulation id (a uuid4)
+JOB_DIR_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def newest_mtime(path: str) -> float:
+    """Most recent modification time of a directory or any file below it"""
+    newest = os.path.getmtime(path)
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                newest = max(newest, os.path.getmtime(os.path.join(dirpath, name)))
+            except OSError:
+                pass
+    return newest
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files below a directory"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class ArtifactStore:
+    """Disk space manager for per-simulation artifacts (trajectory files, configs).
+
+    Every simulation gets its own directory below ``root``, which is always a
+    dedicated ``crowdflow_artifacts`` subdirectory of the configured base
+    directory. Once a job is finished and has not been accessed for
+    ``ttl_seconds`` it is expired, and expired jobs are evicted by every sweep.
+    When the store grows past ``global_quota_bytes``, finished jobs are evicted
+    as well, least recently used first. Running jobs are never evicted, but are
+    failed by the simulation loop when their directory exceeds
+    ``job_quota_bytes``.
+
+    Configured through CROWDFLOW_ARTIFACT_ROOT (the base directory, e.g. a tmpfs mount),
+    CROWDFLOW_ARTIFACT_QUOTA_BYTES, CROWDFLOW_ARTIFACT_JOB_QUOTA_BYTES and
+    CROWDFLOW_ARTIFACT_TTL_SECONDS.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        global_quota_bytes: Optional[int] = None,
+        job_quota_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
+        base = root or os.environ.get("CROWDFLOW_ARTIFACT_ROOT") or tempfile.gettempdir()
+        # Never manage the configured directory itself: it may be shared (e.g. /dev/shm)
+        self.root = os.path.join(base, "crowdflow_artifacts")
+        self.global_quota_bytes = global_quota_bytes or int(os.environ.get("CROWDFLOW_ARTIFACT_QUOTA_BYTES", 10 * GIB))
+        self.job_quota_bytes = job_quota_bytes or int(os.environ.get("CROWDFLOW_ARTIFACT_JOB_QUOTA_BYTES", 2 * GIB))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.environ.get("CROWDFLOW_ARTIFACT_TTL_SECONDS", 300)
+        )
+
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._eviction_listeners: List[Callable[[str], None]] = []
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.orphans_removed = 0
+
+        self.is_sweeping = False
+        self.sweeper_thread = None
+
+    def create_job(self, job_id: str) -> str:
+        """Create (or return) the artifact directory of a job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                path = os.path.join(self.root, job_id)
+                os.makedirs(path, exist_ok=True)
+                now = time.time()
+                job = {"path": path, "created": now, "last_access": now, "finished": False}
+                self._jobs[job_id] = job
+            self._jobs.move_to_end(job_id)
+            return job["path"]
+
+    def new_file(self, job_id: str, suffix: str = "") -> str:
+        """Create an empty file inside a job's directory and return its path"""
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.create_job(job_id))
+        os.close(fd)
+        return path
+
+    def touch(self, job_id: str):
+        """Mark a job as recently used"""
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["last_access"] = time.time()
+                self._jobs.move_to_end(job_id)
+
+    def mark_finished(self, job_id: str):
+        """Allow a job to expire once it has been idle for ttl_seconds"""
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["finished"] = True
+                self._jobs[job_id]["last_access"] = time.time()
+
+    def release(self, job_id: str) -> int:
+        """Delete a job's directory and stop tracking it; returns the bytes freed"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        path = job["path"] if job else os.path.join(self.root, job_id)
+        if not os.path.isdir(path):
+            return 0
+        freed = directory_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        return freed
+
+    def exceeds_job_quota(self, job_dir: str) -> bool:
+        """Check a job directory against the per-job quota (usable from worker processes)"""
+        return directory_size(job_dir) > self.job_quota_bytes
+
+    def add_eviction_listener(self, listener: Callable[[str], None]):
+        """Register a callback invoked with the job id of every evicted job"""
+        self._eviction_listeners.append(listener)
+
+    def _is_expired(self, job: Dict, now: float) -> bool:
+        return job["finished"] and now - job["last_access"] > self.ttl_seconds
+
+    def total_bytes(self) -> int:
+        return directory_size(self.root) if os.path.isdir(self.root) else 0
+
+    def evict(self, required_bytes: int = 0) -> int:
+        """Evict all expired jobs, then finished jobs least recently used first until usage plus required_bytes fits the quota"""
+        now = time.time()
+        with self._lock:
+            by_access = sorted(self._jobs.items(), key=lambda item: item[1]["last_access"])
+            expired = [job_id for job_id, job in by_access if self._is_expired(job, now)]
+            idle = [job_id for job_id, job in by_access if job["finished"] and not self._is_expired(job, now)]
+
+        freed_total = 0
+        for job_id in expired:
+            freed_total += self._evict_job(job_id)
+
+        usage = self.total_bytes()
+        for job_id in idle:
+            if usage + required_bytes <= self.global_quota_bytes:
+                break
+            freed = self._evict_job(job_id)
+            usage -= freed
+            freed_total += freed
+        return freed_total
+
+    def _evict_job(self, job_id: str) -> int:
+        freed = self.release(job_id)
+        self.evictions += 1
+        self.evicted_bytes += freed
+        print(f"Evicted artifacts of {job_id} ({freed / 1e6:.1f} MB)")
+        for listener in self._eviction_listeners:
+            try:
+                listener(job_id)
+            except Exception as e:
+                print(f"WARNING: Eviction listener failed for {job_id}: {e}")
+        return freed
+
+    def ensure_capacity(self, required_bytes: int = 0) -> bool:
+        """Make room for a new job; False if the quota is still exceeded after eviction"""
+        self.evict(required_bytes)
+        return self.total_bytes() + required_bytes <= self.global_quota_bytes
+
+    def sweep_orphans(self) -> int:
+        """Remove job directories no tracked job owns (e.g. left over from a previous process)
+
+        Only uuid-named directories idle for longer than ttl_seconds are removed, so
+        live jobs of other workers sharing the root are left alone.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            known = {os.path.basename(job["path"]) for job in self._jobs.values()}
+
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name in known or not JOB_DIR_PATTERN.match(name) or not os.path.isdir(path):
+                continue
+            try:
+                if now - newest_mtime(path) <= self.ttl_seconds:
+                    continue
+                shutil.rmtree(path)
+                removed += 1
+            except OSError as e:
+                print(f"WARNING: Failed to remove orphaned artifact {path}: {e}")
+        self.orphans_removed += removed
+        if removed:
+            print(f"Removed {removed} orphaned artifact(s) from {self.root}")
+        return removed
+
+    def start_sweeper(self, interval: float = 60.0):
+        """Periodically evict expired jobs in a background thread"""
+        if self.is_sweeping:
+            return
+
+        self.is_sweeping = True
+        self.sweeper_thread = threading.Thread(target=self._sweep_loop, args=(interval,), daemon=True)
+        self.sweeper_thread.start()
+
+    def stop_sweeper(self):
+        self.is_sweeping = False
+
+    def _sweep_loop(self, interval: float):
+        while self.is_sweeping:
+            try:
+                self.evict()
+            except Exception as e:
+                print(f"WARNING: Artifact eviction failed: {e}")
+            time.sleep(interval)
+
+    def get_metrics(self) -> Dict:
+        """Disk usage of the store and of the filesystem it lives on"""
+        now = time.time()
+        with self._lock:
+            jobs = [(job_id, dict(job)) for job_id, job in self._jobs.items()]
+
+        job_metrics = []
+        for job_id, job in jobs:
+            job_metrics.append({
+                "job_id": job_id,
+                "bytes": directory_size(job["path"]) if os.path.isdir(job["path"]) else 0,
+                "age_seconds": round(now - job["created"], 1),
+                "idle_seconds": round(now - job["last_access"], 1),
+                "finished": job["finished"],
+                "expired": self._is_expired(job, now),
+            })
+
+        disk = shutil.disk_usage(self.root) if os.path.isdir(self.root) else None
+        return {
+            "root": self.root,
+            "total_bytes": sum(job["bytes"] for job in job_metrics),
+            "global_quota_bytes": self.global_quota_bytes,
+            "job_quota_bytes": self.job_quota_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "jobs": len(job_metrics),
+            "expired_jobs": sum(job["expired"] for job in job_metrics),
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+            "orphans_removed": self.orphans_removed,
+            "disk_total_bytes": disk.total if disk else None,
+            "disk_used_bytes": disk.used if disk else None,
+            "disk_free_bytes": disk.free if disk else None,
+            "job_details": job_metrics,
+        }
+
+
+# Global store instance
+artifact_store = ArtifactStore()
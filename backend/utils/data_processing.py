@@ -1,48 +1,84 @@
 import sqlite3
-from typing import Dict, List
+from typing import Dict, Generator, List, Optional
 
-from models import AgentPosition, FrameData, JourneyRouting
+import numpy as np
+
+from models import AgentPosition, FrameData, JourneyRouting, TrajectoryStreamer
+from utils.trajectory_loader import FRAME_INDEX_TABLE, TrajectoryArrayLoader, has_frame_index
+
+
+class IndexedTrajectoryStreamer(TrajectoryStreamer):
+    """TrajectoryStreamer that seeks through the precomputed frame index when the file has one"""
+
+    def get_frame_count(self) -> int:
+        if not has_frame_index(self.conn):
+            return super().get_frame_count()
+        return self.conn.execute(f"SELECT COUNT(*) FROM {FRAME_INDEX_TABLE}").fetchone()[0]
+
+    def stream_frames(self, start_frame: int = 0, end_frame: Optional[int] = None) -> Generator[FrameData, None, None]:
+        if not has_frame_index(self.conn):
+            yield from super().stream_frames(start_frame, end_frame)
+            return
+
+        if end_frame is None:
+            end_frame = self.get_frame_count()
+
+        # Precomputed rowid ranges turn each frame lookup into a direct seek
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT frame, first_rowid, last_rowid
+            FROM {FRAME_INDEX_TABLE}
+            WHERE frame >= ? AND frame < ? AND first_rowid IS NOT NULL
+        """, (start_frame, end_frame))
+        rowid_ranges = {frame: (first, last) for frame, first, last in cursor.fetchall()}
+
+        for frame in range(start_frame, end_frame):
+            if frame not in rowid_ranges:
+                # Frames whose rows aren't contiguous are looked up by frame number
+                yield from super().stream_frames(frame, frame + 1)
+                continue
+
+            cursor.execute("""
+                SELECT id, pos_x, pos_y, ori_x, ori_y
+                FROM trajectory_data
+                WHERE rowid BETWEEN ? AND ?
+                ORDER BY id
+            """, rowid_ranges[frame])
+            agents = [
+                AgentPosition(agent_id=agent_id, x=pos_x, y=pos_y, ori_x=ori_x, ori_y=ori_y)
+                for agent_id, pos_x, pos_y, ori_x, ori_y in cursor.fetchall()
+            ]
+            if agents:  # Only yield frames with agents
+                yield FrameData(frame=frame, agents=agents)
 
 
 def extract_trajectory_data(sqlite_file: str) -> tuple[List[FrameData], str]:
-    """Extract trajectory data from SQLite file"""
+    """Extract trajectory data from SQLite file.
+
+    Builds one Pydantic object per row; analytics code should read columnar
+    chunks with ``TrajectoryArrayLoader`` instead.
+    """
     trajectory_data = []
     geometry_wkt = ""
     
     try:
-        conn = sqlite3.connect(sqlite_file)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT wkt FROM geometry LIMIT 1")
-        geometry_result = cursor.fetchone()
-        if geometry_result:
-            geometry_wkt = geometry_result[0]
-        
-        cursor.execute("""
-            SELECT frame, id, pos_x, pos_y, ori_x, ori_y 
-            FROM trajectory_data 
-            ORDER BY frame, id
-        """)
-        rows = cursor.fetchall()
-        
-        frames = {}
-        for frame, agent_id, pos_x, pos_y, ori_x, ori_y in rows:
-            if frame not in frames:
-                frames[frame] = []
-            frames[frame].append(AgentPosition(
-                agent_id=agent_id,
-                x=pos_x,
-                y=pos_y,
-                ori_x=ori_x,
-                ori_y=ori_y
-            ))
+        geometry_wkt = get_geometry_wkt(sqlite_file)
         
-        trajectory_data = [
-            FrameData(frame=frame, agents=agents)
-            for frame, agents in sorted(frames.items())
-        ]
-        
-        conn.close()
+        with TrajectoryArrayLoader(sqlite_file) as loader:
+            for chunk in loader.iter_chunks():
+                # Chunks are frame-aligned and sorted by (frame, id)
+                frame_starts = np.flatnonzero(np.diff(chunk["frame"], prepend=-1))
+                frame_ends = np.append(frame_starts[1:], len(chunk["frame"]))
+                columns = [chunk[name].tolist() for name in ("id", "x", "y", "ori_x", "ori_y")]
+                
+                for start, end in zip(frame_starts, frame_ends):
+                    trajectory_data.append(FrameData(
+                        frame=int(chunk["frame"][start]),
+                        agents=[
+                            AgentPosition(agent_id=agent_id, x=x, y=y, ori_x=ori_x, ori_y=ori_y)
+                            for agent_id, x, y, ori_x, ori_y in zip(*(col[start:end] for col in columns))
+                        ]
+                    ))
         
     except Exception as e:
         print(f"Error extracting trajectory data: {e}")
@@ -52,20 +88,29 @@ def extract_trajectory_data(sqlite_file: str) -> tuple[List[FrameData], str]:
     return trajectory_data, geometry_wkt
 
 def get_trajectory_info(sqlite_file: str) -> Dict[str, int]:
-    """Get basic trajectory info without loading all data"""
+    """Get basic trajectory info without loading all data.
+
+    Frame and row counts come from the frame index when the file has one;
+    files written before it are scanned.
+    """
     try:
         conn = sqlite3.connect(sqlite_file)
         cursor = conn.cursor()
         
-        cursor.execute("SELECT COUNT(DISTINCT frame) FROM trajectory_data")
-        frame_count = cursor.fetchone()[0]
+        if has_frame_index(conn):
+            cursor.execute(f"SELECT COUNT(DISTINCT frame), COALESCE(SUM(row_count), 0) FROM {FRAME_INDEX_TABLE}")
+            frame_count, total_points = cursor.fetchone()
+        else:
+            cursor.execute("SELECT COUNT(DISTINCT frame) FROM trajectory_data")
+            frame_count = cursor.fetchone()[0]
+
+            cursor.execute("SELECT COUNT(*) FROM trajectory_data")
+            total_points = cursor.fetchone()[0]
         
+        # Agent ids aren't in the frame index
         cursor.execute("SELECT COUNT(DISTINCT id) FROM trajectory_data")
         agent_count = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM trajectory_data")
-        total_points = cursor.fetchone()[0]
-        
         conn.close()
         
         return {
@@ -93,6 +138,22 @@ def get_geometry_wkt(sqlite_file: str) -> str:
         print(f"Error getting geometry: {e}")
         return ""
 
+def get_trajectory_fps(sqlite_file: str, default: float = 25.0) -> float:
+    """Get the frame rate recorded by the trajectory writer"""
+    try:
+        conn = sqlite3.connect(sqlite_file)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT value FROM metadata WHERE key = 'fps'")
+        result = cursor.fetchone()
+        
+        conn.close()
+        
+        return float(result[0]) if result else default
+    except Exception as e:
+        print(f"Error getting trajectory fps: {e}")
+        return default
+
 def _convert_waypoint_routing_to_dict(waypoint_routing: Dict[str, Dict[str, JourneyRouting]]) -> Dict:
     """Convert Pydantic models to dict for JSON serialization"""
     result = {}
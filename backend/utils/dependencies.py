@@ -1,7 +1,37 @@
-from typing import Dict, Any
+import asyncio
+import functools
+import os
+from typing import Dict, Any, AsyncGenerator, Callable, Iterator
 from concurrent.futures import ThreadPoolExecutor
 
 # Global objects that need to be shared across modules
 simulation_progress: Dict[str, Dict[str, Any]] = {}
 results_storage: Dict[str, Dict[str, Any]] = {}
-thread_pool = ThreadPoolExecutor(max_workers=4)
\ No newline at end of file
+thread_pool = ThreadPoolExecutor(max_workers=4)
+
+# Blocking trajectory/file I/O from async routes runs here, never on the event loop.
+# Its own worker limit keeps large reads from starving simulations or each other.
+io_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("CROWDFLOW_IO_WORKERS", 4)),
+    thread_name_prefix="trajectory-io"
+)
+
+
+async def run_io(func: Callable, *args, **kwargs):
+    """Run a blocking call on the I/O executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+
+async def iterate_io(iterator: Iterator) -> AsyncGenerator[Any, None]:
+    """Drive a blocking iterator (e.g. a streaming export) one item at a time on the I/O executor"""
+    done = object()
+    try:
+        while True:
+            item = await run_io(next, iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            await run_io(iterator.close)
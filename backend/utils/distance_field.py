@@ -0,0 +1,254 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Sequence
+
+import numpy as np
+import shapely
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from shapely.geometry.base import BaseGeometry
+
+# Coarsen the grid beyond this many cells instead of running out of memory
+MAX_FIELD_CELLS = 4_000_000
+
+# 8-neighbourhood offsets (row, col) used when a position's own cell is not walkable
+_NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+class DistanceField:
+    """Walking distance to the nearest exit on a regular grid over the walkable area.
+
+    ``nearest_exit`` holds, per cell, the index of the exit that is closest on
+    foot (-1 for blocked or unreachable cells) and ``distance`` the walking
+    distance to it in meters.
+    """
+
+    def __init__(self, origin, cell_size: float, nearest_exit: np.ndarray, distance: np.ndarray):
+        self.origin = origin
+        self.cell_size = cell_size
+        self.nearest_exit = nearest_exit
+        self.distance = distance
+
+    @property
+    def shape(self):
+        return self.nearest_exit.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.nearest_exit.nbytes + self.distance.nbytes
+
+    def lookup(self, positions: np.ndarray) -> np.ndarray:
+        """Nearest exit index per position; cells next to walls borrow their best walkable neighbour"""
+        cols = np.floor((positions[:, 0] - self.origin[0]) / self.cell_size).astype(np.int64)
+        rows = np.floor((positions[:, 1] - self.origin[1]) / self.cell_size).astype(np.int64)
+
+        nearest, _ = self._cells(rows, cols)
+        missing = np.flatnonzero(nearest < 0)
+        if len(missing):
+            best_distance = np.full(len(missing), np.inf)
+            for d_row, d_col in _NEIGHBOURS:
+                candidate, distance = self._cells(rows[missing] + d_row, cols[missing] + d_col)
+                better = (candidate >= 0) & (distance < best_distance)
+                nearest[missing[better]] = candidate[better]
+                best_distance[better] = distance[better]
+        return nearest
+
+    def _cells(self, rows: np.ndarray, cols: np.ndarray):
+        """Exit index and distance of the given cells, -1 / inf outside the grid"""
+        rows_count, cols_count = self.shape
+        inside = (rows >= 0) & (rows < rows_count) & (cols >= 0) & (cols < cols_count)
+        nearest = np.full(len(rows), -1, dtype=np.int64)
+        distance = np.full(len(rows), np.inf)
+        nearest[inside] = self.nearest_exit[rows[inside], cols[inside]]
+        distance[inside] = self.distance[rows[inside], cols[inside]]
+        return nearest, distance
+
+
+def _source_cells(
+    exit_geometry: BaseGeometry, walkable: np.ndarray, origin, cell_size: float
+) -> np.ndarray:
+    """Flat indices of walkable cells at an exit, widening the search if the exit lies off the grid"""
+    rows_count, cols_count = walkable.shape
+    for radius in (0.75, 1.5, 3.0, 6.0, 12.0):
+        area = exit_geometry.buffer(radius * cell_size)
+        minx, miny, maxx, maxy = area.bounds
+        col0 = max(int(math.floor((minx - origin[0]) / cell_size)), 0)
+        col1 = min(int(math.ceil((maxx - origin[0]) / cell_size)), cols_count)
+        row0 = max(int(math.floor((miny - origin[1]) / cell_size)), 0)
+        row1 = min(int(math.ceil((maxy - origin[1]) / cell_size)), rows_count)
+        if col0 >= col1 or row0 >= row1:
+            continue
+        rows, cols = np.mgrid[row0:row1, col0:col1]
+        xs = origin[0] + (cols.ravel() + 0.5) * cell_size
+        ys = origin[1] + (rows.ravel() + 0.5) * cell_size
+        hit = shapely.contains_xy(area, xs, ys) & walkable[rows.ravel(), cols.ravel()]
+        if hit.any():
+            return rows.ravel()[hit] * cols_count + cols.ravel()[hit]
+    return np.empty(0, dtype=np.int64)
+
+
+def _boundary_cells(boundary: BaseGeometry, shape, origin, cell_size: float) -> np.ndarray:
+    """Cells within one cell of the boundary, found by sampling it every quarter cell"""
+    rows_count, cols_count = shape
+    samples = shapely.get_coordinates(shapely.segmentize(boundary, cell_size / 4))
+    cols = np.clip(np.floor((samples[:, 0] - origin[0]) / cell_size).astype(np.int64), 0, cols_count - 1)
+    rows = np.clip(np.floor((samples[:, 1] - origin[1]) / cell_size).astype(np.int64), 0, rows_count - 1)
+    near = np.zeros(shape, dtype=bool)
+    near[rows, cols] = True
+    padded = np.pad(near, 1)
+    dilated = np.zeros(shape, dtype=bool)
+    for d_row in range(3):
+        for d_col in range(3):
+            dilated |= padded[d_row:d_row + rows_count, d_col:d_col + cols_count]
+    return dilated
+
+
+def compute_distance_field(
+    walkable_polygon: BaseGeometry, exits: Sequence[BaseGeometry], cell_size: float = 0.25
+) -> DistanceField:
+    """Rasterize the walkable area and run one multi-source Dijkstra from all exits.
+
+    Cells are 8-connected; diagonal steps are only allowed when both adjacent
+    orthogonal cells are walkable, and no step may cross the area's boundary.
+    """
+    minx, miny, maxx, maxy = walkable_polygon.bounds
+    cell_size = max(cell_size, math.sqrt((maxx - minx) * (maxy - miny) / MAX_FIELD_CELLS))
+    cols_count = max(int(math.ceil((maxx - minx) / cell_size)), 1)
+    rows_count = max(int(math.ceil((maxy - miny) / cell_size)), 1)
+    origin = (minx, miny)
+
+    xs = minx + (np.arange(cols_count) + 0.5) * cell_size
+    ys = miny + (np.arange(rows_count) + 0.5) * cell_size
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    shapely.prepare(walkable_polygon)
+    walkable = shapely.contains_xy(walkable_polygon, grid_x.ravel(), grid_y.ravel()).reshape(rows_count, cols_count)
+
+    # Compact node numbering over walkable cells
+    node_of_cell = np.full(walkable.size, -1, dtype=np.int64)
+    node_of_cell[walkable.ravel()] = np.arange(int(walkable.sum()))
+    node_of_cell = node_of_cell.reshape(walkable.shape)
+
+    # Walls thinner than a cell leave both neighbouring cell centres walkable;
+    # edges near the boundary are checked against it so paths can't leak through
+    boundary = walkable_polygon.boundary
+    shapely.prepare(boundary)
+    near_boundary = _boundary_cells(boundary, walkable.shape, origin, cell_size)
+    edges_from, edges_to, weights = [], [], []
+
+    def connect(a_rows, a_cols, b_rows, b_cols, mask, weight):
+        mask = mask.copy()
+        check = np.flatnonzero(mask & (near_boundary[a_rows, a_cols] | near_boundary[b_rows, b_cols]))
+        if len(check):
+            segments = np.stack([
+                np.column_stack([xs[a_cols[check]], ys[a_rows[check]]]),
+                np.column_stack([xs[b_cols[check]], ys[b_rows[check]]]),
+            ], axis=1)
+            mask[check[shapely.intersects(boundary, shapely.linestrings(segments))]] = False
+        edges_from.append(node_of_cell[a_rows, a_cols][mask])
+        edges_to.append(node_of_cell[b_rows, b_cols][mask])
+        weights.append(np.full(int(mask.sum()), weight))
+
+    right = walkable[:, :-1] & walkable[:, 1:]
+    rows, cols = np.nonzero(np.ones_like(right))
+    connect(rows, cols, rows, cols + 1, right.ravel(), cell_size)
+
+    up = walkable[:-1, :] & walkable[1:, :]
+    rows, cols = np.nonzero(np.ones_like(up))
+    connect(rows, cols, rows + 1, cols, up.ravel(), cell_size)
+
+    diagonal = cell_size * math.sqrt(2.0)
+    up_right = walkable[:-1, :-1] & walkable[1:, 1:] & walkable[:-1, 1:] & walkable[1:, :-1]
+    rows, cols = np.nonzero(np.ones_like(up_right))
+    connect(rows, cols, rows + 1, cols + 1, up_right.ravel(), diagonal)
+    connect(rows, cols + 1, rows + 1, cols, up_right.ravel(), diagonal)
+
+    node_count = int(walkable.sum())
+    graph = csr_matrix(
+        (np.concatenate(weights), (np.concatenate(edges_from), np.concatenate(edges_to))),
+        shape=(node_count, node_count),
+    )
+
+    # Earlier exits win cells shared between exits, as with straight-line assignment
+    exit_of_node = np.full(node_count, -1, dtype=np.int64)
+    for exit_index in reversed(range(len(exits))):
+        cells = _source_cells(exits[exit_index], walkable, origin, cell_size)
+        exit_of_node[node_of_cell.ravel()[cells]] = exit_index
+    source_nodes = np.flatnonzero(exit_of_node >= 0)
+
+    nearest_exit = np.full(walkable.size, -1, dtype=np.int32)
+    distance = np.full(walkable.size, np.inf, dtype=np.float32)
+    if len(source_nodes) and node_count:
+        node_distance, _, sources = dijkstra(
+            graph, directed=False, indices=source_nodes, min_only=True, return_predecessors=True
+        )
+        reached = sources >= 0
+        cell_index = np.flatnonzero(walkable.ravel())
+        nearest_exit[cell_index[reached]] = exit_of_node[sources[reached]]
+        distance[cell_index[reached]] = node_distance[reached]
+
+    return DistanceField(
+        origin, cell_size, nearest_exit.reshape(walkable.shape), distance.reshape(walkable.shape)
+    )
+
+
+class DistanceFieldCache:
+    """LRU of distance fields keyed by the hash of walkable area, exits and cell size"""
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, DistanceField]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compute_seconds = 0.0
+
+    @staticmethod
+    def key(walkable_polygon: BaseGeometry, exits: Sequence[BaseGeometry], cell_size: float) -> str:
+        digest = hashlib.sha1(shapely.to_wkb(walkable_polygon))
+        for exit_geometry in exits:
+            digest.update(shapely.to_wkb(exit_geometry))
+        digest.update(repr(float(cell_size)).encode())
+        return digest.hexdigest()
+
+    def get(self, walkable_polygon: BaseGeometry, exits: List[BaseGeometry], cell_size: float = 0.25) -> DistanceField:
+        key = self.key(walkable_polygon, exits, cell_size)
+        with self._lock:
+            field = self._entries.get(key)
+            if field is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return field
+
+        started = time.perf_counter()
+        field = compute_distance_field(walkable_polygon, exits, cell_size)
+        elapsed = time.perf_counter() - started
+        print(f"Computed walking-distance field {field.shape[1]}x{field.shape[0]} "
+              f"({field.cell_size:.2f} m cells, {len(exits)} exits) in {elapsed:.2f}s")
+
+        with self._lock:
+            self.misses += 1
+            self.compute_seconds += elapsed
+            self._entries[key] = field
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return field
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(field.nbytes for field in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "compute_seconds": round(self.compute_seconds, 2),
+            }
+
+
+# Global cache instance
+distance_field_cache = DistanceFieldCache()
@@ -0,0 +1,203 @@
+import json
+import sqlite3
+from typing import Any, Dict, List
+
+import numpy as np
+
+from utils.frame_statistics import FRAME_EXIT_STATS_TABLE, FRAME_STATS_COLUMNS, FRAME_STATS_TABLE
+from utils.trajectory_loader import FRAME_INDEX_TABLE, TRAJECTORY_COLUMNS, TRAJECTORY_ROW_DTYPE
+
+# Same layout as a single-run trajectory file, with a run_id column on every
+# per-run table so TrajectoryArrayLoader(..., run_id=...) reads it unchanged.
+ENSEMBLE_SCHEMA = f"""
+    CREATE TABLE runs (
+        run_id INTEGER PRIMARY KEY,
+        seed INTEGER NOT NULL UNIQUE,
+        simulation_index INTEGER NOT NULL,
+        metrics TEXT
+    );
+    CREATE TABLE metadata (key TEXT NOT NULL UNIQUE PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE geometry (hash INTEGER NOT NULL, wkt TEXT NOT NULL);
+    CREATE UNIQUE INDEX geometry_hash ON geometry(hash);
+    CREATE TABLE frame_data (
+        run_id INTEGER NOT NULL,
+        frame INTEGER NOT NULL,
+        geometry_hash INTEGER NOT NULL
+    );
+    CREATE TABLE trajectory_data (
+        run_id INTEGER NOT NULL,
+        frame INTEGER NOT NULL,
+        id INTEGER NOT NULL,
+        pos_x REAL NOT NULL,
+        pos_y REAL NOT NULL,
+        ori_x REAL NOT NULL,
+        ori_y REAL NOT NULL
+    );
+    CREATE TABLE {FRAME_STATS_TABLE} (
+        run_id INTEGER NOT NULL,
+        frame INTEGER NOT NULL,
+        agent_count INTEGER NOT NULL,
+        evacuated_count INTEGER NOT NULL,
+        mean_speed REAL,
+        p50_speed REAL,
+        p90_speed REAL,
+        min_x REAL, min_y REAL, max_x REAL, max_y REAL,
+        PRIMARY KEY (run_id, frame)
+    );
+    CREATE TABLE {FRAME_EXIT_STATS_TABLE} (
+        run_id INTEGER NOT NULL,
+        frame INTEGER NOT NULL,
+        exit_id TEXT NOT NULL,
+        agent_count INTEGER NOT NULL,
+        PRIMARY KEY (run_id, frame, exit_id)
+    );
+"""
+
+
+def _has_table(conn: sqlite3.Connection, schema: str, name: str) -> bool:
+    row = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    return row is not None
+
+
+def consolidate_runs(store_path: str, runs: List[Dict[str, Any]]) -> int:
+    """Copy per-seed trajectory files into one ensemble store.
+
+    ``runs`` are the per-seed entries collected by run_multiple_simulations_with_progress
+    (seed, simulation_index, file_path, metrics). Rows are copied inside SQLite
+    with ATTACH + INSERT ... SELECT, so no trajectory data passes through Python.
+    Returns the number of runs stored; entries get their ``run_id`` filled in.
+    """
+    conn = sqlite3.connect(store_path)
+    try:
+        conn.executescript(ENSEMBLE_SCHEMA)
+        stored = 0
+
+        for run_id, run in enumerate(sorted(runs, key=lambda r: r["simulation_index"])):
+            conn.execute("ATTACH DATABASE ? AS src", (run["file_path"],))
+            try:
+                conn.execute(
+                    "INSERT INTO runs (run_id, seed, simulation_index, metrics) VALUES (?, ?, ?, ?)",
+                    (run_id, run["seed"], run["simulation_index"], json.dumps(run.get("metrics"), default=str))
+                )
+                conn.execute("""
+                    INSERT INTO trajectory_data (run_id, frame, id, pos_x, pos_y, ori_x, ori_y)
+                    SELECT ?, frame, id, pos_x, pos_y, ori_x, ori_y FROM src.trajectory_data ORDER BY rowid
+                """, (run_id,))
+                conn.execute(
+                    "INSERT INTO frame_data (run_id, frame, geometry_hash) SELECT ?, frame, geometry_hash FROM src.frame_data",
+                    (run_id,)
+                )
+                conn.execute("INSERT OR IGNORE INTO geometry (hash, wkt) SELECT hash, wkt FROM src.geometry")
+                conn.execute("INSERT OR IGNORE INTO metadata (key, value) SELECT key, value FROM src.metadata")
+
+                if _has_table(conn, "src", FRAME_STATS_TABLE):
+                    conn.execute(f"""
+                        INSERT INTO {FRAME_STATS_TABLE} (run_id, {', '.join(FRAME_STATS_COLUMNS)})
+                        SELECT ?, {', '.join(FRAME_STATS_COLUMNS)} FROM src.{FRAME_STATS_TABLE}
+                    """, (run_id,))
+                    conn.execute(f"""
+                        INSERT INTO {FRAME_EXIT_STATS_TABLE} (run_id, frame, exit_id, agent_count)
+                        SELECT ?, frame, exit_id, agent_count FROM src.{FRAME_EXIT_STATS_TABLE}
+                    """, (run_id,))
+                conn.commit()
+            finally:
+                conn.execute("DETACH DATABASE src")
+
+            run["run_id"] = run_id
+            stored += 1
+
+        # Shared indexes over all runs: per-run playback and cross-seed frame lookups
+        conn.execute("CREATE INDEX run_frame_id_idx ON trajectory_data(run_id, frame, id)")
+        conn.execute("CREATE INDEX frame_run_idx ON trajectory_data(frame, run_id)")
+        conn.execute(f"""
+            CREATE TABLE {FRAME_INDEX_TABLE} (
+                run_id INTEGER NOT NULL,
+                frame INTEGER NOT NULL,
+                first_rowid INTEGER,
+                last_rowid INTEGER,
+                row_count INTEGER NOT NULL,
+                PRIMARY KEY (run_id, frame)
+            )
+        """)
+        conn.execute(f"""
+            INSERT INTO {FRAME_INDEX_TABLE} (run_id, frame, first_rowid, last_rowid, row_count)
+            SELECT
+                run_id,
+                frame,
+                CASE WHEN MAX(rowid) - MIN(rowid) + 1 = COUNT(*) THEN MIN(rowid) END,
+                CASE WHEN MAX(rowid) - MIN(rowid) + 1 = COUNT(*) THEN MAX(rowid) END,
+                COUNT(*)
+            FROM trajectory_data
+            GROUP BY run_id, frame
+        """)
+        conn.commit()
+        return stored
+    finally:
+        conn.close()
+
+
+def read_frame_across_runs(store_path: str, frame: int) -> Dict[int, Dict[str, np.ndarray]]:
+    """Read one frame from every run in a single indexed query, keyed by seed"""
+    conn = sqlite3.connect(store_path)
+    try:
+        seeds = dict(conn.execute("SELECT run_id, seed FROM runs"))
+        cursor = conn.execute("""
+            SELECT run_id, frame, id, pos_x, pos_y, ori_x, ori_y
+            FROM trajectory_data
+            WHERE frame = ?
+            ORDER BY run_id, id
+        """, (frame,))
+        rows = np.fromiter(cursor, dtype=[("run_id", np.int64)] + TRAJECTORY_ROW_DTYPE.descr)
+    finally:
+        conn.close()
+
+    result = {seed: {name: np.empty(0) for name in TRAJECTORY_COLUMNS} for seed in seeds.values()}
+    run_ids = rows["run_id"]
+    starts = np.flatnonzero(np.diff(run_ids, prepend=-1))
+    ends = np.append(starts[1:], len(run_ids))
+    for start, end in zip(starts, ends):
+        result[seeds[int(run_ids[start])]] = {
+            name: np.ascontiguousarray(rows[name][start:end]) for name in TRAJECTORY_COLUMNS
+        }
+    return result
+
+
+def extract_run(store_path: str, run_id: int, dest_path: str):
+    """Write one run back out as a standalone JuPedSim-format trajectory file"""
+    conn = sqlite3.connect(dest_path)
+    try:
+        conn.executescript("""
+            CREATE TABLE trajectory_data (
+                frame INTEGER NOT NULL, id INTEGER NOT NULL,
+                pos_x REAL NOT NULL, pos_y REAL NOT NULL,
+                ori_x REAL NOT NULL, ori_y REAL NOT NULL);
+            CREATE TABLE metadata (key TEXT NOT NULL UNIQUE PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE geometry (hash INTEGER NOT NULL, wkt TEXT NOT NULL);
+            CREATE UNIQUE INDEX geometry_hash ON geometry(hash);
+            CREATE TABLE frame_data (frame INTEGER NOT NULL, geometry_hash INTEGER NOT NULL);
+        """)
+        conn.execute("ATTACH DATABASE ? AS store", (store_path,))
+        try:
+            conn.execute("""
+                INSERT INTO trajectory_data
+                SELECT frame, id, pos_x, pos_y, ori_x, ori_y
+                FROM store.trajectory_data WHERE run_id = ? ORDER BY rowid
+            """, (run_id,))
+            conn.execute("INSERT INTO metadata SELECT key, value FROM store.metadata")
+            conn.execute("""
+                INSERT INTO geometry SELECT hash, wkt FROM store.geometry
+                WHERE hash IN (SELECT geometry_hash FROM store.frame_data WHERE run_id = ?)
+            """, (run_id,))
+            conn.execute(
+                "INSERT INTO frame_data SELECT frame, geometry_hash FROM store.frame_data WHERE run_id = ?",
+                (run_id,)
+            )
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE store")
+        conn.execute("CREATE INDEX frame_id_idx ON trajectory_data(frame, id)")
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,92 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from utils.distance_field import distance_field_cache
+
+# Supported values of SimulationParameters.exit_assignment
+EXIT_ASSIGNMENT_MODES = ("geodesic", "euclidean")
+
+
+class ExitAssigner:
+    """Nearest-exit lookup for many agents at once.
+
+    Exits are given as ``{stage_id: geometry}`` so stage ids never depend on
+    list order. Positions are matched against an STRtree of the exit
+    geometries in one vectorized query; among equidistant exits the one listed
+    first wins, as with the previous per-agent loop.
+    """
+
+    def __init__(self, exits: Dict[int, BaseGeometry]):
+        if not exits:
+            raise ValueError("No exits available for agent assignment")
+        self.stage_ids = np.array(list(exits.keys()), dtype=np.int64)
+        self.geometries = np.array(list(exits.values()), dtype=object)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def assign(self, positions: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """Stage id of the nearest exit for each position"""
+        coords = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if len(coords) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        points = shapely.points(coords)
+        point_idx, exit_idx = self.tree.query_nearest(points, all_matches=True)
+        # Ties return every equidistant exit; keep the lowest exit index per point
+        order = np.lexsort((exit_idx, point_idx))
+        point_idx, exit_idx = point_idx[order], exit_idx[order]
+        first = np.ones(len(point_idx), dtype=bool)
+        first[1:] = point_idx[1:] != point_idx[:-1]
+
+        nearest = np.empty(len(coords), dtype=np.int64)
+        nearest[point_idx[first]] = exit_idx[first]
+        return self.stage_ids[nearest]
+
+
+class GeodesicExitAssigner(ExitAssigner):
+    """Nearest exit by walking distance around obstacles, from a cached distance field.
+
+    Each position is one grid-cell lookup. Positions the field cannot answer
+    (outside the grid or cut off from every exit) fall back to straight-line
+    assignment.
+    """
+
+    def __init__(self, exits: Dict[int, BaseGeometry], walkable_polygon: BaseGeometry, cell_size: float = 0.25):
+        super().__init__(exits)
+        self.walkable_polygon = walkable_polygon
+        self.cell_size = cell_size
+        self.field = distance_field_cache.get(walkable_polygon, list(self.geometries), cell_size)
+
+    def __getstate__(self):
+        # The field can be tens of MB; workers fetch it from their own cache instead
+        state = self.__dict__.copy()
+        del state["field"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.field = distance_field_cache.get(self.walkable_polygon, list(self.geometries), self.cell_size)
+
+    def assign(self, positions: Sequence[Tuple[float, float]]) -> np.ndarray:
+        coords = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        exit_idx = self.field.lookup(coords)
+        nearest = np.empty(len(coords), dtype=np.int64)
+        found = exit_idx >= 0
+        nearest[found] = self.stage_ids[exit_idx[found]]
+        if not found.all():
+            nearest[~found] = super().assign(coords[~found])
+        return nearest
+
+
+def create_exit_assigner(
+    exits: Dict[int, BaseGeometry],
+    walkable_polygon: Optional[BaseGeometry] = None,
+    mode: str = "euclidean",
+    cell_size: float = 0.25,
+) -> ExitAssigner:
+    """Exit assigner for the given mode ('geodesic' or 'euclidean')"""
+    if mode == "geodesic" and walkable_polygon is not None:
+        return GeodesicExitAssigner(exits, walkable_polygon, cell_size)
+    return ExitAssigner(exits)
@@ -0,0 +1,138 @@
+import time
+from typing import Any, Dict
+
+import pedpy
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from utils.geometry_cache import geometry_cache
+from utils.scenario_plan import DistributionPlan, ScenarioPlan, _flow_placement, _immediate_placement
+from utils.validation import find_unreachable_stages, reachability_clearance
+
+# Agents per (agent distance)² of usable area that jupedsim places reliably; beyond it
+# placement slows down sharply and fails for some seeds
+PACKING_DENSITY = 0.55
+
+# Random placement jams at about this density and never fits more
+JAMMING_DENSITY = 0.68
+
+# Hexagonal packing of discs: agents per m² for radius r is 1 / (2 * sqrt(3) * r²)
+HEX_PACKING = 2 * 3 ** 0.5
+
+# Flow out of a crowded spawn area, persons per meter of its width and second; with
+# spawn positions blocked by agents walking off, about half of them are free at once.
+# Both fitted to the time flow sources run out of positions (CollisionFreeSpeedModel)
+SPECIFIC_FLOW = 0.9
+FREE_SLOT_SHARE = 0.5
+
+
+def _capacity(
+    area: BaseGeometry,
+    distance_to_agents: float,
+    distance_to_polygon: float,
+    radius: float,
+    density: float = PACKING_DENSITY,
+) -> int:
+    """Agents a placement call can fit: limited by the placement distance and the agents' size.
+
+    Agents may sit right at the wall distance, so each one's share of the area
+    reaches half the agent distance beyond it.
+    """
+    usable = area.buffer(-distance_to_polygon).buffer(distance_to_agents / 2).area
+    by_distance = density * usable / distance_to_agents ** 2
+    by_radius = usable / (HEX_PACKING * radius ** 2) if radius > 0 else by_distance
+    return int(min(by_distance, by_radius))
+
+
+def _flow_throughput(dist: DistributionPlan, polygon: BaseGeometry) -> Dict[str, Any]:
+    """Spawn rate against the rate agents can walk off the area, and when its slots run out"""
+    placement = _flow_placement(dist, 0)
+    slots = _capacity(dist.area, placement["distance_to_agents"], placement["distance_to_polygon"], dist.params.get("radius", 0.2))
+    # Agents leave over the edges that aren't walls, heading one way: at most across the area's width
+    open_edge = dist.area.boundary.difference(polygon.boundary.buffer(0.05)).length
+    corners = shapely.get_coordinates(dist.area.minimum_rotated_rectangle)
+    width = min(shapely.LineString(corners[:2]).length, shapely.LineString(corners[1:3]).length)
+    outflow_width = min(open_edge, width)
+    spawn_rate = dist.flow.agents_per_spawn / dist.flow.frequency
+    outflow = SPECIFIC_FLOW * outflow_width
+    estimate = {
+        "slots": slots,
+        "spawn_rate": round(spawn_rate, 2),
+        "outflow_width": round(outflow_width, 2),
+        "max_outflow": round(outflow, 2),
+        "blocked_at": None,
+    }
+    if outflow_width > 0 and spawn_rate > outflow:
+        blocked_at = dist.flow.start_time + FREE_SLOT_SHARE * slots / (spawn_rate - outflow)
+        if blocked_at < dist.flow.end_time:
+            estimate["blocked_at"] = round(blocked_at, 1)
+    return estimate
+
+
+def check_feasibility(
+    plan: ScenarioPlan, config: Dict[str, Any], walkable_area: pedpy.WalkableArea, max_simulation_time: float
+) -> Dict[str, Any]:
+    """Estimate whether a compiled scenario can run to completion, without placing agents or iterating.
+
+    Errors are problems that make a run fail or never finish, including the
+    unreachable stages validation rejects when a run is started; warnings are
+    likely slowdowns or aborts for some seeds.
+    """
+    started = time.perf_counter()
+    polygon = walkable_area.polygon
+    unreachable = find_unreachable_stages(config, geometry_cache.for_walkable_area(walkable_area))
+    gap = 2 * reachability_clearance(config)
+    errors = [
+        f"Unreachable stage: {problem} (walls or gaps narrower than {gap:.2f} m in between)"
+        for _, problem in unreachable
+    ]
+    warnings, distributions = [], []
+
+    for dist in plan.distributions:
+        radius = dist.params.get("radius", 0.2)
+        report = {"key": dist.key, "agents": dist.number, "area": round(dist.area.area, 2)}
+
+        if dist.flow is None:
+            placement = _immediate_placement(dist, 0)
+            spacing = placement["distance_to_agents"], placement["distance_to_polygon"], radius
+            capacity = _capacity(dist.area, *spacing)
+            limit = _capacity(dist.area, *spacing, density=JAMMING_DENSITY)
+            report["capacity"] = capacity
+            if dist.number > limit:
+                errors.append(
+                    f"Distribution {dist.key}: {dist.number} agents don't fit in {dist.area.area:.1f} m² "
+                    f"(at most about {limit}); placement will fail"
+                )
+            elif dist.number > capacity:
+                warnings.append(
+                    f"Distribution {dist.key}: {dist.number} agents exceed the reliable capacity of {capacity}; "
+                    f"placement will be slow and may fail for some seeds"
+                )
+        else:
+            flow = _flow_throughput(dist, polygon)
+            report["flow"] = flow
+            if flow["slots"] == 0:
+                errors.append(f"Distribution {dist.key}: the flow area is too small to hold a single agent")
+            elif flow["blocked_at"] is not None:
+                warnings.append(
+                    f"Distribution {dist.key}: spawning {flow['spawn_rate']} agents/s exceeds the estimated outflow "
+                    f"of {flow['max_outflow']} agents/s across {flow['outflow_width']} m; "
+                    f"all spawn positions may be blocked at about {flow['blocked_at']} s"
+                )
+            if dist.flow.end_time > max_simulation_time:
+                warnings.append(
+                    f"Distribution {dist.key}: flow spawning ends at {dist.flow.end_time} s, "
+                    f"after max_simulation_time ({max_simulation_time} s)"
+                )
+
+        report["reachable"] = not any(source == dist.key for source, _ in unreachable)
+        distributions.append(report)
+
+    return {
+        "feasible": not errors,
+        "errors": errors,
+        "warnings": warnings,
+        "total_agents": plan.total_agents,
+        "distributions": distributions,
+        "check_time": round(time.perf_counter() - started, 4),
+    }
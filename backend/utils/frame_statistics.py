@@ -0,0 +1,241 @@
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from utils.data_processing import get_trajectory_fps
+from utils.trajectory_loader import TrajectoryArrayLoader
+
+FRAME_STATS_TABLE = "frame_stats"
+FRAME_EXIT_STATS_TABLE = "frame_exit_stats"
+
+FRAME_STATS_COLUMNS = (
+    "frame", "agent_count", "evacuated_count",
+    "mean_speed", "p50_speed", "p90_speed",
+    "min_x", "min_y", "max_x", "max_y",
+)
+
+
+def grouped_percentile(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Linear-interpolated percentile per group of an already group-wise sorted array"""
+    result = np.full(len(starts), np.nan)
+    valid = counts > 0
+    position = starts[valid] + (q / 100.0) * (counts[valid] - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    weight = position - lower
+    result[valid] = sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+    return result
+
+
+class AgentSpeedTracker:
+    """Per-row speed from the previous stored sample of the same agent.
+
+    Feed frame-ordered chunks in sequence; each agent's last position is carried
+    across chunk boundaries, so chunked and unchunked passes give the same speeds.
+    """
+
+    def __init__(self, max_agent_id: int, fps: float):
+        size = max_agent_id + 1
+        self.fps = fps
+        self.last_frame = np.full(size, -1, dtype=np.int64)
+        self.last_x = np.zeros(size)
+        self.last_y = np.zeros(size)
+
+    def update(self, frames: np.ndarray, ids: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Return speeds for one chunk (NaN for an agent's first sample) and advance the carried state"""
+        # Rows are in frame order, so within a chunk the previous sample is the
+        # last earlier row for that id; the first row of each id uses last_*.
+        order = np.lexsort((frames, ids))
+        sorted_ids = ids[order]
+        same_agent = np.zeros(len(ids), dtype=bool)
+        same_agent[1:] = sorted_ids[1:] == sorted_ids[:-1]
+
+        prev_frame = np.empty(len(ids), dtype=np.int64)
+        prev_x = np.empty(len(ids))
+        prev_y = np.empty(len(ids))
+        prev_frame[order[1:]] = frames[order[:-1]]
+        prev_x[order[1:]] = xs[order[:-1]]
+        prev_y[order[1:]] = ys[order[:-1]]
+        carried = order[~same_agent]
+        prev_frame[carried] = self.last_frame[ids[carried]]
+        prev_x[carried] = self.last_x[ids[carried]]
+        prev_y[carried] = self.last_y[ids[carried]]
+
+        has_prev = prev_frame >= 0
+        speed = np.full(len(ids), np.nan)
+        speed[has_prev] = (
+            np.hypot(xs[has_prev] - prev_x[has_prev], ys[has_prev] - prev_y[has_prev])
+            / ((frames[has_prev] - prev_frame[has_prev]) / self.fps)
+        )
+
+        last_rows = order[np.append(~same_agent[1:], True)]
+        self.last_frame[ids[last_rows]] = frames[last_rows]
+        self.last_x[ids[last_rows]] = xs[last_rows]
+        self.last_y[ids[last_rows]] = ys[last_rows]
+        return speed
+
+
+def compute_frame_statistics(
+    sqlite_file: str,
+    exits: Optional[Dict[str, Any]] = None,
+    chunk_rows: int = 250_000,
+) -> Dict[str, Any]:
+    """Aggregate per-frame agent count, speed distribution, exit-zone occupancy and bounding box"""
+    fps = get_trajectory_fps(sqlite_file)
+    exit_ids = []
+    exit_polygons = []
+    for exit_id, exit_data in (exits or {}).items():
+        coords = exit_data.get("coordinates") if isinstance(exit_data, dict) else None
+        if isinstance(coords, list) and len(coords) >= 3:
+            polygon = Polygon(coords)
+            shapely.prepare(polygon)
+            exit_ids.append(exit_id)
+            exit_polygons.append(polygon)
+
+    columns = {name: [] for name in FRAME_STATS_COLUMNS}
+    exit_counts = {exit_id: [] for exit_id in exit_ids}
+
+    with TrajectoryArrayLoader(sqlite_file, chunk_rows) as loader:
+        max_agent_id = loader.get_max_agent_id()
+        speeds = AgentSpeedTracker(max_agent_id, fps)
+        seen = np.zeros(max_agent_id + 1, dtype=bool)
+        seen_total = 0
+
+        for chunk in loader.iter_chunks():
+            frames, ids, xs, ys = chunk["frame"], chunk["id"], chunk["x"], chunk["y"]
+
+            starts = np.flatnonzero(np.diff(frames, prepend=-1))
+            counts = np.diff(np.append(starts, len(frames)))
+            frame_numbers = frames[starts]
+            group = np.repeat(np.arange(len(starts)), counts)
+
+            speed = speeds.update(frames, ids, xs, ys)
+
+            valid = ~np.isnan(speed)
+            valid_counts = np.bincount(group[valid], minlength=len(starts))
+            speed_sums = np.bincount(group[valid], weights=speed[valid], minlength=len(starts))
+            mean_speed = np.divide(speed_sums, valid_counts, out=np.full(len(starts), np.nan), where=valid_counts > 0)
+
+            # NaN sorts last, so valid speeds sit at the front of each frame's block
+            speed_order = np.lexsort((speed, group))
+            sorted_speed = speed[speed_order]
+
+            # Cumulative number of distinct agents seen up to and including each frame
+            new_agent = np.zeros(len(ids), dtype=bool)
+            chunk_ids, first_in_chunk = np.unique(ids, return_index=True)
+            new_agent[first_in_chunk] = ~seen[chunk_ids]
+            seen_by_frame = seen_total + np.cumsum(np.bincount(group[new_agent], minlength=len(starts)))
+            seen[ids] = True
+            seen_total = int(seen_by_frame[-1]) if len(seen_by_frame) else seen_total
+
+            columns["frame"].append(frame_numbers)
+            columns["agent_count"].append(counts)
+            columns["evacuated_count"].append(seen_by_frame - counts)
+            columns["mean_speed"].append(mean_speed)
+            columns["p50_speed"].append(grouped_percentile(sorted_speed, starts, valid_counts, 50))
+            columns["p90_speed"].append(grouped_percentile(sorted_speed, starts, valid_counts, 90))
+            columns["min_x"].append(np.minimum.reduceat(xs, starts))
+            columns["min_y"].append(np.minimum.reduceat(ys, starts))
+            columns["max_x"].append(np.maximum.reduceat(xs, starts))
+            columns["max_y"].append(np.maximum.reduceat(ys, starts))
+
+            for exit_id, polygon in zip(exit_ids, exit_polygons):
+                inside = shapely.contains_xy(polygon, xs, ys)
+                exit_counts[exit_id].append(np.bincount(group[inside], minlength=len(starts)))
+
+    def concat(parts: List[np.ndarray], dtype) -> np.ndarray:
+        return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+    stats = {
+        name: concat(parts, np.int64 if name in ("frame", "agent_count", "evacuated_count") else np.float64)
+        for name, parts in columns.items()
+    }
+    stats["exits"] = {exit_id: concat(parts, np.int64) for exit_id, parts in exit_counts.items()}
+    return stats
+
+
+def build_frame_statistics(sqlite_file: str, exits: Optional[Dict[str, Any]] = None) -> int:
+    """Compute per-frame statistics and store them next to the trajectory"""
+    stats = compute_frame_statistics(sqlite_file, exits)
+
+    conn = sqlite3.connect(sqlite_file)
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {FRAME_STATS_TABLE}")
+        conn.execute(f"DROP TABLE IF EXISTS {FRAME_EXIT_STATS_TABLE}")
+        conn.execute(f"""
+            CREATE TABLE {FRAME_STATS_TABLE} (
+                frame INTEGER PRIMARY KEY,
+                agent_count INTEGER NOT NULL,
+                evacuated_count INTEGER NOT NULL,
+                mean_speed REAL,
+                p50_speed REAL,
+                p90_speed REAL,
+                min_x REAL, min_y REAL, max_x REAL, max_y REAL
+            )
+        """)
+        conn.execute(f"""
+            CREATE TABLE {FRAME_EXIT_STATS_TABLE} (
+                frame INTEGER NOT NULL,
+                exit_id TEXT NOT NULL,
+                agent_count INTEGER NOT NULL,
+                PRIMARY KEY (frame, exit_id)
+            )
+        """)
+
+        # Millimetre / mm-per-second resolution is plenty for timeline sparklines
+        rows = zip(*(
+            (np.round(stats[name], 3) if stats[name].dtype.kind == "f" else stats[name]).tolist()
+            for name in FRAME_STATS_COLUMNS
+        ))
+        conn.executemany(
+            f"INSERT INTO {FRAME_STATS_TABLE} VALUES ({', '.join('?' * len(FRAME_STATS_COLUMNS))})",
+            ([None if isinstance(v, float) and np.isnan(v) else v for v in row] for row in rows)
+        )
+        frame_list = stats["frame"].tolist()
+        for exit_id, counts in stats["exits"].items():
+            conn.executemany(
+                f"INSERT INTO {FRAME_EXIT_STATS_TABLE} VALUES (?, ?, ?)",
+                ((frame, exit_id, count) for frame, count in zip(frame_list, counts.tolist()))
+            )
+        conn.commit()
+        return len(frame_list)
+    finally:
+        conn.close()
+
+
+def load_frame_statistics(sqlite_file: str, stride: int = 1, run_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Read the stored per-frame statistics as columns, or None if they were never built"""
+    run_filter, params = ("WHERE run_id = ?", (run_id,)) if run_id is not None else ("", ())
+    conn = sqlite3.connect(sqlite_file)
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FRAME_STATS_TABLE,)
+        ).fetchone()
+        if not exists:
+            return None
+
+        stride = max(1, stride)
+        rows = conn.execute(
+            f"SELECT {', '.join(FRAME_STATS_COLUMNS)} FROM {FRAME_STATS_TABLE} {run_filter} ORDER BY frame",
+            params
+        ).fetchall()[::stride]
+        result = {
+            name: list(values) for name, values in zip(FRAME_STATS_COLUMNS, zip(*rows))
+        } if rows else {name: [] for name in FRAME_STATS_COLUMNS}
+
+        frame_positions = {frame: i for i, frame in enumerate(result["frame"])}
+        exits = {}
+        for frame, exit_id, count in conn.execute(
+            f"SELECT frame, exit_id, agent_count FROM {FRAME_EXIT_STATS_TABLE} {run_filter} ORDER BY exit_id, frame",
+            params
+        ):
+            position = frame_positions.get(frame)
+            if position is not None:
+                exits.setdefault(exit_id, [0] * len(frame_positions))[position] = count
+        result["exits"] = exits
+        return result
+    finally:
+        conn.close()
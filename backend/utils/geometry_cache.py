@@ -0,0 +1,250 @@
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, NamedTuple, Optional
+
+import pedpy
+import shapely
+from shapely.geometry import Polygon
+from shapely.geometry.base import BaseGeometry
+from shapely.ops import unary_union
+
+from utils.geometry_store import geometry_hash
+
+
+class SharedGeometry(NamedTuple):
+    """Picklable reference to a geometry published in shared memory as WKB"""
+    key: str
+    name: str
+    size: int
+
+
+class PreparedGeometry:
+    """A walkable area parsed (and, on request, repaired) once, with derived data built lazily.
+
+    ``geometry`` is the input (possibly a collection) as used by the routing
+    engine; ``polygon`` is the single polygon simulations run on, the first
+    part of a collection. ``polygon`` is prepared for fast predicates.
+    ``area_key`` is the content hash of ``polygon``, set once it is known.
+    """
+
+    def __init__(self, key: str, geometry: BaseGeometry, area_key: Optional[str] = None):
+        self.key = key
+        self.area_key = area_key
+        self.geometry = geometry
+        self.polygon = geometry.geoms[0] if hasattr(geometry, "geoms") else geometry
+        shapely.prepare(self.polygon)
+        self._walkable_area = None
+        self._holes_union = None
+        self._components: Dict[float, List[BaseGeometry]] = {}
+        self._wkb = None
+
+    @property
+    def is_valid(self) -> bool:
+        return self.geometry.is_valid and self.geometry.is_simple
+
+    @property
+    def walkable_area(self) -> pedpy.WalkableArea:
+        if self._walkable_area is None:
+            self._walkable_area = pedpy.WalkableArea(self.polygon)
+        return self._walkable_area
+
+    @property
+    def holes_union(self) -> Optional[BaseGeometry]:
+        """Union of the obstacle holes of the polygon, or None without holes"""
+        if self._holes_union is None:
+            holes = [Polygon(interior) for interior in self.polygon.interiors]
+            self._holes_union = unary_union(holes) if holes else False
+        return self._holes_union or None
+
+    def components(self, clearance: float = 0.0) -> List[BaseGeometry]:
+        """Connected parts of ``polygon`` where a point can stay ``clearance`` away from walls and obstacles.
+
+        With an agent's radius as clearance, gaps too narrow for the agent split
+        the area. Computed once per clearance; the parts are prepared.
+        """
+        if clearance not in self._components:
+            free = self.polygon.buffer(-clearance) if clearance > 0 else self.polygon
+            parts = [part for part in getattr(free, "geoms", [free]) if not part.is_empty]
+            for part in parts:
+                shapely.prepare(part)
+            self._components[clearance] = parts
+        return self._components[clearance]
+
+    @property
+    def wkb(self) -> bytes:
+        if self._wkb is None:
+            self._wkb = shapely.to_wkb(self.geometry)
+        return self._wkb
+
+
+def _area_key(walkable_area: pedpy.WalkableArea) -> str:
+    return geometry_hash(shapely.to_wkb(walkable_area.polygon, hex=True))
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    """Open an existing shared-memory block without leaving it registered with a resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Before Python 3.13 every attach registers the block, and the tracker would unlink
+    # it when this process exits; only the creator unlinks it (``unshare``)
+    block = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+class GeometryCache:
+    """Process-local LRU of prepared geometries keyed by content hash.
+
+    Walkable areas are looked up by the content hash of their polygon, which
+    maps to the entry they were built from. Worker processes forked after a
+    geometry was cached find it here directly;
+    otherwise the parent publishes the repaired geometry as WKB in shared memory
+    (``share``) and workers rebuild it with ``attach`` instead of reparsing WKT.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, PreparedGeometry]" = OrderedDict()
+        self._by_area: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_loads = 0
+        self.parse_seconds = 0.0
+
+    def _lookup(self, key: str) -> Optional[PreparedGeometry]:
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return prepared
+
+    def _insert(self, prepared: PreparedGeometry) -> PreparedGeometry:
+        with self._lock:
+            existing = self._entries.get(prepared.key)
+            if existing is not None:
+                return existing
+            self._entries[prepared.key] = prepared
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                if evicted.area_key is not None and self._by_area.get(evicted.area_key) == evicted.key:
+                    del self._by_area[evicted.area_key]
+            return prepared
+
+    def walkable_area(self, prepared: PreparedGeometry) -> pedpy.WalkableArea:
+        """Walkable area of a prepared geometry; later lookups by an equal area hit the cache"""
+        area = prepared.walkable_area
+        if prepared.area_key is None:
+            prepared.area_key = _area_key(area)
+        with self._lock:
+            if prepared.key in self._entries:
+                self._by_area[prepared.area_key] = prepared.key
+        return area
+
+    def _parse(self, key: str, geometry_wkt: str) -> PreparedGeometry:
+        prepared = self._lookup(key)
+        if prepared is not None:
+            return prepared
+
+        started = time.perf_counter()
+        geometry = shapely.from_wkt(geometry_wkt)
+        if geometry.is_empty or (hasattr(geometry, "geoms") and len(geometry.geoms) == 0):
+            raise ValueError("WKT geometry is empty")
+
+        prepared = PreparedGeometry(key, geometry)
+        with self._lock:
+            self.misses += 1
+            self.parse_seconds += time.perf_counter() - started
+        return self._insert(prepared)
+
+    def get(self, geometry_wkt: str, repair: bool = False) -> PreparedGeometry:
+        """Parse and prepare a WKT geometry, or return the cached result.
+
+        With ``repair`` an invalid or non-simple geometry is replaced by its
+        ``buffer(0)``, cached separately; simulations run on the geometry as
+        given, so pedpy still rejects invalid areas. Raises ValueError for
+        empty geometries.
+        """
+        key = geometry_hash(geometry_wkt)
+        prepared = self._parse(key, geometry_wkt)
+        if not repair or prepared.is_valid:
+            return prepared
+
+        repaired_key = f"{key}:repaired"
+        repaired = self._lookup(repaired_key)
+        if repaired is not None:
+            return repaired
+        started = time.perf_counter()
+        repaired = PreparedGeometry(repaired_key, prepared.geometry.buffer(0))
+        with self._lock:
+            self.misses += 1
+            self.parse_seconds += time.perf_counter() - started
+        return self._insert(repaired)
+
+    def for_walkable_area(self, walkable_area: pedpy.WalkableArea) -> PreparedGeometry:
+        """Prepared geometry of a walkable area, preparing (and caching) it if unknown"""
+        area_key = _area_key(walkable_area)
+        with self._lock:
+            key = self._by_area.get(area_key, area_key)
+        prepared = self._lookup(key)
+        if prepared is None:
+            prepared = PreparedGeometry(area_key, walkable_area.polygon, area_key)
+            prepared._walkable_area = walkable_area
+            with self._lock:
+                self.misses += 1
+            prepared = self._insert(prepared)
+        return prepared
+
+    def share(self, prepared: PreparedGeometry) -> shared_memory.SharedMemory:
+        """Publish a prepared geometry's WKB in shared memory; release it with ``unshare``"""
+        data = prepared.wkb
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        block.buf[:len(data)] = data
+        return block
+
+    def unshare(self, block: shared_memory.SharedMemory):
+        """Close and unlink a block from ``share`` once no worker attaches to it any more"""
+        # Forked workers share this process' tracker, so their attach may have taken the
+        # registration back; restore it so that unlink's unregister finds it
+        resource_tracker.register(block._name, "shared_memory")
+        block.close()
+        block.unlink()
+
+    def attach(self, shared: SharedGeometry) -> PreparedGeometry:
+        """Prepared geometry for a shared reference: from this process' cache or the shared WKB"""
+        prepared = self._lookup(shared.key)
+        if prepared is not None:
+            return prepared
+
+        block = _attach_block(shared.name)
+        try:
+            geometry = shapely.from_wkb(bytes(block.buf[:shared.size]))
+        finally:
+            block.close()
+
+        with self._lock:
+            self.misses += 1
+            self.shared_loads += 1
+        return self._insert(PreparedGeometry(shared.key, geometry))
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "shared_loads": self.shared_loads,
+                "parse_seconds": round(self.parse_seconds, 3),
+            }
+
+
+# Global cache instance
+geometry_cache = GeometryCache()
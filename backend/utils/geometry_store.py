@@ -0,0 +1,59 @@
+import hashlib
+import threading
+from typing import Dict, Optional
+
+
+def geometry_hash(geometry_wkt: str) -> str:
+    """Content hash identifying a geometry"""
+    return hashlib.sha256(geometry_wkt.encode("utf-8")).hexdigest()
+
+
+class GeometryStore:
+    """Keeps each distinct geometry WKT once, keyed by content hash.
+
+    Results reference their geometry by hash; entries are reference counted so
+    a geometry shared by several simulations is dropped with the last of them.
+    """
+
+    def __init__(self):
+        self._geometries: Dict[str, str] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def put(self, geometry_wkt: str) -> Optional[str]:
+        """Store a geometry (or add a reference to it) and return its hash"""
+        if not geometry_wkt:
+            return None
+        key = geometry_hash(geometry_wkt)
+        with self._lock:
+            self._geometries.setdefault(key, geometry_wkt)
+            self._refcounts[key] = self._refcounts.get(key, 0) + 1
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._geometries.get(key)
+
+    def release(self, key: Optional[str]):
+        """Drop one reference; the geometry is removed with its last reference"""
+        if not key:
+            return
+        with self._lock:
+            remaining = self._refcounts.get(key, 0) - 1
+            if remaining > 0:
+                self._refcounts[key] = remaining
+            else:
+                self._refcounts.pop(key, None)
+                self._geometries.pop(key, None)
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "geometries": len(self._geometries),
+                "references": sum(self._refcounts.values()),
+                "bytes": sum(len(wkt) for wkt in self._geometries.values()),
+            }
+
+
+# Global store instance
+geometry_store = GeometryStore()
@@ -0,0 +1,225 @@
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+DISTRIBUTION_PREFIX = 'jps-distributions_'
+WAYPOINT_PREFIX = 'jps-waypoints_'
+
+# Refuse routing that still expands into more variants than this after pruning
+MAX_JOURNEY_VARIANTS = 1000
+
+
+class RoutingCycleError(ValueError):
+    """Waypoint routing of a journey leads back to a waypoint it came from"""
+
+
+class JourneyVariants(NamedTuple):
+    variants: List[Tuple[List[str], float]]  # (stages from the distribution on, percentage)
+    total: int  # Paths through the routing before pruning
+    pruned: int
+    seconds: float
+
+
+def _destinations(waypoint_routing: Dict, waypoint: str, journey_id: str) -> List[Dict]:
+    routing = waypoint_routing.get(waypoint, {}).get(journey_id)
+    return routing.get("destinations", []) if routing else []
+
+
+class _RoutingGraph:
+    """Waypoint routing of one journey as a DAG, with per-waypoint path counts and best percentages.
+
+    Each waypoint is walked once (memoized), so counting and bounding stay
+    linear in the routing size however many paths it spans.
+    """
+
+    def __init__(self, journey_id: str, waypoint_routing: Dict):
+        self.journey_id = journey_id
+        self.waypoint_routing = waypoint_routing
+        self._summary: Dict[str, Tuple[int, float]] = {}
+
+    def destinations(self, waypoint: str) -> List[Dict]:
+        return _destinations(self.waypoint_routing, waypoint, self.journey_id)
+
+    def summary(self, waypoint: str, visiting: Tuple[str, ...] = ()) -> Tuple[int, float]:
+        """Number of paths from a waypoint and the largest percentage any of them keeps"""
+        if waypoint in self._summary:
+            return self._summary[waypoint]
+        if waypoint in visiting:
+            cycle = visiting[visiting.index(waypoint):] + (waypoint,)
+            raise RoutingCycleError(f"Waypoint routing for journey {self.journey_id} loops: {' -> '.join(cycle)}")
+
+        destinations = self.destinations(waypoint)
+        if not destinations:
+            result = (1, 100.0)
+        else:
+            count, best = 0, 0.0
+            for destination in destinations:
+                if destination["target"].startswith(WAYPOINT_PREFIX):
+                    target_count, target_best = self.summary(destination["target"], visiting + (waypoint,))
+                    count += target_count
+                    best = max(best, destination["percentage"] * target_best / 100.0)
+                else:
+                    count += 1
+                    best = max(best, destination["percentage"])
+            result = (count, best)
+        self._summary[waypoint] = result
+        return result
+
+
+def _initial_waypoints(journey_id: str, base_stages: List[str], waypoint_routing: Dict) -> List[str]:
+    """Waypoints of a journey with routing for it that no other waypoint routes to"""
+    target_waypoints = {
+        destination["target"]
+        for waypoint in waypoint_routing
+        for destination in _destinations(waypoint_routing, waypoint, journey_id)
+        if destination["target"].startswith(WAYPOINT_PREFIX)
+    }
+    return [
+        stage for stage in base_stages
+        if stage.startswith(WAYPOINT_PREFIX)
+        and journey_id in waypoint_routing.get(stage, {})
+        and stage not in target_waypoints
+    ]
+
+
+def _too_many_variants(journey_id: str) -> str:
+    return (
+        f"Waypoint routing for journey {journey_id} yields more than {MAX_JOURNEY_VARIANTS} journey variants; "
+        f"raise min_variant_percentage to drop unlikely routes or use journey_routing 'transitions'"
+    )
+
+
+def check_routing_cycles(waypoint_routing: Dict):
+    """Raise RoutingCycleError if any journey's waypoint routing contains a loop"""
+    graphs = {}
+    for waypoint, journey_routing in waypoint_routing.items():
+        for journey_id in journey_routing:
+            graph = graphs.setdefault(journey_id, _RoutingGraph(journey_id, waypoint_routing))
+            graph.summary(waypoint)
+
+
+def enumerate_journey_variants(
+    journey_id: str,
+    base_stages: List[str],
+    waypoint_routing: Dict,
+    min_percentage: float = 0.0,
+) -> JourneyVariants:
+    """All routes a journey's agents can take through percentage routing, with their percentages.
+
+    Routes start at the journey's first distribution and an initial waypoint
+    (one with routing that no other waypoint routes to). Branches that cannot
+    reach ``min_percentage`` are not explored.
+    """
+    started = time.perf_counter()
+
+    def unrouted() -> JourneyVariants:
+        return JourneyVariants([(base_stages, 100.0)], 1, 0, time.perf_counter() - started)
+
+    if not waypoint_routing:
+        return unrouted()
+    distributions = [stage for stage in base_stages if stage.startswith(DISTRIBUTION_PREFIX)]
+    if not distributions:
+        return unrouted()
+
+    initial_waypoints = _initial_waypoints(journey_id, base_stages, waypoint_routing)
+    if not initial_waypoints:
+        return unrouted()
+
+    graph = _RoutingGraph(journey_id, waypoint_routing)
+    total = sum(graph.summary(waypoint)[0] for waypoint in initial_waypoints)
+    variants = []
+
+    def emit(path: List[str], edge_percentages: List[float], percentage: float):
+        # Fold from the end of the route, as the percentages were always combined
+        for edge_percentage in reversed(edge_percentages):
+            percentage = edge_percentage * percentage / 100.0
+        if percentage < min_percentage:
+            return
+        if len(variants) >= MAX_JOURNEY_VARIANTS:
+            raise ValueError(_too_many_variants(journey_id))
+        variants.append((path, percentage))
+
+    def visit(waypoint: str, path: List[str], edge_percentages: List[float], share: float):
+        path = path + [waypoint]
+        destinations = graph.destinations(waypoint)
+        if not destinations:
+            emit(path, edge_percentages, 100.0)
+            return
+        for destination in destinations:
+            target, percentage = destination["target"], destination["percentage"]
+            if target.startswith(WAYPOINT_PREFIX):
+                # Skip branches whose most likely route already falls below the threshold
+                if share * percentage / 100.0 * graph.summary(target)[1] < min_percentage:
+                    continue
+                visit(target, path, edge_percentages + [percentage], share * percentage / 100.0)
+            else:
+                emit(path + [target], edge_percentages, percentage)
+
+    # All distributions of a journey follow the same routes; the first one stands for them
+    for waypoint in initial_waypoints:
+        visit(waypoint, [distributions[0]], [], 1.0)
+
+    if not variants:
+        best = max(graph.summary(waypoint)[1] for waypoint in initial_waypoints)
+        raise ValueError(
+            f"min_variant_percentage {min_percentage}% drops every route of journey {journey_id} "
+            f"(the most likely one is taken by {best:.2f}%)"
+        )
+    return JourneyVariants(variants, total, total - len(variants), time.perf_counter() - started)
+
+
+def check_variant_count(journeys: List[Dict], waypoint_routing: Dict, min_percentage: float = 0.0):
+    """Raise ValueError if a journey's routing expands into more than MAX_JOURNEY_VARIANTS variants.
+
+    Paths are counted on the memoized routing graph; only journeys over the
+    limit are enumerated, to see whether ``min_percentage`` prunes them below it.
+    """
+    for journey in journeys:
+        journey_id, base_stages = journey["id"], journey.get("stages", [])
+        if not any(stage.startswith(DISTRIBUTION_PREFIX) for stage in base_stages):
+            continue
+        graph = _RoutingGraph(journey_id, waypoint_routing)
+        initial_waypoints = _initial_waypoints(journey_id, base_stages, waypoint_routing)
+        if sum(graph.summary(waypoint)[0] for waypoint in initial_waypoints) <= MAX_JOURNEY_VARIANTS:
+            continue
+        if min_percentage <= 0:
+            raise ValueError(_too_many_variants(journey_id))
+        enumerate_journey_variants(journey_id, base_stages, waypoint_routing, min_percentage)
+
+
+class JourneyTransitions(NamedTuple):
+    initial_waypoints: List[str]
+    stages: List[str]  # Every stage reachable from the initial waypoints, breadth first
+    transitions: List[Tuple[str, List[Tuple[str, float]]]]  # (waypoint, [(target, percentage)])
+    routes: int  # Paths the transitions span, i.e. the variants enumeration would create
+    seconds: float
+
+
+def journey_transitions(journey_id: str, base_stages: List[str], waypoint_routing: Dict) -> Optional[JourneyTransitions]:
+    """A journey's percentage routing as per-waypoint splits, the edges of the routing graph.
+
+    Returns None when the journey has no routing from a distribution, like
+    the cases where ``enumerate_journey_variants`` keeps the base stages.
+    """
+    started = time.perf_counter()
+    if not waypoint_routing or not any(stage.startswith(DISTRIBUTION_PREFIX) for stage in base_stages):
+        return None
+    initial_waypoints = _initial_waypoints(journey_id, base_stages, waypoint_routing)
+    if not initial_waypoints:
+        return None
+
+    graph = _RoutingGraph(journey_id, waypoint_routing)
+    routes = sum(graph.summary(waypoint)[0] for waypoint in initial_waypoints)
+
+    stages = list(initial_waypoints)
+    seen = set(stages)
+    transitions = []
+    for stage in stages:  # Grows while iterating: breadth first
+        destinations = graph.destinations(stage) if stage.startswith(WAYPOINT_PREFIX) else []
+        if not destinations:
+            continue
+        transitions.append((stage, [(destination["target"], destination["percentage"]) for destination in destinations]))
+        for destination in destinations:
+            if destination["target"] not in seen:
+                seen.add(destination["target"])
+                stages.append(destination["target"])
+    return JourneyTransitions(initial_waypoints, stages, transitions, routes, time.perf_counter() - started)
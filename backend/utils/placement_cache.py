@@ -0,0 +1,343 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import jupedsim as jps
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+# Automatic parallel placement only pays off above this many estimated agents
+PARALLEL_PLACEMENT_MIN_AGENTS = 2000
+MAX_PLACEMENT_WORKERS = 8
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class PlacementRequest(NamedTuple):
+    """A seeded placement call: ``kind`` is "by_number" or "until_filled", ``arguments`` its keywords"""
+    kind: str
+    arguments: Dict
+
+
+def _place(kind: str, arguments: Dict):
+    """Run one jupedsim placement in a worker process; the random state it leaves is part of the result"""
+    place = jps.distribute_by_number if kind == "by_number" else jps.distribute_until_filled
+    started = time.perf_counter()
+    try:
+        positions = place(**arguments)
+    except Exception:
+        # The caller places it again in order and reports the failure there
+        return None
+    elapsed = time.perf_counter() - started
+    return np.asarray(positions, dtype=np.float64).reshape(-1, 2), np.random.get_state(), elapsed
+
+
+def _placement_pool() -> ProcessPoolExecutor:
+    """The process pool shared by all prefetches, started on first use.
+
+    Its size bounds the placement processes across concurrent requests, and its
+    workers come from a forkserver (spawn where unavailable) instead of forks of
+    the multi-threaded server process.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=min(multiprocessing.cpu_count(), MAX_PLACEMENT_WORKERS),
+                mp_context=multiprocessing.get_context(start_method),
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _estimated_agents(request: PlacementRequest) -> float:
+    if request.kind == "by_number":
+        return request.arguments["number_of_agents"]
+    return request.arguments["polygon"].area / request.arguments["distance_to_agents"] ** 2
+
+
+class PlacementCache:
+    """Memoizes jupedsim agent placements (distribute_by_number / distribute_until_filled).
+
+    Placement is deterministic for a given polygon, spacing, count and seed, so
+    reruns of a layout with other model parameters reuse the stored positions.
+    Entries are kept as float64 arrays in least-recently-used order and evicted
+    once ``max_points`` positions or ``max_entries`` placements are held
+    (CROWDFLOW_PLACEMENT_CACHE_POINTS / CROWDFLOW_PLACEMENT_CACHE_ENTRIES).
+
+    jupedsim seeds and draws from numpy's global random state while placing,
+    and callers keep sampling from it afterwards, so each entry also stores the
+    random state placement left behind and a hit restores it.
+
+    The cache is process-local; placements computed in worker processes (and
+    their hit counts) are handed back with ``drain`` and ``merge`` so later
+    forked workers inherit them. ``prefetch`` computes independent placements
+    in a process pool ahead of the calls that consume them.
+    """
+
+    def __init__(self, max_points: Optional[int] = None, max_entries: Optional[int] = None):
+        self.max_points = max_points or int(os.environ.get("CROWDFLOW_PLACEMENT_CACHE_POINTS", 2_000_000))
+        self.max_entries = max_entries or int(os.environ.get("CROWDFLOW_PLACEMENT_CACHE_ENTRIES", 256))
+        self._entries: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._random_states: Dict[Tuple, tuple] = {}
+        self._new_keys = set()
+        self._points = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+        self._compute_seconds: Dict[Tuple, float] = {}
+        self._drained_counters = (0, 0, 0.0)
+        if hasattr(os, "register_at_fork"):
+            # Forked workers inherit this process' counters; only report what they add
+            os.register_at_fork(after_in_child=self._reset_drain_baseline)
+
+    def _reset_drain_baseline(self):
+        self._lock = threading.Lock()
+        self._new_keys = set()
+        self._drained_counters = (self.hits, self.misses, self.seconds_saved)
+
+    @staticmethod
+    def _polygon_key(polygon: Polygon) -> str:
+        return hashlib.sha1(shapely.to_wkb(polygon)).hexdigest()
+
+    def _get(self, key: Tuple) -> Optional[List[Tuple[float, float]]]:
+        with self._lock:
+            positions = self._entries.get(key)
+            if positions is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += self._compute_seconds.get(key, 0.0)
+            random_state = self._random_states.get(key)
+        if random_state is not None:
+            np.random.set_state(random_state)
+        # A fresh list each time: callers shuffle placements in place
+        return [tuple(p) for p in positions.tolist()]
+
+    def _put(self, key: Tuple, positions: np.ndarray, random_state: tuple, compute_seconds: float, new: bool = True):
+        if len(positions) > self.max_points:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = positions
+            self._random_states[key] = random_state
+            self._compute_seconds[key] = compute_seconds
+            self._points += len(positions)
+            if new:
+                self._new_keys.add(key)
+            while self._points > self.max_points or len(self._entries) > self.max_entries:
+                old_key, old_positions = self._entries.popitem(last=False)
+                self._compute_seconds.pop(old_key, None)
+                self._random_states.pop(old_key, None)
+                self._new_keys.discard(old_key)
+                self._points -= len(old_positions)
+                self.evictions += 1
+
+    def _placement(self, key: Tuple, place) -> List[Tuple[float, float]]:
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        positions = place()
+        elapsed = time.perf_counter() - started
+        self._put(key, np.asarray(positions, dtype=np.float64).reshape(-1, 2), np.random.get_state(), elapsed)
+        return positions
+
+    def distribute_by_number(
+        self,
+        *,
+        polygon: Polygon,
+        number_of_agents: int,
+        distance_to_agents: float,
+        distance_to_polygon: float,
+        seed: Optional[int] = None,
+        max_iterations: int = 10000,
+    ) -> List[Tuple[float, float]]:
+        """Cached ``jps.distribute_by_number``; unseeded placements are never cached"""
+        def place():
+            return jps.distribute_by_number(
+                polygon=polygon,
+                number_of_agents=number_of_agents,
+                distance_to_agents=distance_to_agents,
+                distance_to_polygon=distance_to_polygon,
+                seed=seed,
+                max_iterations=max_iterations,
+            )
+
+        if seed is None:
+            return place()
+        key = self._by_number_key(polygon, number_of_agents, distance_to_agents, distance_to_polygon, seed, max_iterations)
+        return self._placement(key, place)
+
+    def distribute_until_filled(
+        self,
+        *,
+        polygon: Polygon,
+        distance_to_agents: float,
+        distance_to_polygon: float,
+        seed: Optional[int] = None,
+        max_iterations: int = 10000,
+        k: int = 30,
+    ) -> List[Tuple[float, float]]:
+        """Cached ``jps.distribute_until_filled``; unseeded placements are never cached"""
+        def place():
+            return jps.distribute_until_filled(
+                polygon=polygon,
+                distance_to_agents=distance_to_agents,
+                distance_to_polygon=distance_to_polygon,
+                seed=seed,
+                max_iterations=max_iterations,
+                k=k,
+            )
+
+        if seed is None:
+            return place()
+        key = self._until_filled_key(polygon, distance_to_agents, distance_to_polygon, seed, max_iterations, k)
+        return self._placement(key, place)
+
+    def _by_number_key(self, polygon, number_of_agents, distance_to_agents, distance_to_polygon, seed, max_iterations=10000) -> Tuple:
+        return ("by_number", self._polygon_key(polygon), int(number_of_agents),
+                float(distance_to_agents), float(distance_to_polygon), int(seed), int(max_iterations))
+
+    def _until_filled_key(self, polygon, distance_to_agents, distance_to_polygon, seed, max_iterations=10000, k=30) -> Tuple:
+        return ("until_filled", self._polygon_key(polygon), float(distance_to_agents),
+                float(distance_to_polygon), int(seed), int(max_iterations), int(k))
+
+    def _request_key(self, request: PlacementRequest) -> Tuple:
+        if request.kind == "by_number":
+            return self._by_number_key(**request.arguments)
+        return self._until_filled_key(**request.arguments)
+
+    def prefetch(self, requests: Sequence[PlacementRequest], max_workers: int = 0) -> int:
+        """Compute the uncached placements among ``requests`` in parallel and store them.
+
+        jupedsim places agents in Python and draws from numpy's global random
+        state, so threads would neither overlap nor stay deterministic; each
+        placement runs in its own process instead. Results are stored in
+        request order together with the random state they leave behind, so the
+        subsequent sequential calls hit the cache and see exactly what they
+        would have computed themselves. ``max_workers`` 0 decides from the
+        amount of work, 1 disables prefetching; at most ``max_workers``
+        placements of this call run at once in the shared, bounded pool.
+        Returns the number prefetched.
+        """
+        if max_workers == 1:
+            return 0
+        pending, seen = [], set()
+        with self._lock:
+            for request in requests:
+                key = self._request_key(request)
+                if key not in self._entries and key not in seen:
+                    seen.add(key)
+                    pending.append((key, request))
+        if len(pending) < 2:
+            return 0
+        if max_workers == 0:
+            if sum(_estimated_agents(request) for _, request in pending) < PARALLEL_PLACEMENT_MIN_AGENTS:
+                return 0
+            max_workers = len(pending)
+        max_workers = min(max_workers, len(pending), multiprocessing.cpu_count(), MAX_PLACEMENT_WORKERS)
+        if max_workers < 2:
+            return 0
+
+        started = time.perf_counter()
+        pool = _placement_pool()
+        in_flight = threading.BoundedSemaphore(max_workers)
+        try:
+            futures = []
+            for _, request in pending:
+                in_flight.acquire()
+                future = pool.submit(_place, request.kind, request.arguments)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+            results = [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            # The sequential calls place everything themselves
+            print(f"WARNING: Placement pool failed, placing sequentially: {e}")
+            _discard_pool(pool)
+            return 0
+
+        prefetched = 0
+        for (key, _), result in zip(pending, results):
+            if result is not None:
+                self._put(key, *result)
+                prefetched += 1
+        print(f"Prefetched {prefetched} placements with {max_workers} processes in {time.perf_counter() - started:.2f}s")
+        return prefetched
+
+    def drain(self) -> Dict:
+        """Placements computed and counters accrued in this process since the last drain (returned from workers)"""
+        with self._lock:
+            entries = [
+                (key, self._entries[key], self._random_states[key], self._compute_seconds.get(key, 0.0))
+                for key in self._new_keys if key in self._entries
+            ]
+            self._new_keys.clear()
+            hits, misses, seconds_saved = self._drained_counters
+            self._drained_counters = (self.hits, self.misses, self.seconds_saved)
+            return {
+                "entries": entries,
+                "hits": self.hits - hits,
+                "misses": self.misses - misses,
+                "seconds_saved": self.seconds_saved - seconds_saved,
+            }
+
+    def merge(self, drained: Optional[Dict]):
+        """Add placements and counters drained in another process"""
+        if not drained:
+            return
+        for key, positions, random_state, compute_seconds in drained["entries"]:
+            self._put(key, positions, random_state, compute_seconds, new=False)
+        with self._lock:
+            self.hits += drained["hits"]
+            self.misses += drained["misses"]
+            self.seconds_saved += drained["seconds_saved"]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._compute_seconds.clear()
+            self._random_states.clear()
+            self._new_keys.clear()
+            self._points = 0
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "points": self._points,
+                "position_bytes": self._points * 16,
+                "max_points": self.max_points,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "placement_seconds_saved": round(self.seconds_saved, 2),
+            }
+
+
+# Global cache instance
+placement_cache = PlacementCache()
@@ -0,0 +1,181 @@
+import math
+from typing import Optional
+
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+# Neighbour cells that can hold a point closer than the agent distance to a point in
+# the centre cell (cell size r/sqrt(2)); anywhere in the 5x5 block for cell corners
+_NEIGHBOURS = [
+    (d_row, d_col)
+    for d_row in range(-2, 3)
+    for d_col in range(-2, 3)
+    if (d_row, d_col) != (0, 0) and abs(d_row) + abs(d_col) < 4
+]
+_BLOCK = [(d_row, d_col) for d_row in range(-2, 3) for d_col in range(-2, 3)]
+
+# Corners, edge midpoints and centre of a cell, as fractions of the cell size
+_COVERAGE_PROBES = [(f_col, f_row) for f_col in (0.0, 0.5, 1.0) for f_row in (0.0, 0.5, 1.0)]
+
+# Failed attempts after which a cell is checked for coverage
+_COVERAGE_CHECKS = (2, 6)
+
+
+class PoissonDiskSampler:
+    """Grid-accelerated Poisson-disk sampling of a polygon, generated on demand.
+
+    Points keep ``distance_to_agents`` from each other and
+    ``distance_to_polygon`` from the polygon's edges, including the edges of
+    holes (obstacles). The background grid has cells of ``r / sqrt(2)``, so a
+    cell holds at most one point and only the 20 surrounding cells need to be
+    checked. Cells are visited in nine interleaved phases (row % 3, col % 3):
+    candidates of one phase are at least 1.4 r apart, so a whole batch is
+    tested against the grid at once. A cell retires once it holds a point,
+    once its corners and centre are covered by existing points, or after
+    ``k`` failed candidates, like jupedsim's ``distribute_until_filled``.
+
+    Each batch draws cells at random from the whole area, so points come out
+    in a spatially shuffled order and ``take`` can hand out the first slots
+    long before the area is full. Sampling uses its own generator and leaves
+    numpy's global random state alone.
+    """
+
+    def __init__(
+        self,
+        polygon: BaseGeometry,
+        distance_to_agents: float,
+        distance_to_polygon: float,
+        seed: Optional[int] = None,
+        k: int = 30,
+        batch_size: int = 1024,
+    ):
+        self.radius = float(distance_to_agents)
+        self.cell_size = self.radius / math.sqrt(2.0)
+        self.k = k
+        self.batch_size = batch_size
+        self._rng = np.random.default_rng(seed)
+
+        # Buffer arcs are chords (8 segments per quarter circle); widen so no chord cuts inside
+        region = polygon.buffer(-distance_to_polygon / math.cos(math.pi / 32)) if distance_to_polygon > 0 else polygon
+        shapely.prepare(region)
+        self.region = region
+
+        minx, miny, maxx, maxy = region.bounds if not region.is_empty else (0.0, 0.0, 0.0, 0.0)
+        self.origin = (minx, miny)
+        self.cols = max(int(math.ceil((maxx - minx) / self.cell_size)), 1)
+        self.rows = max(int(math.ceil((maxy - miny) / self.cell_size)), 1)
+        self._grid = np.full(self.rows * self.cols, -1, dtype=np.int64)
+        self._attempts = np.zeros(self.rows * self.cols, dtype=np.int32)
+
+        # Cells that may hold a point (centre within half a diagonal of the region), and
+        # those lying wholly inside it, whose candidates need no polygon test
+        self._interior = np.zeros(self.rows * self.cols, dtype=bool)
+        if region.is_empty:
+            candidates = np.empty(0, dtype=np.int64)
+        else:
+            rows, cols = np.divmod(np.arange(self.rows * self.cols), self.cols)
+            centre_x = minx + (cols + 0.5) * self.cell_size
+            centre_y = miny + (rows + 0.5) * self.cell_size
+            candidates = np.flatnonzero(shapely.contains_xy(region.buffer(self.cell_size * 0.71), centre_x, centre_y))
+            core = region.buffer(-self.cell_size * 0.71)
+            if not core.is_empty:
+                self._interior[candidates] = shapely.contains_xy(core, centre_x[candidates], centre_y[candidates])
+        phase = (candidates // self.cols) % 3 * 3 + (candidates % self.cols) % 3
+        self._phase_cells = [candidates[phase == p] for p in range(9)]
+
+        self._phase = 0
+        self._idle_phases = 0
+        self._queue = np.empty(0, dtype=np.int64)
+        self._points = np.empty((max(len(candidates) // 2, 16), 2))
+        self.count = 0
+        self.exhausted = len(candidates) == 0
+
+    @property
+    def points(self) -> np.ndarray:
+        """All points generated so far, in generation order"""
+        return self._points[:self.count]
+
+    def take(self, n: int) -> np.ndarray:
+        """Generate until at least ``n`` points exist (fewer once the area is full)"""
+        while self.count < n and not self.exhausted:
+            if len(self._queue) == 0:
+                self._next_phase()
+                continue
+            # Small batches keep the first slots cheap; large demands go in one pass
+            size = max(self.batch_size, n - self.count)
+            batch, self._queue = self._queue[:size], self._queue[size:]
+            self._try(batch)
+        return self.points[:n]
+
+    def fill(self) -> np.ndarray:
+        """Generate until the area is full"""
+        while not self.exhausted:
+            self.take(len(self._grid))
+        return self.points
+
+    def _next_phase(self):
+        cells = self._phase_cells[self._phase]
+        cells = cells[(self._grid[cells] < 0) & (self._attempts[cells] < self.k)]
+        # Check coverage at two points in a cell's life rather than every round
+        missed = np.flatnonzero(np.isin(self._attempts[cells], _COVERAGE_CHECKS))
+        if len(missed):
+            cells = np.delete(cells, missed[self._covered(cells[missed])])
+        self._phase_cells[self._phase] = cells
+        self._phase = (self._phase + 1) % 9
+        if len(cells) == 0:
+            self._idle_phases += 1
+            self.exhausted = self._idle_phases >= 9
+            return
+        self._idle_phases = 0
+        self._queue = self._rng.permutation(cells)
+
+    def _near_points(self, x: np.ndarray, y: np.ndarray, rows: np.ndarray, cols: np.ndarray, offsets) -> np.ndarray:
+        """Whether an existing point lies closer than the agent distance, searching the given cell offsets"""
+        near = np.zeros(len(x), dtype=bool)
+        r2 = self.radius * self.radius
+        for d_row, d_col in offsets:
+            n_rows, n_cols = rows + d_row, cols + d_col
+            inside = ~near & (n_rows >= 0) & (n_rows < self.rows) & (n_cols >= 0) & (n_cols < self.cols)
+            neighbour = np.full(len(x), -1, dtype=np.int64)
+            neighbour[inside] = self._grid[n_rows[inside] * self.cols + n_cols[inside]]
+            occupied = np.flatnonzero(neighbour >= 0)
+            if len(occupied):
+                other = self._points[neighbour[occupied]]
+                near[occupied] = (other[:, 0] - x[occupied]) ** 2 + (other[:, 1] - y[occupied]) ** 2 < r2
+        return near
+
+    def _covered(self, cells: np.ndarray) -> np.ndarray:
+        """Whether existing points cover each cell's corners and centre, leaving no room for another"""
+        rows, cols = np.divmod(cells, self.cols)
+        covered = np.ones(len(cells), dtype=bool)
+        for f_col, f_row in _COVERAGE_PROBES:
+            x = self.origin[0] + (cols + f_col) * self.cell_size
+            y = self.origin[1] + (rows + f_row) * self.cell_size
+            covered &= self._near_points(x, y, rows, cols, _BLOCK)
+        return covered
+
+    def _try(self, cells: np.ndarray):
+        """One candidate per cell; cells of the same phase can't conflict with each other"""
+        rows, cols = np.divmod(cells, self.cols)
+        x = self.origin[0] + (cols + self._rng.random(len(cells))) * self.cell_size
+        y = self.origin[1] + (rows + self._rng.random(len(cells))) * self.cell_size
+
+        ok = ~self._near_points(x, y, rows, cols, _NEIGHBOURS)
+        edge = np.flatnonzero(ok & ~self._interior[cells])
+        ok[edge] = shapely.contains_xy(self.region, x[edge], y[edge])
+
+        self._attempts[cells[~ok]] += 1
+        accepted = np.flatnonzero(ok)
+        if len(accepted) == 0:
+            return
+        if self.count + len(accepted) > len(self._points):
+            grown = np.empty((max(2 * len(self._points), self.count + len(accepted)), 2))
+            grown[:self.count] = self._points[:self.count]
+            self._points = grown
+        new = np.arange(self.count, self.count + len(accepted))
+        self._points[new, 0] = x[accepted]
+        self._points[new, 1] = y[accepted]
+        self._grid[cells[accepted]] = new
+        self.count += len(accepted)
+
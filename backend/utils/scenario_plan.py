@@ -0,0 +1,786 @@
+import json
+import random
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import jupedsim as jps
+import numpy as np
+import pedpy
+import shapely
+from shapely.geometry import Polygon
+from shapely.geometry.base import BaseGeometry
+
+from utils.exit_assignment import ExitAssigner, create_exit_assigner
+from utils.geometry_cache import geometry_cache
+from utils.journey_variants import DISTRIBUTION_PREFIX, enumerate_journey_variants, journey_transitions
+from utils.placement_cache import PlacementRequest, placement_cache
+from utils.poisson_disk import PoissonDiskSampler
+from utils.simulation_init import add_agents_batch
+
+# Supported values of SimulationParameters.placement_engine
+PLACEMENT_ENGINES = ("jupedsim", "poisson")
+
+# Supported values of SimulationParameters.journey_routing
+JOURNEY_ROUTING_MODES = ("variants", "transitions")
+
+# Largest sum of round-robin weights used to approximate a waypoint's percentages
+MAX_ROUND_ROBIN_CYCLE = 100
+
+
+class StagePlan(NamedTuple):
+    """A waypoint or exit stage to register with each simulation"""
+    key: str
+    kind: str  # "waypoint" or "exit"
+    geometry: Any  # (center, radius) for waypoints, polygon coordinates for exits
+
+
+class JourneyVariantPlan(NamedTuple):
+    """One percentage-routing variant of a configured journey.
+
+    With ``transitions`` the variant is the whole routing graph of its journey:
+    stages with several targets split agents by weighted round robin.
+    """
+    journey: str
+    name: str
+    stages: Tuple[str, ...]  # As configured, starting at the distribution
+    actual_stages: Tuple[str, ...]  # Without distributions
+    stage_keys: Tuple[str, ...]  # Registered stages the jupedsim journey visits, in order
+    percentage: float
+    start_stage: Optional[str]  # First stage agents target
+    transitions: Tuple[Tuple[str, Tuple[Tuple[str, int], ...]], ...] = ()  # (stage, ((target, weight), ...))
+
+
+class FlowSchedule(NamedTuple):
+    start_time: float
+    end_time: float
+    frequency: float  # Seconds between spawns
+    agents_per_spawn: int
+
+
+class DistributionPlan(NamedTuple):
+    """A distribution's cleaned spawn area, parameters and journey assignment"""
+    key: str
+    index: int
+    area: BaseGeometry
+    params: Dict[str, Any]
+    number: int
+    flow: Optional[FlowSchedule]
+    variants: Tuple[int, ...]  # Indices into ScenarioPlan.variants
+    allocation: Tuple[Tuple[int, int], ...]  # (variant index, agents) for immediate spawning
+    placement_seed_offset: Optional[int]  # None: the flow source's position among placed sources
+    shuffle_seed_offset: int
+
+
+class SpawnSlots:
+    """A flow source's spawn positions, sampled as spawns need them.
+
+    Stands in for the precomputed position list in ``starting_pos_per_source``:
+    ``len`` and indexing cover the slots generated so far, and ``reserve``
+    generates more. With ``assign_exits`` the nearest exit stage of each slot
+    is kept alongside (``nearest_exits``) for sources without journeys.
+    """
+
+    def __init__(self, sampler: PoissonDiskSampler, assign_exits=None, lookahead: int = 16):
+        self.sampler = sampler
+        self.assign_exits = assign_exits
+        self.lookahead = lookahead
+        self._exit_stage_ids = np.empty(0, dtype=np.int64)
+
+    def reserve(self, n: int):
+        """Make sure ``n`` slots exist (fewer once the area is full), plus some spare ones for blocked slots"""
+        if n > self.sampler.count:
+            self.sampler.take(n + self.lookahead)
+        # The sampler works in whole batches, so it may have made more slots than asked for
+        if self.assign_exits is not None and len(self._exit_stage_ids) < self.sampler.count:
+            new = self.sampler.points[len(self._exit_stage_ids):]
+            self._exit_stage_ids = np.concatenate([self._exit_stage_ids, self.assign_exits(new)])
+
+    def grow(self) -> bool:
+        """Sample more slots, doubling the count; False once the area is full"""
+        count = self.sampler.count
+        self.reserve(2 * count + 1)
+        return self.sampler.count > count
+
+    @property
+    def nearest_exits(self) -> "_SlotExits":
+        return _SlotExits(self)
+
+    def __len__(self) -> int:
+        return self.sampler.count
+
+    def __getitem__(self, index: int) -> Tuple[float, float]:
+        x, y = self.sampler.points[index]
+        return float(x), float(y)
+
+
+class _SlotExits:
+    """Nearest exit stage per slot, indexed like SpawnSlots"""
+
+    def __init__(self, slots: SpawnSlots):
+        self.slots = slots
+
+    def __len__(self) -> int:
+        return len(self.slots._exit_stage_ids)
+
+    def __getitem__(self, index: int) -> int:
+        return self.slots._exit_stage_ids[index]
+
+
+def spawn_order(positions, start: int) -> Iterator[int]:
+    """Slot indices to try for a flow spawn: every slot from ``start`` on, wrapping around.
+
+    Lazily sampled sources generate the slot for this spawn first, and sample
+    more slots whenever all earlier ones were tried, until the area is full.
+    """
+    if isinstance(positions, SpawnSlots):
+        positions.reserve(start + 1)
+    count = len(positions)
+    for j in range(count):
+        yield (start + j) % count
+    while isinstance(positions, SpawnSlots) and positions.grow():
+        yield from range(count, len(positions))
+        count = len(positions)
+
+
+class ScenarioPlan(NamedTuple):
+    """Everything about a scenario that does not depend on the seed, compiled once per job.
+
+    Immutable and picklable: multi-seed jobs build it in the parent process and
+    hand it to every worker, which only registers stages and journeys with its
+    simulation (``instantiate``), places agents for its seed and adds them.
+    """
+    fallback: bool
+    stages: Tuple[StagePlan, ...]
+    distribution_keys: Tuple[str, ...]  # Config distributions, stage -1 in the stage map
+    variants: Tuple[JourneyVariantPlan, ...]
+    exit_keys: Tuple[str, ...]  # Exits that get a direct journey, in order
+    exit_assigner: Optional[ExitAssigner]  # Nearest exit as an index into exit_keys
+    distributions: Tuple[DistributionPlan, ...]
+    total_agents: int
+    variants_pruned: int = 0  # Routes below min_variant_percentage
+    variant_seconds: float = 0.0  # Time spent enumerating journey variants
+
+    def instantiate(
+        self,
+        simulation: jps.Simulation,
+        seed: int,
+        model_type: str = "CollisionFreeSpeedModel",
+        global_parameters=None,
+    ) -> Tuple[Dict[str, Any], List[Tuple[float, float]], Dict[int, float], Dict[str, Any]]:
+        """Register stages and journeys with a simulation and add this seed's agents"""
+        stage_map = {}
+        for stage in self.stages:
+            if stage.kind == "waypoint":
+                center, radius = stage.geometry
+                stage_map[stage.key] = simulation.add_waypoint_stage(center, radius)
+            else:
+                stage_map[stage.key] = simulation.add_exit_stage(stage.geometry)
+        for dist_key in self.distribution_keys:
+            # Distributions aren't jupedsim stages but journeys reference them
+            stage_map[dist_key] = -1
+
+        variant_data = []
+        routed_journeys = {}  # Variants with transitions share their journey's description
+        for variant in self.variants:
+            if variant.transitions:
+                routing = (variant.journey, variant.stage_keys, variant.transitions)
+                if routing not in routed_journeys:
+                    routed_journeys[routing] = simulation.add_journey(_routed_journey(variant, stage_map))
+                journey_id = routed_journeys[routing]
+            else:
+                stage_ids = [stage_map[key] for key in variant.stage_keys]
+                jd = jps.JourneyDescription(stage_ids)
+                for i in range(len(stage_ids) - 1):
+                    jd.set_transition_for_stage(stage_ids[i], jps.Transition.create_fixed_transition(stage_ids[i + 1]))
+                journey_id = simulation.add_journey(jd)
+            variant_data.append({
+                'id': journey_id,
+                'stages': list(variant.stages),
+                'actual_stages': list(variant.actual_stages),
+                'percentage': variant.percentage,
+                'variant_name': variant.name,
+            })
+
+        # A direct journey per exit for agents without a configured journey
+        journey_ids = {}
+        exit_to_journey = {}
+        for exit_key in self.exit_keys:
+            stage_id = stage_map[exit_key]
+            exit_to_journey[stage_id] = simulation.add_journey(jps.JourneyDescription([stage_id]))
+            if self.fallback:
+                journey_ids[f"journey_to_{exit_key}"] = exit_to_journey[stage_id]
+        exit_stage_ids = np.array([stage_map[key] for key in self.exit_keys], dtype=np.int64)
+
+        def assign_nearest_exits(positions) -> np.ndarray:
+            """Stage id of the nearest exit for each position (first exit when no exit geometry is known)"""
+            if self.exit_assigner is None:
+                if not exit_to_journey:
+                    raise ValueError("No exits available for agent assignment")
+                return np.full(len(positions), exit_stage_ids[0], dtype=np.int64)
+            return exit_stage_ids[self.exit_assigner.assign(positions)]
+
+        # Independent distributions are placed concurrently up front; the loops below
+        # then consume them from the cache in order, so results don't depend on it
+        placement_engine = getattr(global_parameters, 'placement_engine', 'jupedsim')
+        placement_cache.prefetch(
+            self.placement_requests(seed, placement_engine), getattr(global_parameters, 'placement_workers', 0)
+        )
+
+        np.random.seed(seed)
+        spawning_freqs_and_numbers = []
+        starting_pos_per_source = []
+        nearest_exit_per_source = []  # Nearest exit per start position, for sources without journeys
+        num_agents_per_source = []
+        flow_distributions = []
+
+        # Flow sources first: spawned during the run from slots filling their area
+        for dist in self.distributions:
+            if dist.flow is None:
+                continue
+            journey_info = [
+                {'original_journey_id': self.variants[i].journey, 'variant_data': variant_data[i]}
+                for i in dist.variants
+            ]
+            offset = len(starting_pos_per_source) if dist.placement_seed_offset is None else dist.placement_seed_offset
+            if placement_engine == "poisson":
+                # Sampled lazily, already in shuffled order
+                positions = SpawnSlots(
+                    PoissonDiskSampler(dist.area, 0.3, 0.15, seed=seed + offset),
+                    assign_exits=None if journey_info else assign_nearest_exits,
+                )
+                nearest_exits = None if journey_info else positions.nearest_exits
+            else:
+                try:
+                    positions = placement_cache.distribute_until_filled(**_flow_placement(dist, seed + offset))
+                except Exception as e:
+                    if self.fallback:
+                        raise
+                    print(f"Warning: Error processing distribution {dist.key}: {e}")
+                    continue
+
+                random.seed(seed + dist.shuffle_seed_offset)
+                random.shuffle(positions)
+                nearest_exits = None if journey_info else assign_nearest_exits(positions)
+
+            spawning_freqs_and_numbers.append([dist.flow.frequency, dist.flow.agents_per_spawn])
+            num_agents_per_source.append(dist.number)
+            starting_pos_per_source.append(positions)
+            nearest_exit_per_source.append(nearest_exits)
+
+            if self.fallback:
+                flow_distributions.append({
+                    'dist_index': dist.index,
+                    'params': dist.params,
+                    'start_time': dist.flow.start_time,
+                    'end_time': dist.flow.end_time,
+                    'area': dist.area
+                })
+            else:
+                flow_distributions.append({
+                    'dist_key': dist.key,
+                    'source_id': len(flow_distributions),
+                    'params': dist.params,
+                    'start_time': dist.flow.start_time,
+                    'end_time': dist.flow.end_time,
+                    'journey_info': journey_info
+                })
+
+        all_positions = []
+        agent_radii = {}
+        agent_count = 0
+        insertion_seconds = 0.0
+
+        for dist in self.distributions:
+            if dist.flow is not None:
+                continue
+            try:
+                positions = placement_cache.distribute_by_number(**_immediate_placement(dist, seed + dist.placement_seed_offset))
+                all_positions.extend(positions)
+                radius = dist.params.get("radius", 0.2)
+                seconds_before = insertion_seconds
+
+                if dist.variants:
+                    v_distribution = np.random.normal(dist.params.get("v0", 1.2), 0.26, len(positions)).clip(0.1, 2.0)
+                    agent_index = 0
+                    for variant_index, variant_agents in dist.allocation:
+                        start_stage = self.variants[variant_index].start_stage
+                        if start_stage is None:
+                            continue
+                        variant_end = min(agent_index + variant_agents, len(positions))
+                        agent_ids, seconds = add_agents_batch(
+                            simulation,
+                            model_type,
+                            positions[agent_index:variant_end],
+                            speeds=v_distribution[agent_index:variant_end],
+                            radii=radius,
+                            journey_ids=variant_data[variant_index]['id'],
+                            stage_ids=stage_map[start_stage],
+                            global_params=global_parameters,
+                        )
+                        agent_radii.update(dict.fromkeys(agent_ids.tolist(), radius))
+                        agent_index = variant_end
+                        agent_count += len(agent_ids)
+                        insertion_seconds += seconds
+                else:
+                    nearest_stage_ids = assign_nearest_exits(positions)
+                    agent_ids, seconds = add_agents_batch(
+                        simulation,
+                        model_type,
+                        positions,
+                        speeds=dist.params.get("v0"),
+                        radii=radius,
+                        journey_ids=[exit_to_journey[stage_id] for stage_id in nearest_stage_ids.tolist()],
+                        stage_ids=nearest_stage_ids,
+                        global_params=global_parameters,
+                    )
+                    agent_radii.update(dict.fromkeys(agent_ids.tolist(), radius))
+                    agent_count += len(agent_ids)
+                    insertion_seconds += seconds
+
+                print(f"Added agents for distribution {dist.key} in {(insertion_seconds - seconds_before) * 1000:.1f} ms")
+
+            except Exception as e:
+                error_msg = (
+                    f"CRITICAL: Failed to place agents in distribution '{dist.key}'. "
+                    f"Error: {str(e)}. This usually means the spawn area is too small or crowded. "
+                    f"Consider: 1) Making the distribution area larger, 2) Reducing the number of agents, "
+                    f"3) Increasing distance between agents, or 4) Checking for obstacles in the area."
+                )
+                print(f"ERROR: {error_msg}")
+                raise Exception(error_msg)
+
+        spawning_info = {
+            'has_flow_spawning': bool(flow_distributions),
+            'spawning_freqs_and_numbers': spawning_freqs_and_numbers,
+            'starting_pos_per_source': starting_pos_per_source,
+            'nearest_exit_per_source': nearest_exit_per_source,
+            'num_agents_per_source': num_agents_per_source,
+            'agent_counter_per_source': [0] * len(flow_distributions),
+            'flow_distributions': flow_distributions,
+            'model_type': model_type,
+            'global_parameters': global_parameters,
+            'stage_map': stage_map,
+            'exit_to_journey': exit_to_journey,
+            'agent_insertion': {'agents': agent_count, 'seconds': insertion_seconds},
+        }
+
+        print(f"Added {len(all_positions)} agents, prepared {len(flow_distributions)} flow sources")
+
+        return {
+            "stage_map": stage_map,
+            "journey_ids": journey_ids,
+        }, all_positions, agent_radii, spawning_info
+
+    def placement_requests(self, seed: int, placement_engine: str = "jupedsim") -> List[PlacementRequest]:
+        """The cached placement calls ``instantiate`` makes for a seed, flow sources first"""
+        requests = []
+        for dist in self.distributions:
+            if dist.flow is not None and placement_engine != "poisson":
+                offset = len(requests) if dist.placement_seed_offset is None else dist.placement_seed_offset
+                requests.append(PlacementRequest("until_filled", _flow_placement(dist, seed + offset)))
+        for dist in self.distributions:
+            if dist.flow is None:
+                requests.append(PlacementRequest("by_number", _immediate_placement(dist, seed + dist.placement_seed_offset)))
+        return requests
+
+
+def _routed_journey(variant: JourneyVariantPlan, stage_map: Dict[str, int]) -> jps.JourneyDescription:
+    """A journey's whole routing graph as one description with fixed and round-robin transitions"""
+    jd = jps.JourneyDescription([stage_map[key] for key in variant.stage_keys])
+    for stage_key, targets in variant.transitions:
+        if len(targets) == 1:
+            transition = jps.Transition.create_fixed_transition(stage_map[targets[0][0]])
+        else:
+            transition = jps.Transition.create_round_robin_transition(
+                [(stage_map[target], weight) for target, weight in targets]
+            )
+        jd.set_transition_for_stage(stage_map[stage_key], transition)
+    return jd
+
+
+def _round_robin_weights(percentages: List[float]) -> List[int]:
+    """Smallest integer weights within half a percentage point of each share.
+
+    Round robin sends runs of agents the same way (weights 7, 3: seven agents,
+    then three), so small weights keep the split close for few agents too.
+    """
+    total = sum(percentages)
+    for cycle in range(1, MAX_ROUND_ROBIN_CYCLE + 1):
+        weights = [round(percentage * cycle / total) for percentage in percentages]
+        if sum(weights) > 0 and all(weight > 0 for weight in weights) and all(
+            abs(weight / sum(weights) - percentage / total) <= 0.005
+            for weight, percentage in zip(weights, percentages)
+        ):
+            return weights
+    return [max(round(percentage * MAX_ROUND_ROBIN_CYCLE / total), 1) for percentage in percentages]
+
+
+def _flow_placement(dist: DistributionPlan, seed: int) -> Dict[str, Any]:
+    """Fill a flow source's area; agents are spawned from these positions during the run"""
+    return dict(polygon=dist.area, distance_to_agents=0.3, distance_to_polygon=0.15, seed=seed)
+
+
+def _immediate_placement(dist: DistributionPlan, seed: int) -> Dict[str, Any]:
+    """Place a distribution's agents before the first step"""
+    return dict(polygon=dist.area, number_of_agents=dist.number, distance_to_agents=0.4, distance_to_polygon=0.2, seed=seed)
+
+
+def compile_scenario_plan(
+    data: Dict[str, Any],
+    walkable_area: pedpy.WalkableArea,
+    global_parameters=None,
+) -> ScenarioPlan:
+    """Compile a processed configuration and its walkable area into a ScenarioPlan.
+
+    Configurations without distributions or without journeys/transitions use
+    the fallback layout: one direct journey per exit, nearest-exit assignment.
+    """
+    started = time.perf_counter()
+
+    # Only require exits - everything else can be fallback
+    if "exits" not in data or not data["exits"]:
+        raise ValueError("At least one exit is required in JSON configuration")
+
+    fallback_reasons = []
+    if "distributions" not in data or not data["distributions"]:
+        fallback_reasons.append("No distributions defined")
+    if ("journeys" not in data or not data["journeys"]) and ("transitions" not in data or not data["transitions"]):
+        fallback_reasons.append("No journeys or transitions defined")
+
+    if fallback_reasons:
+        print(f"Using fallback logic: {', '.join(fallback_reasons)}")
+        plan = _compile_fallback(data, walkable_area, global_parameters)
+    else:
+        plan = _compile_complete(data, walkable_area, global_parameters)
+
+    print(f"Compiled scenario plan: {len(plan.distributions)} distributions, {len(plan.variants)} journey variants, "
+          f"{plan.total_agents} agents in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return plan
+
+
+def _exit_assigner(exit_geometries, walkable_area: pedpy.WalkableArea, global_parameters=None):
+    """Nearest-exit assigner as configured: straight line (default) or walking distance"""
+    return create_exit_assigner(
+        exit_geometries,
+        walkable_area.polygon,
+        mode=getattr(global_parameters, 'exit_assignment', 'euclidean'),
+        cell_size=getattr(global_parameters, 'distance_field_cell_size', 0.25),
+    )
+
+
+def _flow_schedule(params: Dict[str, Any], n_agents: int) -> FlowSchedule:
+    """Spawn one agent at a time, evenly over the flow window"""
+    flow_start_time = max(0, params.get("flow_start_time", 0))
+    flow_end_time = max(flow_start_time + 0.1, params.get("flow_end_time", 10))
+    flow_duration = flow_end_time - flow_start_time
+    return FlowSchedule(flow_start_time, flow_end_time, flow_duration / n_agents, 1)
+
+
+def _compile_complete(data: Dict[str, Any], walkable_area: pedpy.WalkableArea, global_parameters=None) -> ScenarioPlan:
+    """Plan for configurations with distributions and journeys"""
+    stages = [
+        StagePlan(wp_id, "waypoint", (wp_data["center"], wp_data["radius"]))
+        for wp_id, wp_data in data.get("waypoints", {}).items()
+    ]
+    stages += [
+        StagePlan(exit_id, "exit", exit_data["coordinates"])
+        for exit_id, exit_data in data.get("exits", {}).items()
+    ]
+    distribution_keys = tuple(data.get("distributions", {}))
+    known_stages = {stage.key for stage in stages} | set(distribution_keys)
+    stage_keys = {stage.key for stage in stages}
+
+    # Journey variants from percentage routing, and which distributions follow them
+    waypoint_routing = data.get("waypoint_routing", {})
+    min_percentage = getattr(global_parameters, 'min_variant_percentage', 0.0)
+    journey_routing = getattr(global_parameters, 'journey_routing', 'variants')
+    variants = []
+    variants_per_distribution = defaultdict(list)
+    variants_pruned = 0
+    variant_seconds = 0.0
+    for journey in data.get("journeys", []):
+        jid = journey["id"]
+        distributions_in_journey = [stage for stage in journey["stages"] if stage.startswith(DISTRIBUTION_PREFIX)]
+        routing = journey_transitions(jid, journey["stages"], waypoint_routing) if journey_routing == "transitions" else None
+        if routing is not None:
+            variant_seconds += routing.seconds
+            routed = _routed_variants(jid, distributions_in_journey[0], routing, stage_keys)
+            print(f"Routed journey {jid} through {len(routing.transitions)} waypoint splits "
+                  f"({routing.routes} routes) in {routing.seconds * 1000:.1f} ms")
+            for variant in routed:
+                variants.append(variant)
+                for dist_key in distributions_in_journey:
+                    variants_per_distribution[dist_key].append(len(variants) - 1)
+            continue
+
+        journey_variants = enumerate_journey_variants(jid, journey["stages"], waypoint_routing, min_percentage)
+        variants_pruned += journey_variants.pruned
+        variant_seconds += journey_variants.seconds
+        print(f"Generated {len(journey_variants.variants)} of {journey_variants.total} variants for journey {jid} "
+              f"({journey_variants.pruned} below {min_percentage}%) in {journey_variants.seconds * 1000:.1f} ms")
+
+        for variant_idx, (variant_stages, percentage) in enumerate(journey_variants.variants):
+            # JuPedSim journeys only contain waypoints and exits
+            actual_stages = [stage for stage in variant_stages if not stage.startswith(DISTRIBUTION_PREFIX)]
+            registered = [key for key in actual_stages if key in known_stages]
+            if not registered:
+                continue
+            start_stage = next((stage for stage in variant_stages[1:] if stage in stage_keys), None)
+            variants.append(JourneyVariantPlan(
+                journey=jid,
+                name=f"{jid}_variant_{variant_idx}",
+                stages=tuple(variant_stages),
+                actual_stages=tuple(actual_stages),
+                stage_keys=tuple(registered),
+                percentage=percentage,
+                start_stage=start_stage,
+            ))
+            for dist_key in distributions_in_journey:
+                variants_per_distribution[dist_key].append(len(variants) - 1)
+
+    exit_keys = tuple(data.get("exits", {}))
+    exit_geometries = {
+        i: Polygon(data["exits"][exit_key]["coordinates"])
+        for i, exit_key in enumerate(exit_keys) if "coordinates" in data["exits"][exit_key]
+    }
+    exit_assigner = _exit_assigner(exit_geometries, walkable_area, global_parameters) if exit_geometries else None
+
+    distributions = []
+    for index, (dist_key, dist_data) in enumerate(data.get("distributions", {}).items()):
+        params = _distribution_parameters(dist_data)
+        print(f"DEBUG: Distribution {dist_key} processed params: {params}")
+        n_agents = int(params.get("number", 0))
+        if n_agents <= 0:
+            continue
+
+        try:
+            dist_area = shapely.intersection(Polygon(dist_data["coordinates"]), walkable_area.polygon)
+            if dist_area.is_empty:
+                print(f"Warning: Distribution {dist_key} is outside walkable area")
+                continue
+
+            variant_indices = tuple(variants_per_distribution.get(f"{DISTRIBUTION_PREFIX}{index}", []))
+            flow = _flow_schedule(params, n_agents) if params.get("use_flow_spawning", False) else None
+            allocation = ()
+            if flow is not None:
+                print(f"Flow spawning: {dist_key} - {n_agents} agents over {flow.end_time - flow.start_time}s "
+                      f"(freq: {flow.frequency:.2f}s, rate: {1 / flow.frequency:.2f} agents/s)")
+            elif variant_indices:
+                allocation = _allocate_agents(n_agents, variants, variant_indices)
+
+            distributions.append(DistributionPlan(
+                key=dist_key,
+                index=index,
+                area=dist_area,
+                params=params,
+                number=n_agents,
+                flow=flow,
+                variants=variant_indices,
+                allocation=allocation,
+                placement_seed_offset=None if flow is not None else 0,
+                shuffle_seed_offset=zlib.crc32(dist_key.encode()),
+            ))
+        except Exception as e:
+            print(f"Warning: Error processing distribution {dist_key}: {e}")
+            continue
+
+    return ScenarioPlan(
+        fallback=False,
+        stages=tuple(stages),
+        distribution_keys=distribution_keys,
+        variants=tuple(variants),
+        exit_keys=exit_keys,
+        exit_assigner=exit_assigner,
+        distributions=tuple(distributions),
+        total_agents=sum(dist.number for dist in distributions),
+        variants_pruned=variants_pruned,
+        variant_seconds=variant_seconds,
+    )
+
+
+def _routed_variants(jid: str, distribution: str, routing, stage_keys) -> List[JourneyVariantPlan]:
+    """One variant per initial waypoint, all sharing the journey's routing graph"""
+    transitions = []
+    for waypoint, destinations in routing.transitions:
+        # Targets that aren't stages (distributions, unknown ids) are dropped, as in variant journeys
+        destinations = [(target, percentage) for target, percentage in destinations if target in stage_keys]
+        if waypoint not in stage_keys or not destinations:
+            continue
+        weights = _round_robin_weights([percentage for _, percentage in destinations])
+        transitions.append((waypoint, tuple((target, weight) for (target, _), weight in zip(destinations, weights))))
+    registered = tuple(stage for stage in routing.stages if stage in stage_keys)
+
+    return [
+        JourneyVariantPlan(
+            journey=jid,
+            name=f"{jid}_routed_{index}",
+            stages=(distribution, waypoint) + tuple(stage for stage in routing.stages if stage != waypoint),
+            actual_stages=registered,
+            stage_keys=registered,
+            percentage=100.0,
+            start_stage=waypoint,
+            transitions=tuple(transitions),
+        )
+        for index, waypoint in enumerate(routing.initial_waypoints)
+        if waypoint in stage_keys
+    ]
+
+
+def _compile_fallback(data: Dict[str, Any], walkable_area: pedpy.WalkableArea, global_parameters=None) -> ScenarioPlan:
+    """Plan with one direct journey per exit and nearest-exit assignment"""
+    # Defaults from the first distribution with valid parameters
+    default_agent_radius = 0.2
+    default_v0 = 1.2
+    default_n_agents = 100
+    for dist_id, dist_data in data.get("distributions", {}).items():
+        if "parameters" in dist_data:
+            params = dist_data["parameters"]
+            if isinstance(params, str):
+                try:
+                    params = json.loads(params)
+                except:
+                    continue
+            if isinstance(params, dict):
+                default_agent_radius = params.get("radius", default_agent_radius)
+                default_v0 = params.get("v0", default_v0)
+                default_n_agents = params.get("number", default_n_agents)
+                break
+
+    # Override defaults with global parameters if provided
+    if global_parameters:
+        default_v0 = getattr(global_parameters, 'v0', default_v0)
+        default_agent_radius = getattr(global_parameters, 'radius', default_agent_radius)
+        default_n_agents = getattr(global_parameters, 'number', default_n_agents)
+
+    print(f"Using default parameters: v0={default_v0}, radius={default_agent_radius}, n_agents={default_n_agents}")
+
+    stages = []
+    exit_geometries = {}
+    for exit_id, exit_data in data.get("exits", {}).items():
+        coords = exit_data.get("coordinates")
+        if isinstance(coords, list) and len(coords) >= 3:
+            exit_polygon = Polygon(coords)
+            exit_geometries[len(stages)] = exit_polygon
+            stages.append(StagePlan(exit_id, "exit", exit_polygon))
+
+    if not exit_geometries:
+        raise ValueError("No valid exits found in configuration")
+
+    # Use the walkable area when no valid distribution is given
+    areas = []
+    for dist_id, dist_data in data.get("distributions", {}).items():
+        coords = dist_data.get("coordinates")
+        if not (isinstance(coords, list) and len(coords) >= 3):
+            continue
+        params = dist_data.get("parameters", {})
+        if isinstance(params, str):
+            try:
+                params = json.loads(params)
+            except:
+                params = {}
+        areas.append((dist_id, Polygon(coords), {
+            'number': params.get('number', default_n_agents),
+            'radius': params.get('radius', default_agent_radius),
+            'v0': params.get('v0', default_v0),
+            'use_flow_spawning': params.get('use_flow_spawning', False),
+            'flow_start_time': params.get('flow_start_time', 0),
+            'flow_end_time': params.get('flow_end_time', 10)
+        }))
+        print(f"Distribution {dist_id}: {areas[-1][2]}")
+
+    if not areas:
+        print("No valid distributions found; using walkable area as fallback")
+        areas = [("walkable_area", walkable_area.polygon, {
+            'number': default_n_agents,
+            'radius': default_agent_radius,
+            'v0': default_v0,
+            'use_flow_spawning': False,
+            'flow_start_time': 0,
+            'flow_end_time': 10
+        })]
+
+    # Remove obstacles (holes in the walkable area) and clip to it
+    obstacles_union = geometry_cache.for_walkable_area(walkable_area).holes_union
+    distributions = []
+    for i, (dist_id, dist_area, params) in enumerate(areas):
+        n_agents = int(params['number'])
+        if n_agents <= 0:
+            continue
+        if obstacles_union and not obstacles_union.is_empty:
+            dist_area = dist_area.difference(obstacles_union)
+        dist_area = shapely.intersection(dist_area, walkable_area.polygon)
+        if dist_area.is_empty:
+            print(f"Warning: Distribution area {i} is outside walkable area")
+            continue
+
+        flow = _flow_schedule(params, n_agents) if params.get('use_flow_spawning', False) else None
+        if flow is not None:
+            print(f"Flow spawning: Distribution {i} - {n_agents} agents over {flow.end_time - flow.start_time}s")
+        distributions.append(DistributionPlan(
+            key=dist_id,
+            index=i,
+            area=dist_area,
+            params=params,
+            number=n_agents,
+            flow=flow,
+            variants=(),
+            allocation=(),
+            placement_seed_offset=i,
+            shuffle_seed_offset=i,
+        ))
+
+    return ScenarioPlan(
+        fallback=True,
+        stages=tuple(stages),
+        distribution_keys=(),
+        variants=(),
+        exit_keys=tuple(stage.key for stage in stages),
+        exit_assigner=_exit_assigner(exit_geometries, walkable_area, global_parameters),
+        distributions=tuple(distributions),
+        total_agents=sum(dist.number for dist in distributions),
+    )
+
+
+def _distribution_parameters(dist_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Distribution parameters with defaults; string parameters are parsed as JSON"""
+    params = dist_data.get("parameters", {})
+    if isinstance(params, str):
+        try:
+            params = json.loads(params)
+        except json.JSONDecodeError:
+            params = {'number': 10, 'radius': 0.2, 'v0': 1.2}
+    elif not isinstance(params, dict):
+        params = {'number': 10, 'radius': 0.2, 'v0': 1.2}
+
+    return {
+        'number': params.get('number', 10),
+        'radius': params.get('radius', 0.2),
+        'v0': params.get('v0', 1.2),
+        'use_flow_spawning': params.get('use_flow_spawning', False),
+        'flow_start_time': params.get('flow_start_time', 0),
+        'flow_end_time': params.get('flow_end_time', 10)
+    }
+
+
+def _allocate_agents(n_agents: int, variants: List[JourneyVariantPlan], variant_indices: Tuple[int, ...]) -> Tuple[Tuple[int, int], ...]:
+    """Split a distribution's agents over its journey variants in proportion to their percentages"""
+    total_weight = sum(variants[i].percentage for i in variant_indices)
+    allocation = []
+    remaining_agents = n_agents
+    for position, variant_index in enumerate(variant_indices):
+        variant = variants[variant_index]
+        if position == len(variant_indices) - 1:
+            # Last variant gets all remaining agents to ensure exact total
+            variant_agents = remaining_agents
+        else:
+            variant_agents = min(round((n_agents * variant.percentage) / total_weight), remaining_agents)
+
+        if variant_agents > 0:
+            allocation.append((variant_index, variant_agents))
+            remaining_agents -= variant_agents
+
+        print(f"Variant {variant.name}: {variant_agents} agents ({variant.percentage}% of {total_weight}%)")
+    return tuple(allocation)
+
@@ -0,0 +1,63 @@
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import jupedsim as jps
+import numpy as np
+
+
+class StagnationDetector:
+    """Notices a run whose remaining agents have stopped getting anywhere, e.g. deadlocked at a bottleneck.
+
+    ``observe`` samples agent positions every ``interval`` seconds of
+    simulated time. The run is stagnant once no agent has exited for
+    ``window`` seconds and the agents present over that whole window moved
+    less than ``min_displacement`` meters on average (net, so agents
+    shuffling back and forth in a jam count as stuck).
+    """
+
+    def __init__(self, window: float, min_displacement: float = 0.1, interval: float = 1.0):
+        self.window = window
+        self.min_displacement = min_displacement
+        self.interval = min(interval, window)
+        self._samples: Deque[Tuple[float, np.ndarray, np.ndarray]] = deque()  # (time, sorted ids, positions)
+        self._next_sample = 0.0
+        self.detected_at: Optional[float] = None
+        self.mean_displacement: Optional[float] = None
+        self.stuck_agents = 0
+
+    def observe(self, simulation: jps.Simulation) -> bool:
+        """Sample the simulation if due; True once it is stagnant"""
+        now = simulation.elapsed_time()
+        if now < self._next_sample:
+            return False
+        self._next_sample = now + self.interval
+
+        agents = list(simulation.agents())
+        ids = np.fromiter((agent.id for agent in agents), dtype=np.int64, count=len(agents))
+        positions = np.array([agent.position for agent in agents], dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(ids)
+        ids, positions = ids[order], positions[order]
+
+        # Agents only disappear at exits: any exit is progress and restarts the window
+        if self._samples and len(np.setdiff1d(self._samples[-1][1], ids, assume_unique=True)):
+            self._samples.clear()
+        self._samples.append((now, ids, positions))
+
+        # Keep the newest sample at least a window old as the reference
+        while len(self._samples) > 1 and self._samples[1][0] <= now - self.window:
+            self._samples.popleft()
+        start, start_ids, start_positions = self._samples[0]
+        if now - start < self.window:
+            return False
+
+        _, then, current = np.intersect1d(start_ids, ids, assume_unique=True, return_indices=True)
+        if len(then) == 0:
+            return False
+        displacement = np.linalg.norm(positions[current] - start_positions[then], axis=1).mean()
+        if displacement >= self.min_displacement:
+            return False
+
+        self.detected_at = now
+        self.mean_displacement = float(displacement)
+        self.stuck_agents = len(then)
+        return True
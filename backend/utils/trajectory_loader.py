@@ -0,0 +1,201 @@
+import sqlite3
+from typing import Dict, Generator, Optional, Tuple
+
+import numpy as np
+
+TRAJECTORY_COLUMNS = ("frame", "id", "x", "y", "ori_x", "ori_y")
+
+# One record per trajectory_data row, in the column order of TRAJECTORY_COLUMNS
+TRAJECTORY_ROW_DTYPE = np.dtype([
+    ("frame", np.int64),
+    ("id", np.int64),
+    ("x", np.float64),
+    ("y", np.float64),
+    ("ori_x", np.float64),
+    ("ori_y", np.float64),
+])
+
+# frame -> contiguous rowid range in trajectory_data, written once at finalization
+FRAME_INDEX_TABLE = "frame_index"
+
+
+def has_frame_index(conn: sqlite3.Connection) -> bool:
+    """Check whether a trajectory file carries a precomputed frame index"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FRAME_INDEX_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def build_frame_index(sqlite_file: str) -> int:
+    """Precompute the frame -> rowid range table for a finished trajectory file.
+
+    The trajectory writer appends rows frame by frame, so each frame occupies a
+    contiguous rowid range and seeking to it is a primary-key lookup plus a
+    rowid range scan. Frames whose rows are not contiguous are stored without a
+    range and read through the (frame, id) index instead.
+    """
+    conn = sqlite3.connect(sqlite_file)
+    try:
+        conn.execute("CREATE INDEX IF NOT EXISTS frame_id_idx ON trajectory_data(frame, id)")
+        conn.execute(f"DROP TABLE IF EXISTS {FRAME_INDEX_TABLE}")
+        conn.execute(f"""
+            CREATE TABLE {FRAME_INDEX_TABLE} (
+                frame INTEGER PRIMARY KEY,
+                first_rowid INTEGER,
+                last_rowid INTEGER,
+                row_count INTEGER NOT NULL
+            )
+        """)
+        conn.execute(f"""
+            INSERT INTO {FRAME_INDEX_TABLE} (frame, first_rowid, last_rowid, row_count)
+            SELECT
+                frame,
+                CASE WHEN MAX(rowid) - MIN(rowid) + 1 = COUNT(*) THEN MIN(rowid) END,
+                CASE WHEN MAX(rowid) - MIN(rowid) + 1 = COUNT(*) THEN MAX(rowid) END,
+                COUNT(*)
+            FROM trajectory_data
+            GROUP BY frame
+        """)
+        conn.commit()
+        return conn.execute(f"SELECT COUNT(*) FROM {FRAME_INDEX_TABLE}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TrajectoryArrayLoader:
+    """Bulk loader returning trajectory data as columnar numpy arrays.
+
+    Rows are read frame-aligned in chunks of at most ``chunk_rows`` rows, so
+    peak memory is bounded by the chunk size rather than the run length.
+    ``run_id`` selects one run of a consolidated ensemble store.
+    """
+
+    def __init__(self, sqlite_file: str, chunk_rows: int = 250_000, run_id: Optional[int] = None):
+        self.sqlite_file = sqlite_file
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.run_id = run_id
+        self.conn = None
+        self._frame_index = None
+        self._indexed = None
+
+    def __enter__(self):
+        # Streaming responses may resume the loader on a different executor thread
+        self.conn = sqlite3.connect(self.sqlite_file, check_same_thread=False)
+        self._indexed = has_frame_index(self.conn)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.conn:
+            self.conn.close()
+
+    def _run_filter(self) -> Tuple[str, tuple]:
+        """SQL condition and parameters restricting a query to the selected run"""
+        if self.run_id is None:
+            return "", ()
+        return "AND run_id = ?", (self.run_id,)
+
+    def get_max_agent_id(self) -> int:
+        """Get the largest agent id, for sizing per-agent arrays"""
+        run_filter, params = self._run_filter()
+        row = self.conn.execute(
+            f"SELECT MAX(id) FROM trajectory_data WHERE 1 = 1 {run_filter}", params
+        ).fetchone()
+        return row[0] or 0
+
+    def get_frame_index(self) -> Dict[str, np.ndarray]:
+        """Get frame numbers with their row counts and cumulative row offsets"""
+        if self._frame_index is None:
+            run_filter, params = self._run_filter()
+            if self._indexed:
+                cursor = self.conn.execute(
+                    f"SELECT frame, row_count FROM {FRAME_INDEX_TABLE} WHERE 1 = 1 {run_filter} ORDER BY frame",
+                    params
+                )
+            else:
+                cursor = self.conn.execute(
+                    f"SELECT frame, COUNT(*) FROM trajectory_data WHERE 1 = 1 {run_filter} GROUP BY frame ORDER BY frame",
+                    params
+                )
+            counts = np.fromiter(cursor, dtype=[("frame", np.int64), ("count", np.int64)])
+            offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts["count"], out=offsets[1:])
+            self._frame_index = {
+                "frame": np.ascontiguousarray(counts["frame"]),
+                "count": np.ascontiguousarray(counts["count"]),
+                "offset": offsets,
+            }
+        return self._frame_index
+
+    def read_frame(self, frame: int) -> Dict[str, np.ndarray]:
+        """Read a single frame, using the precomputed rowid range when available"""
+        run_filter, params = self._run_filter()
+        row = None
+        if self._indexed:
+            row = self.conn.execute(
+                f"SELECT first_rowid, last_rowid, row_count FROM {FRAME_INDEX_TABLE} WHERE frame = ? {run_filter}",
+                (frame, *params)
+            ).fetchone()
+            if row is None:
+                return {name: np.empty(0, dtype=TRAJECTORY_ROW_DTYPE[name]) for name in TRAJECTORY_COLUMNS}
+
+        if row is not None and row[0] is not None:
+            cursor = self.conn.execute("""
+                SELECT frame, id, pos_x, pos_y, ori_x, ori_y
+                FROM trajectory_data
+                WHERE rowid BETWEEN ? AND ?
+                ORDER BY id
+            """, (row[0], row[1]))
+            rows = np.fromiter(cursor, dtype=TRAJECTORY_ROW_DTYPE, count=row[2])
+        else:
+            cursor = self.conn.execute(f"""
+                SELECT frame, id, pos_x, pos_y, ori_x, ori_y
+                FROM trajectory_data
+                WHERE frame = ? {run_filter}
+                ORDER BY id
+            """, (frame, *params))
+            rows = np.fromiter(cursor, dtype=TRAJECTORY_ROW_DTYPE)
+
+        return {name: np.ascontiguousarray(rows[name]) for name in TRAJECTORY_COLUMNS}
+
+    def iter_chunks(
+        self, start_frame: int = 0, end_frame: Optional[int] = None
+    ) -> Generator[Dict[str, np.ndarray], None, None]:
+        """Yield whole-frame chunks of columnar arrays for frames in [start_frame, end_frame)"""
+        index = self.get_frame_index()
+        frames, offsets = index["frame"], index["offset"]
+        run_filter, params = self._run_filter()
+
+        first = int(np.searchsorted(frames, start_frame, side="left"))
+        last = len(frames) if end_frame is None else int(np.searchsorted(frames, end_frame, side="left"))
+
+        cursor = self.conn.cursor()
+        i = first
+        while i < last:
+            # Largest run of whole frames that fits the row budget (at least one frame)
+            j = int(np.searchsorted(offsets, offsets[i] + self.chunk_rows, side="right")) - 1
+            j = min(max(j, i + 1), last)
+            n_rows = int(offsets[j] - offsets[i])
+
+            cursor.execute(f"""
+                SELECT frame, id, pos_x, pos_y, ori_x, ori_y
+                FROM trajectory_data
+                WHERE frame >= ? AND frame <= ? {run_filter}
+                ORDER BY frame, id
+            """, (int(frames[i]), int(frames[j - 1]), *params))
+            rows = np.fromiter(cursor, dtype=TRAJECTORY_ROW_DTYPE, count=n_rows)
+
+            yield {name: np.ascontiguousarray(rows[name]) for name in TRAJECTORY_COLUMNS}
+            i = j
+
+
+def iter_trajectory_chunks(
+    sqlite_file: str,
+    chunk_rows: int = 250_000,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    run_id: Optional[int] = None,
+) -> Generator[Dict[str, np.ndarray], None, None]:
+    """Convenience wrapper streaming columnar chunks straight from a SQLite file"""
+    with TrajectoryArrayLoader(sqlite_file, chunk_rows, run_id) as loader:
+        yield from loader.iter_chunks(start_frame, end_frame)
@@ -1,12 +1,28 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
+import pedpy
 from fastapi import HTTPException
+from shapely.geometry import Point, Polygon
+from shapely.geometry.base import BaseGeometry
 
+from utils.geometry_cache import PreparedGeometry, geometry_cache
+from utils.journey_variants import DISTRIBUTION_PREFIX
 
-def validate_and_process_config(config: Dict[str, Any]) -> Dict[str, Any]:
-    """Validate and process the simulation config to ensure exits are present"""
-    import copy
-    processed_config = copy.deepcopy(config)
+# Radius of agents whose distribution doesn't set one
+DEFAULT_AGENT_RADIUS = 0.2
+
+# Components are eroded by exactly the clearance, so a stage drawn on a wall only
+# touches them within rounding; reach that much further (m)
+STAGE_TOLERANCE = 0.01
+
+
+def validate_and_process_config(config: Dict[str, Any], walkable_area: Optional[pedpy.WalkableArea] = None) -> Dict[str, Any]:
+    """Validate and process the simulation config to ensure exits are present.
+
+    With a walkable area, journeys whose stages can't be reached are rejected too.
+    """
+    # Only top-level sections are added below, so a shallow copy leaves the input untouched
+    processed_config = dict(config)
         
     # ONLY require exits now
     if "exits" not in processed_config or not processed_config["exits"]:
@@ -41,8 +57,102 @@ def validate_and_process_config(config: Dict[str, Any]) -> Dict[str, Any]:
         processed_config["journeys"] = []
     if "transitions" not in processed_config:
         processed_config["transitions"] = []
+
+    if walkable_area is not None:
+        prepared = geometry_cache.for_walkable_area(walkable_area)
+        problems = find_unreachable_stages(processed_config, prepared)
+        if problems:
+            raise ValueError(
+                f"Unreachable stages ({'; '.join(problem for _, problem in problems)}); "
+                f"check for walls or gaps narrower than {2 * reachability_clearance(processed_config):.2f} m"
+            )
     
     return processed_config
+
+
+def _stage_area(config: Dict[str, Any], stage_id: str) -> Optional[BaseGeometry]:
+    """Geometry of an exit or waypoint of the config, None for other stages"""
+    if stage_id in config["exits"]:
+        return Polygon(config["exits"][stage_id]["coordinates"])
+    waypoint = config["waypoints"].get(stage_id)
+    if waypoint is not None:
+        return Point(waypoint["center"]).buffer(waypoint["radius"])
+    return None
+
+
+def reachability_clearance(config: Dict[str, Any]) -> float:
+    """Clearance from walls used to split the walkable area: half the smallest agent radius"""
+    radii = [
+        dist["parameters"].get("radius", DEFAULT_AGENT_RADIUS)
+        for dist in (config.get("distributions") or {}).values()
+        if isinstance(dist.get("parameters"), dict)
+    ]
+    return min(radii, default=DEFAULT_AGENT_RADIUS) / 2
+
+
+def find_unreachable_stages(config: Dict[str, Any], prepared: PreparedGeometry) -> List[Tuple[str, str]]:
+    """Exits and waypoints agents can never get to, as (stage or distribution id, problem) pairs.
+
+    The walkable polygon is split into connected components once per
+    geometry, at gaps narrower than half the smallest agent. A stage
+    inside an obstacle, beyond the walls or in another component than a
+    distribution sending agents to it would keep the run going until
+    max_simulation_time.
+    """
+    distributions = config.get("distributions") or {}
+    clearance = reachability_clearance(config)
+    components = prepared.components(clearance)
+
+    def reachable_from(stage_area: BaseGeometry) -> List[int]:
+        touched = stage_area.buffer(clearance + STAGE_TOLERANCE)
+        return [i for i, part in enumerate(components) if part.intersects(touched)]
+
+    stage_components = {}
+    problems = []
+    for stage_id in list(config["exits"]) + list(config["waypoints"]):
+        stage_components[stage_id] = reachable_from(_stage_area(config, stage_id))
+        if not stage_components[stage_id]:
+            problems.append((stage_id, f"{stage_id} lies inside an obstacle or outside the walkable area"))
+
+    def distribution_components(dist_id: str) -> List[int]:
+        coords = distributions.get(dist_id, {}).get("coordinates")
+        if not (isinstance(coords, list) and len(coords) >= 3):
+            return []
+        return reachable_from(Polygon(coords).intersection(prepared.polygon))
+
+    # Journey stages, including every target percentage routing can send the journey's agents to
+    waypoint_routing = config.get("waypoint_routing", {})
+    in_journeys = set()
+    for journey in config["journeys"]:
+        targets = [stage for stage in journey["stages"] if stage in stage_components]
+        for waypoint, journey_routing in waypoint_routing.items():
+            routing = journey_routing.get(journey["id"])
+            if routing:
+                targets += [waypoint] + [destination["target"] for destination in routing.get("destinations", [])]
+        targets = [stage for stage in dict.fromkeys(targets) if stage_components.get(stage)]
+
+        for dist_id in journey["stages"]:
+            if not dist_id.startswith(DISTRIBUTION_PREFIX):
+                continue
+            in_journeys.add(dist_id)
+            for component in distribution_components(dist_id):
+                cut_off = [stage for stage in targets if component not in stage_components[stage]]
+                if cut_off:
+                    problems.append((dist_id, f"journey {journey['id']} can't reach {', '.join(cut_off)} from {dist_id}"))
+                    break
+
+    # Agents without a journey walk to the nearest exit; any reachable exit will do
+    for dist_id in distributions:
+        if dist_id in in_journeys:
+            continue
+        for component in distribution_components(dist_id):
+            if not any(component in stage_components[exit_id] for exit_id in config["exits"]):
+                problems.append((dist_id, f"no exit can be reached from {dist_id}"))
+                break
+
+    return problems
+
+
 def calculate_total_agents(config: Dict[str, Any]) -> int:
     """Calculate total number of agents from all distributions"""
     total_agents = 0
@@ -55,6 +165,23 @@ def calculate_total_agents(config: Dict[str, Any]) -> int:
     
     return total_agents
 
+
+class Scenario:
+    """A simulation config validated once and shared read-only by every run of a job.
+
+    Passed in memory from the route to initialization; it is only serialized
+    (pickled) when handed to worker processes.
+    """
+
+    def __init__(self, config: Dict[str, Any], walkable_area: Optional[pedpy.WalkableArea] = None):
+        self.config = validate_and_process_config(config, walkable_area)
+        self.total_agents = calculate_total_agents(self.config)
+
+    @property
+    def exits(self) -> Dict[str, Any]:
+        return self.config["exits"]
+
+
 def _validate_waypoint_routing(waypoint_routing: Dict, simulation_config: Dict):
     """Validate waypoint routing percentages and references"""
     
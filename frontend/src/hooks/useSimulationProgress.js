@@ -1,5 +1,44 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 
+// Geometries are content-addressed, so one copy per hash is enough for every run
+const geometryCache = new Map();
+
+const fetchGeometry = async (fetchURL, geometryHash) => {
+  if (!geometryHash) return '';
+  if (!geometryCache.has(geometryHash)) {
+    const response = await fetch(`${fetchURL}/geometry/${geometryHash}`);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const data = await response.json();
+    geometryCache.set(geometryHash, data.geometry_wkt);
+  }
+  return geometryCache.get(geometryHash);
+};
+
+// Reads the little-endian id/radius column blocks page by page into an id -> radius map
+const fetchAgentRadii = async (fetchURL, simulationId) => {
+  const radii = {};
+  let offset = 0;
+  while (offset !== null) {
+    const response = await fetch(
+      `${fetchURL}/simulation_agent_attributes/${simulationId}?format=binary&offset=${offset}&limit=100000`
+    );
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const count = parseInt(response.headers.get('X-Agent-Count') || '0', 10);
+    const buffer = await response.arrayBuffer();
+    const view = new DataView(buffer);
+    for (let i = 0; i < count; i++) {
+      radii[view.getInt32(i * 4, true)] = view.getFloat32(count * 4 + i * 4, true);
+    }
+    const nextOffset = response.headers.get('X-Next-Offset');
+    offset = nextOffset ? parseInt(nextOffset, 10) : null;
+  }
+  return radii;
+};
+
 export const useSimulationProgress = () => {
   const [progress, setProgress] = useState({
     stage: null,
@@ -32,7 +71,12 @@ export const useSimulationProgress = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const results = await response.json();
+      const summary = await response.json();
+      const [geometryWkt, agentRadii] = await Promise.all([
+        fetchGeometry(fetchURL, summary.geometry_hash),
+        summary.agent_attribute_count > 0 ? fetchAgentRadii(fetchURL, simulationId) : {}
+      ]);
+      const results = { ...summary, geometry_wkt: geometryWkt, agent_radii: agentRadii };
 
       setProgress(prev => ({
         ...prev,
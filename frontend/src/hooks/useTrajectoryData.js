@@ -84,30 +84,68 @@ export const useTrajectoryData = (simulationId) => {
   const loadAllTrajectory = useCallback(async (chunkSize = 100) => {
   if (!simulationId) return;
 
-  
+  const fetchURL = process.env.REACT_APP_BACKEND_API || 'http://localhost:8000';
   let startFrame = 50; // Start from frame 50 since we already loaded 0-49
-  let hasMore = true;
-  
-  while (hasMore) {
+  let retries = 0;
+  let batch = [];
+
+  // Append received frames to state in batches of chunkSize
+  const flush = () => {
+    if (batch.length === 0) return;
+    const frames = batch;
+    batch = [];
+    setTrajectoryData(prev => ({
+      ...prev,
+      frames: [...prev.frames, ...frames],
+      loadedFrames: prev.loadedFrames + frames.length
+    }));
+  };
+
+  // One NDJSON stream for the rest of the run; on a dropped connection resume after the last full frame
+  while (retries <= 3) {
     try {
-      
-      const chunk = await loadTrajectoryChunk(simulationId, startFrame, chunkSize);
-      
-      if (!chunk) break;
-      
-      hasMore = chunk.has_more;
-      startFrame = chunk.next_start_frame || (startFrame + chunkSize);
-      
-      // Small delay
-      await new Promise(resolve => setTimeout(resolve, 50));
-      
+      const response = await fetch(
+        `${fetchURL}/simulation_trajectory_stream/${simulationId}?start_frame=${startFrame}`
+      );
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let pending = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        pending += decoder.decode(value, { stream: true });
+        const lines = pending.split('\n');
+        pending = lines.pop();
+
+        for (const line of lines) {
+          if (!line) continue;
+          const frame = JSON.parse(line);
+          batch.push(frame);
+          startFrame = frame.frame + 1;
+        }
+
+        if (batch.length >= chunkSize) flush();
+      }
+
+      flush();
+      setTrajectoryData(prev => ({ ...prev, hasMore: false, nextStartFrame: null }));
+      return;
+
     } catch (error) {
+      flush();
+      retries += 1;
       console.error('Error loading trajectory:', error);
-      break;
     }
   }
   
-}, [simulationId, loadTrajectoryChunk]);
+}, [simulationId]);
 
 
   return {